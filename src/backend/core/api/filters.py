@@ -1,5 +1,6 @@
 """API filters for Impress' core application."""
 
+from django.contrib.postgres.search import TrigramWordSimilarity
 from django.utils.translation import gettext_lazy as _
 
 import django_filters
@@ -21,10 +22,11 @@ class DocumentFilter(django_filters.FilterSet):
     title = django_filters.CharFilter(
         field_name="title", lookup_expr="icontains", label=_("Title")
     )
+    q = django_filters.CharFilter(method="filter_q", label=_("Search"))
 
     class Meta:
         model = models.Document
-        fields = ["is_creator_me", "is_favorite", "title"]
+        fields = ["is_creator_me", "is_favorite", "title", "q"]
 
     # pylint: disable=unused-argument
     def filter_is_creator_me(self, queryset, name, value):
@@ -64,3 +66,25 @@ class DocumentFilter(django_filters.FilterSet):
             return queryset
 
         return queryset.filter(is_favorite=bool(value))
+
+    # pylint: disable=unused-argument
+    def filter_q(self, queryset, name, value):
+        """
+        Filter documents whose title contains a word similar to the query, annotated with
+        the trigram similarity of this word to the query for ranking, so that long titles
+        containing the exact word rank before short titles that only look like it.
+
+        Candidates are first looked up in the trigram index of titles, then only the
+        matching documents go through the access filters of the queryset.
+
+        Example:
+            - /api/v1.0/documents/?q=projet
+                → Filters documents with a title like "Project Alpha"
+        """
+        candidates = models.Document.objects.filter(
+            title__trigram_word_similar=value
+        ).values("pk")
+
+        return queryset.filter(pk__in=candidates).annotate(
+            similarity=TrigramWordSimilarity(value, "title")
+        )
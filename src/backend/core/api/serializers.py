@@ -17,6 +17,8 @@ from core.services.converter_services import (
     YdocConverter,
 )
 
+from . import utils
+
 
 class UserSerializer(serializers.ModelSerializer):
     """Serialize users."""
@@ -142,7 +144,27 @@ class BaseResourceSerializer(serializers.ModelSerializer):
         return {}
 
 
-class ListDocumentSerializer(BaseResourceSerializer):
+class SparseFieldsetSerializerMixin:
+    """
+    Only serialize the fields selected by the `fields` and `omit` query parameters of GET
+    requests (e.g. `?omit=content,abilities`), so that the cost of computing the fields
+    left out is not paid. Fields are left untouched on write requests to keep validation.
+    """
+
+    def get_fields(self):
+        """Drop the fields that were not selected by the client."""
+        fields = super().get_fields()
+
+        request = self.context.get("request")
+        if request and request.method == "GET":
+            selected = utils.get_sparse_fieldset(request.query_params, fields)
+            for name in set(fields) - selected:
+                del fields[name]
+
+        return fields
+
+
+class ListDocumentSerializer(SparseFieldsetSerializerMixin, BaseResourceSerializer):
     """Serialize documents with limited fields for display in lists."""
 
     is_favorite = serializers.BooleanField(read_only=True)
@@ -185,6 +207,25 @@ class ListDocumentSerializer(BaseResourceSerializer):
             "user_roles",
         ]
 
+    def get_abilities(self, document) -> dict:
+        """
+        Return abilities of the logged-in user on the instance. Abilities of the documents
+        of a list are computed by an engine shared by the list (see
+        `DocumentAbilitiesEngine`).
+        """
+        request = self.context.get("request")
+        if not request:
+            return {}
+
+        if not isinstance(self.parent, serializers.ListSerializer):
+            return document.get_abilities(request.user)
+
+        if "abilities_engine" not in self.context:
+            self.context["abilities_engine"] = models.DocumentAbilitiesEngine(
+                request.user
+            )
+        return self.context["abilities_engine"].get_abilities(document)
+
     def get_user_roles(self, document):
         """
         Return roles of the logged-in user for the current document,
@@ -604,3 +645,21 @@ class MoveDocumentSerializer(serializers.Serializer):
         choices=enums.MoveNodePositionChoices.choices,
         default=enums.MoveNodePositionChoices.LAST_CHILD,
     )
+
+
+class DuplicateDocumentSerializer(serializers.Serializer):
+    """
+    Serializer for validating input data to duplicate a document.
+
+    Fields:
+        - with_descendants (BooleanField): Whether the descendants of the document are
+            duplicated along with it. Defaults to False.
+
+    Example:
+        Input payload for duplicating a document and its descendants:
+        {
+            "with_descendants": true
+        }
+    """
+
+    with_descendants = serializers.BooleanField(default=False)
@@ -1,11 +1,16 @@
 """Util to generate S3 authorization headers for object storage access control"""
 
+import json
+import threading
 import time
 from abc import ABC, abstractmethod
+from collections import OrderedDict
 
 from django.conf import settings
+from django.core import signing
 from django.core.cache import cache
 from django.core.files.storage import default_storage
+from django.db import connections, models
 
 import botocore
 from rest_framework.throttling import BaseThrottle
@@ -34,6 +39,147 @@ def filter_root_paths(paths, skip_sorting=False):
     return root_paths
 
 
+def get_sparse_fieldset(query_params, field_names):
+    """
+    Return the names of the fields selected by the `fields` and `omit` query parameters.
+
+    Both parameters take a comma separated list of field names. Without `fields`, all the
+    fields are selected. Unknown field names are ignored.
+
+    Args:
+        query_params (QueryDict): The query parameters of the request.
+        field_names (iterable of str): The names of all the fields available.
+
+    Returns:
+        set of str: The names of the selected fields.
+    """
+    selected = set(field_names)
+
+    if fields := query_params.get("fields"):
+        selected &= {name.strip() for name in fields.split(",")}
+
+    if omit := query_params.get("omit"):
+        selected -= {name.strip() for name in omit.split(",")}
+
+    return selected
+
+
+ROOT_DOCUMENTS_STRATEGY_PYTHON = "python"
+ROOT_DOCUMENTS_STRATEGY_SQL = "sql"
+
+
+def filter_root_documents(queryset, strategy=None):
+    """
+    Keep the documents of a queryset that have no ancestor in the queryset.
+
+    With the "sql" strategy, documents are excluded if one of their ancestors, whose
+    paths are enumerated from their own path, matches the queryset: paths never leave
+    the database. With the "python" strategy, all paths are fetched and filtered with
+    `filter_root_paths` before being sent back in the query. The strategy defaults to
+    the DOCUMENT_LIST_ROOT_DOCUMENTS_STRATEGY setting.
+    """
+    strategy = strategy or settings.DOCUMENT_LIST_ROOT_DOCUMENTS_STRATEGY
+
+    if strategy == ROOT_DOCUMENTS_STRATEGY_PYTHON:
+        root_paths = filter_root_paths(
+            queryset.order_by("path").values_list("path", flat=True),
+            skip_sorting=True,
+        )
+        return queryset.filter(path__in=root_paths)
+
+    if strategy != ROOT_DOCUMENTS_STRATEGY_SQL:
+        raise ValueError(f"Unknown root documents strategy: {strategy!s}")
+
+    ancestors = queryset.filter(
+        queryset.model.get_ancestors_lookup(models.OuterRef("path"), "path")
+    ).exclude(path=models.OuterRef("path"))
+    return queryset.filter(~models.Exists(ancestors))
+
+
+def estimate_count(queryset):
+    """
+    Return the number of rows of a queryset as estimated by the query planner of the
+    database, which is much cheaper than a `COUNT(*)` on large or annotated querysets.
+    """
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql:s}", params)
+        plan = cursor.fetchone()[0]
+
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+# S3 rejects requests signed more than 15 minutes ago: cached signatures are renewed
+# one minute before
+SIGV4_MAX_AGE = 15 * 60
+SIGV4_RENEWAL_MARGIN = 60
+
+
+class S3AuthorizationHeadersCache:
+    """
+    Process-local LRU of the S3 authorization headers signed for object keys.
+
+    A SigV4 signature only depends on the key, the signing date and the credentials, so
+    headers signed for a key are reused until they get close to the age beyond which
+    S3 rejects them. All entries are dropped when the credentials rotate.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.credentials = None
+
+    @staticmethod
+    def get_timeout():
+        """Return the number of seconds during which signed headers are reused."""
+        return min(
+            settings.S3_AUTHORIZATION_HEADERS_CACHE_TIMEOUT,
+            SIGV4_MAX_AGE - SIGV4_RENEWAL_MARGIN,
+        )
+
+    def _check_credentials(self, credentials):
+        """Drop the entries signed with other credentials. Must hold the lock."""
+        if credentials != self.credentials:
+            self._entries.clear()
+            self.credentials = credentials
+
+    def get(self, key, credentials):
+        """Return the headers signed for a key if they are still fresh, else None."""
+        with self._lock:
+            self._check_credentials(credentials)
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            signed_at, headers = entry
+            if time.time() - signed_at >= self.get_timeout():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return headers
+
+    def set(self, key, credentials, headers, signed_at):
+        """Store the headers signed for a key and evict the least recently used."""
+        with self._lock:
+            self._check_credentials(credentials)
+            self._entries[key] = (signed_at, headers)
+            self._entries.move_to_end(key)
+            while len(self._entries) > settings.S3_AUTHORIZATION_HEADERS_CACHE_SIZE:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Remove all entries from the cache."""
+        with self._lock:
+            self._entries.clear()
+            self.credentials = None
+
+
+s3_authorization_headers_cache = S3AuthorizationHeadersCache()
+
+
 def generate_s3_authorization_headers(key):
     """
     Generate authorization headers for an s3 object.
@@ -43,7 +189,21 @@ def generate_s3_authorization_headers(key):
       with cookies)
     - access control is truly realtime
     - the object storage service does not need to be exposed on internet
+
+    Signed headers are cached per key for a few minutes (see
+    `S3AuthorizationHeadersCache`) so repeated loads of a file skip the signature.
     """
+    s3_client = default_storage.connection.meta.client
+    # pylint: disable=protected-access
+    credentials = s3_client._request_signer._credentials  # noqa: SLF001
+    frozen_credentials = credentials.get_frozen_credentials()
+
+    use_cache = settings.S3_AUTHORIZATION_HEADERS_CACHE_TIMEOUT > 0
+    if use_cache and (
+        headers := s3_authorization_headers_cache.get(key, frozen_credentials)
+    ):
+        return dict(headers)
+
     url = default_storage.unsigned_connection.meta.client.generate_presigned_url(
         "get_object",
         ExpiresIn=0,
@@ -51,15 +211,51 @@ def generate_s3_authorization_headers(key):
     )
     request = botocore.awsrequest.AWSRequest(method="get", url=url)
 
-    s3_client = default_storage.connection.meta.client
-    # pylint: disable=protected-access
-    credentials = s3_client._request_signer._credentials  # noqa: SLF001
-    frozen_credentials = credentials.get_frozen_credentials()
+    signed_at = time.time()
     region = s3_client.meta.region_name
     auth = botocore.auth.S3SigV4Auth(frozen_credentials, "s3", region)
     auth.add_auth(request)
 
-    return request
+    headers = dict(request.headers)
+    if use_cache:
+        s3_authorization_headers_cache.set(key, frozen_credentials, headers, signed_at)
+    return dict(headers)
+
+
+MEDIA_CAPABILITY_COOKIE_NAME = "media_capability"
+MEDIA_CAPABILITY_SALT = "core.media_capability"
+
+
+def sign_media_capability(document_id, user_id=None):
+    """
+    Mint a capability granting a user, or anonymous users, access to the attachments
+    of a document. It is signed with the secret key and timestamped so it can be
+    verified without a database query.
+    """
+    return signing.TimestampSigner(salt=MEDIA_CAPABILITY_SALT).sign_object(
+        {"d": str(document_id), "u": str(user_id) if user_id else None}
+    )
+
+
+def verify_media_capability(capability, document_id, user_id=None):
+    """
+    Check that a capability minted by `sign_media_capability` covers the attachments
+    of a document for a user, or for anonymous users, and did not expire.
+    """
+    if not settings.MEDIA_CAPABILITY_TIMEOUT or not capability:
+        return False
+
+    try:
+        payload = signing.TimestampSigner(salt=MEDIA_CAPABILITY_SALT).unsign_object(
+            capability, max_age=settings.MEDIA_CAPABILITY_TIMEOUT
+        )
+    except signing.BadSignature:
+        return False
+
+    return (payload.get("d"), payload.get("u")) == (
+        str(document_id),
+        str(user_id) if user_id else None,
+    )
 
 
 class AIBaseRateThrottle(BaseThrottle, ABC):
@@ -1,22 +1,33 @@
 """API endpoints"""
 # pylint: disable=too-many-lines
 
+import base64
+import hashlib
+import json
 import logging
 import re
 import uuid
 from urllib.parse import urlparse
 
 from django.conf import settings
+from django.contrib.auth import SESSION_KEY
 from django.contrib.postgres.aggregates import ArrayAgg
 from django.contrib.postgres.fields import ArrayField
-from django.contrib.postgres.search import TrigramSimilarity
-from django.core.exceptions import ValidationError
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    TrigramSimilarity,
+)
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist, ValidationError
 from django.core.files.storage import default_storage
 from django.db import models as db
 from django.db import transaction
 from django.db.models.expressions import RawSQL
-from django.db.models.functions import Left, Length
-from django.http import Http404
+from django.http import Http404, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.translation import gettext_lazy as _
+from django.views import View
 
 import rest_framework as drf
 from botocore.exceptions import ClientError
@@ -24,17 +35,20 @@ from django_filters import rest_framework as drf_filters
 from rest_framework import filters, status, viewsets
 from rest_framework import response as drf_response
 from rest_framework.permissions import AllowAny
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.utils.urls import replace_query_param
 
 from core import authentication, enums, models
 from core.services.ai_services import AIService
 from core.services.collaboration_services import CollaborationService
+from core.services.duplication_services import ATTACHMENTS_FOLDER
 
 from . import permissions, serializers, utils
 from .filters import DocumentFilter
 
 logger = logging.getLogger(__name__)
 
-ATTACHMENTS_FOLDER = "attachments"
 UUID_REGEX = (
     r"[a-fA-F0-9]{8}-[a-fA-F0-9]{4}-[a-fA-F0-9]{4}-[a-fA-F0-9]{4}-[a-fA-F0-9]{12}"
 )
@@ -127,7 +141,184 @@ class SerializerPerActionMixin:
         return super().get_serializer_class()
 
 
-class Pagination(drf.pagination.PageNumberPagination):
+class CursorPagination(drf.pagination.BasePagination):
+    """
+    Keyset pagination on the ordering of the queryset.
+
+    Pages are fetched with a condition on the first ordering field, with the primary key
+    as tie-breaker, instead of an `OFFSET`, and no `COUNT(*)` is issued: the cost of a
+    page does not depend on its depth. Null values sort last in ascending order like in
+    PostgreSQL. The number of results is only estimated by the query planner if the
+    client asks for it with `count=estimate`.
+    """
+
+    cursor_query_param = "cursor"
+    count_query_param = "count"
+    invalid_cursor_message = _("Invalid cursor")
+    ordering = "-created_at"
+    page_size = api_settings.PAGE_SIZE
+
+    def get_ordering(self, queryset):
+        """
+        Return the field on which the queryset is ordered and whether the order is
+        descending, falling back to the ordering of the pagination.
+        """
+        opts = queryset.model._meta  # noqa: SLF001
+        ordering = queryset.query.order_by or opts.ordering
+        order = ordering[0] if ordering else self.ordering
+
+        if isinstance(order, str) and "__" not in order:
+            field_name = order.lstrip("-")
+            try:
+                field = opts.pk if field_name == "pk" else opts.get_field(field_name)
+            except FieldDoesNotExist:
+                pass
+            else:
+                return field, order.startswith("-")
+
+        return opts.get_field(self.ordering.lstrip("-")), self.ordering.startswith("-")
+
+    def decode_cursor(self, request):
+        """
+        Return the position and direction encoded in the cursor sent by the client, or
+        None for the first page.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode("ascii")))
+            field_name, value, pk, reverse = cursor
+            # A cursor is only valid for the ordering in which it was issued
+            if field_name != self.field.name:
+                raise ValueError("Cursor issued for another ordering.")
+            if value is not None:
+                value = self.field.to_python(value)
+            pk = uuid.UUID(pk)
+        except (TypeError, ValueError, ValidationError) as exc:
+            raise drf.exceptions.NotFound(self.invalid_cursor_message) from exc
+
+        return value, pk, bool(reverse)
+
+    def encode_cursor(self, instance, reverse=False):
+        """Return a link to the page following or preceding an instance."""
+        value = self.field.value_from_object(instance)
+        if value is not None and not isinstance(value, str):
+            value = value.isoformat() if hasattr(value, "isoformat") else str(value)
+
+        cursor = json.dumps([self.field.name, value, str(instance.pk), int(reverse)])
+        return replace_query_param(
+            self.base_url,
+            self.cursor_query_param,
+            base64.urlsafe_b64encode(cursor.encode("ascii")).decode("ascii"),
+        )
+
+    def get_keyset_filter(self, value, pk, descending):
+        """Match the rows following a position in the ascending or descending order."""
+        name = self.field.name
+        if descending:
+            before = db.Q(**{f"{name}__isnull": False})
+            if value is not None:
+                before = db.Q(**{f"{name}__lt": value})
+            tie = db.Q(pk__lt=pk)
+        else:
+            before = db.Q(pk__in=[])
+            if value is not None:
+                before = db.Q(**{f"{name}__gt": value}) | db.Q(
+                    **{f"{name}__isnull": True}
+                )
+            tie = db.Q(pk__gt=pk)
+
+        if value is None:
+            return before | (db.Q(**{f"{name}__isnull": True}) & tie)
+        return before | (db.Q(**{name: value}) & tie)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Return the page of the queryset following or preceding the cursor."""
+        self.base_url = request.build_absolute_uri()
+        self.field, descending = self.get_ordering(queryset)
+        self.count = None
+
+        if request.query_params.get(self.count_query_param) == "estimate":
+            self.count = utils.estimate_count(queryset)
+
+        cursor = self.decode_cursor(request)
+        reverse = cursor is not None and cursor[2]
+
+        # Preceding pages are fetched in the reverse order
+        descending = descending != reverse
+        prefix = "-" if descending else ""
+        queryset = queryset.order_by(f"{prefix:s}{self.field.name:s}", f"{prefix:s}pk")
+        if cursor is not None:
+            queryset = queryset.filter(
+                self.get_keyset_filter(cursor[0], cursor[1], descending)
+            )
+
+        # Fetch one more row to know if there is a page beyond this one
+        results = list(queryset[: self.page_size + 1])
+        page = results[: self.page_size]
+        has_more = len(results) > len(page)
+
+        if reverse:
+            page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+
+        self.page = page
+        return page
+
+    def get_next_link(self):
+        """Return the link to the next page if any."""
+        if not (self.has_next and self.page):
+            return None
+        return self.encode_cursor(self.page[-1])
+
+    def get_previous_link(self):
+        """Return the link to the previous page if any."""
+        if not (self.has_previous and self.page):
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        """Return the page with links to its neighbours and the estimated count if asked."""
+        response_data = {
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "results": data,
+        }
+        if self.count is not None:
+            response_data = {"count": self.count, **response_data}
+        return drf.response.Response(response_data)
+
+
+class PageNumberOrCursorPagination(drf.pagination.PageNumberPagination):
+    """
+    Page number pagination, or cursor pagination if the client sends a `cursor` query
+    parameter, empty for the first page (see `CursorPagination`).
+    """
+
+    cursor_pagination_class = CursorPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Delegate to cursor pagination if the client asked for it."""
+        self.cursor_pagination = None
+        if self.cursor_pagination_class.cursor_query_param not in request.query_params:
+            return super().paginate_queryset(queryset, request, view=view)
+
+        self.cursor_pagination = self.cursor_pagination_class()
+        self.cursor_pagination.page_size = self.get_page_size(request)
+        return self.cursor_pagination.paginate_queryset(queryset, request, view=view)
+
+    def get_paginated_response(self, data):
+        """Return the response of the pagination mode in use."""
+        if self.cursor_pagination is not None:
+            return self.cursor_pagination.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class Pagination(PageNumberOrCursorPagination):
     """Pagination to display no more than 100 objects per page sorted by creation date."""
 
     ordering = "-created_on"
@@ -387,6 +578,9 @@ class DocumentViewSet(
         Returns: JSON response with the translated text.
         Throttled by: AIDocumentRateThrottle, AIUserRateThrottle.
 
+    13. **Search**: Search the content of readable documents, most relevant first.
+        Example: GET /documents/search/?q="meeting notes" -draft
+
     ### Ordering: created_at, updated_at, is_favorite, title
 
         Example:
@@ -399,11 +593,33 @@ class DocumentViewSet(
         - `is_favorite=true`: Returns documents marked as favorite by the current user
         - `is_favorite=false`: Returns documents not marked as favorite by the current user
         - `title=hello`: Returns documents which title contains the "hello" string
+        - `q=helo`: Returns documents which title contains a word similar to "helo",
+          most similar first unless an ordering is given
 
         Example:
         - GET /api/v1.0/documents/?is_creator_me=true&is_favorite=true
         - GET /api/v1.0/documents/?is_creator_me=false&title=hello
 
+    ### Sparse fieldsets:
+        - `fields=id,title`: Only return the listed fields
+        - `omit=content,abilities`: Return all fields except the listed ones
+
+        Fields left out are not computed: omitting `content` saves a read from object
+        storage, omitting `nb_accesses` a cache lookup, omitting both `abilities` and
+        `user_roles` an SQL annotation on lists.
+
+        Example:
+        - GET /api/v1.0/documents/{id}/?omit=content
+        - GET /api/v1.0/documents/?fields=id,title,path
+
+    ### Pagination:
+        Lists are paginated by page number, or by cursor if the `cursor` query parameter
+        is sent (empty for the first page). Cursor pages follow the active ordering and
+        are not counted unless `count=estimate` is sent.
+
+        Example:
+        - GET /api/v1.0/documents/?cursor=&ordering=title&count=estimate
+
     ### Annotations:
     1. **is_favorite**: Indicates whether the document is marked as favorite by the current user.
     2. **user_roles**: Roles the current user has on the document or its ancestors.
@@ -418,6 +634,7 @@ class DocumentViewSet(
     metadata_class = DocumentMetadata
     ordering = ["-updated_at"]
     ordering_fields = ["created_at", "updated_at", "title"]
+    pagination_class = PageNumberOrCursorPagination
     permission_classes = [
         permissions.DocumentAccessPermission,
     ]
@@ -425,6 +642,7 @@ class DocumentViewSet(
     serializer_class = serializers.DocumentSerializer
     list_serializer_class = serializers.ListDocumentSerializer
     trashbin_serializer_class = serializers.ListDocumentSerializer
+    search_serializer_class = serializers.ListDocumentSerializer
     children_serializer_class = serializers.ListDocumentSerializer
     ai_translate_serializer_class = serializers.AITranslateSerializer
 
@@ -451,9 +669,9 @@ class DocumentViewSet(
         output_field = ArrayField(base_field=db.CharField())
 
         if user.is_authenticated:
-            user_roles_subquery = models.DocumentAccess.objects.filter(
+            user_roles_subquery = models.EffectiveDocumentRole.objects.filter(
                 db.Q(user=user) | db.Q(team__in=user.teams),
-                document__path=Left(db.OuterRef("path"), Length("document__path")),
+                models.Document.get_ancestors_lookup(db.OuterRef("path"), "path"),
             ).values_list("role", flat=True)
 
             return queryset.annotate(
@@ -466,6 +684,34 @@ class DocumentViewSet(
             user_roles=db.Value([], output_field=output_field),
         )
 
+    def annotate_nb_accesses(self, queryset):
+        """
+        Annotate document queryset with the number of accesses on the document or its
+        ancestors, so that a page of documents is counted in the query that fetches it
+        instead of one query per document missing from the cache.
+        """
+        nb_accesses_subquery = (
+            models.EffectiveDocumentRole.objects.filter(
+                models.Document.get_ancestors_lookup(db.OuterRef("path"), "path")
+            )
+            .order_by()
+            .values(count=db.Func("pk", function="COUNT"))
+        )
+        return queryset.annotate(
+            computed_nb_accesses=db.Subquery(
+                nb_accesses_subquery, output_field=db.IntegerField()
+            )
+        )
+
+    def get_sparse_fieldset(self):
+        """
+        Return the names of the fields of the current serializer selected by the client
+        with the `fields` and `omit` query parameters.
+        """
+        return utils.get_sparse_fieldset(
+            self.request.query_params, self.get_serializer_class().Meta.fields
+        )
+
     def get_queryset(self):
         """Get queryset performing all annotation and filtering on the document tree structure."""
         user = self.request.user
@@ -498,6 +744,36 @@ class DocumentViewSet(
             )
         )
 
+    def filter_root_documents(self, queryset, use_cache=True):
+        """
+        Keep only the highest ancestors among the documents of the queryset.
+
+        Their ids are cached for the user until an access, a link trace, a move or a
+        deletion involving the user or one of their teams bumps one of the generations
+        versioning them (see `invalidate_document_roots_cache`).
+        """
+        timeout = settings.DOCUMENT_LIST_ROOTS_CACHE_TIMEOUT
+        if not (use_cache and timeout):
+            return utils.filter_root_documents(queryset)
+
+        user = self.request.user
+        generations = models.get_cache_generations(
+            user.get_document_roots_generation_keys(), timeout=timeout
+        )
+        version = hashlib.sha256(
+            ":".join(str(generation) for generation in generations).encode()
+        ).hexdigest()
+        cache_key = f"user_{user.pk!s}_document_roots_{version:s}"
+
+        root_ids = cache.get(cache_key)
+        if root_ids is None:
+            root_ids = list(
+                utils.filter_root_documents(queryset).values_list("pk", flat=True)
+            )
+            cache.set(cache_key, root_ids, timeout=timeout)
+
+        return queryset.filter(pk__in=root_ids)
+
     def filter_queryset(self, queryset):
         """Apply annotations and filters sequentially."""
         filterset = DocumentFilter(
@@ -507,19 +783,34 @@ class DocumentViewSet(
         filter_data = filterset.form.cleaned_data
 
         # Filter as early as possible on fields that are available on the model
-        for field in ["is_creator_me", "title"]:
+        early_filters = ["is_creator_me", "title", "q"]
+        for field in early_filters:
             queryset = filterset.filters[field].filter(queryset, filter_data[field])
 
-        queryset = self.annotate_user_roles(queryset)
+        # Roles are also needed to compute abilities: on lists, only annotate them if
+        # the client did not leave out both fields
+        if self.action not in ["list", "children"] or self.get_sparse_fieldset() & {
+            "abilities",
+            "user_roles",
+        }:
+            queryset = self.annotate_user_roles(queryset)
+
+        if (
+            self.action in ["list", "children"]
+            and "nb_accesses" in self.get_sparse_fieldset()
+        ):
+            queryset = self.annotate_nb_accesses(queryset)
 
         if self.action == "list":
             # Among the results, we may have documents that are ancestors/descendants
             # of each other. In this case we want to keep only the highest ancestors.
-            root_paths = utils.filter_root_paths(
-                queryset.order_by("path").values_list("path", flat=True),
-                skip_sorting=True,
+            # The roots of the unfiltered list are cached for each user
+            queryset = self.filter_root_documents(
+                queryset,
+                use_cache=all(
+                    filter_data[field] in (None, "") for field in early_filters
+                ),
             )
-            queryset = queryset.filter(path__in=root_paths)
 
             # Annotate the queryset with an attribute marking instances as highest ancestor
             # in order to save some time while computing abilities in the instance
@@ -535,6 +826,19 @@ class DocumentViewSet(
             queryset, filter_data["is_favorite"]
         )
 
+        # Search results are ranked by similarity unless the client chose an ordering
+        if (
+            filter_data["q"]
+            and CursorPagination.cursor_query_param in self.request.query_params
+        ):
+            raise drf.exceptions.ValidationError(
+                {"cursor": ["Cursor pagination is not available for searches."]}
+            )
+        if filter_data["q"] and not self.request.query_params.get(
+            api_settings.ORDERING_PARAM
+        ):
+            return queryset.order_by("-similarity", "title", "pk")
+
         # Apply ordering only now that everyting is filtered and annotated
         return filters.OrderingFilter().filter_queryset(self.request, queryset, self)
 
@@ -554,10 +858,14 @@ class DocumentViewSet(
         Add a trace that the document was accessed by a user. This is used to list documents
         on a user's list view even though the user has no specific role in the document (link
         access when the link reach configuration of the document allows it).
+
+        The response carries a strong ETag computed from the serialized document without
+        its content, plus the digest of the content. A request with a matching
+        `If-None-Match` header is answered with a 304 without reading the content from
+        object storage.
         """
         user = self.request.user
         instance = self.get_object()
-        serializer = self.get_serializer(instance)
 
         # The `create` query generates 5 db queries which are much less efficient than an
         # `exists` query. The user will visit the document many times after the first visit
@@ -568,7 +876,45 @@ class DocumentViewSet(
         ):
             models.LinkTrace.objects.create(document=instance, user=request.user)
 
-        return drf.response.Response(serializer.data)
+        serializer = self.get_serializer(instance)
+        content_field = serializer.fields.pop("content", None)
+        data = serializer.data
+
+        # Without a digest, only the content itself could tell if it changed
+        if content_field is None or instance.content_digest:
+            etag = self.get_document_etag(
+                data, instance.content_digest if content_field else None
+            )
+            response = get_conditional_response(request, etag=etag)
+            if response is not None:
+                response["ETag"] = etag
+                response["Cache-Control"] = "private, no-cache"
+                return response
+        else:
+            etag = None
+
+        if content_field is not None:
+            content = instance.content
+            data["content"] = (
+                content if content is None else content_field.to_representation(content)
+            )
+
+        response = drf.response.Response(data)
+        if etag:
+            response["ETag"] = etag
+            response["Cache-Control"] = "private, no-cache"
+        return response
+
+    @staticmethod
+    def get_document_etag(data, content_digest):
+        """
+        Compute a strong ETag for the representation of a document. The representation
+        includes the abilities and roles of the user, so the ETag is user specific.
+        """
+        payload = json.dumps(
+            [data, content_digest], cls=JSONEncoder, sort_keys=True
+        ).encode("utf-8")
+        return f'"{hashlib.sha256(payload).hexdigest():s}"'
 
     @transaction.atomic
     def perform_create(self, serializer):
@@ -602,6 +948,62 @@ class DocumentViewSet(
 
         queryset = self.get_queryset()
         queryset = queryset.filter(id__in=favorite_documents_ids)
+        if "nb_accesses" in self.get_sparse_fieldset():
+            queryset = self.annotate_nb_accesses(queryset)
+        return self.get_response_for_queryset(queryset)
+
+    @drf.decorators.action(
+        detail=False,
+        methods=["get"],
+        permission_classes=[permissions.IsAuthenticated],
+    )
+    def search(self, request, *args, **kwargs):
+        """
+        Search the content of the documents the current user can read, most relevant
+        first. The query follows the web search syntax of PostgreSQL: quoted phrases,
+        "or" and "-" to exclude a word.
+
+        Hits are found in the full-text index of contents, then only kept if the user
+        has a role on the document or one of its ancestors, or previously accessed it
+        through a link that is not restricted.
+        """
+        if not (query := request.GET.get("q", "").strip()):
+            raise drf.exceptions.ValidationError({"q": ["This parameter is required."]})
+        # Results are ranked by relevance, which cursors cannot page through
+        if CursorPagination.cursor_query_param in request.query_params:
+            raise drf.exceptions.ValidationError(
+                {"cursor": ["Cursor pagination is not available for searches."]}
+            )
+
+        user = request.user
+        search_query = SearchQuery(
+            query, config=settings.DOCUMENT_SEARCH_CONFIG, search_type="websearch"
+        )
+        has_role = models.EffectiveDocumentRole.objects.filter(
+            db.Q(user=user) | db.Q(team__in=user.teams),
+            models.Document.get_ancestors_lookup(db.OuterRef("path"), "path"),
+        )
+        traced_documents_ids = models.LinkTrace.objects.filter(user=user).values(
+            "document_id"
+        )
+
+        queryset = self.queryset.filter(
+            search_vector__vector=search_query, ancestors_deleted_at__isnull=True
+        ).filter(
+            db.Exists(has_role)
+            | (
+                db.Q(id__in=traced_documents_ids)
+                & ~db.Q(link_reach=models.LinkReachChoices.RESTRICTED)
+            )
+        )
+        queryset = self.annotate_user_roles(queryset)
+        if "nb_accesses" in self.get_sparse_fieldset():
+            queryset = self.annotate_nb_accesses(queryset)
+        queryset = self.annotate_is_favorite(queryset)
+        queryset = queryset.annotate(
+            rank=SearchRank(db.F("search_vector__vector"), search_query)
+        ).order_by("-rank", "pk")
+
         return self.get_response_for_queryset(queryset)
 
     @drf.decorators.action(
@@ -621,6 +1023,8 @@ class DocumentViewSet(
         )
         queryset = self.annotate_user_roles(queryset)
         queryset = queryset.filter(user_roles__contains=[models.RoleChoices.OWNER])
+        if "nb_accesses" in self.get_sparse_fieldset():
+            queryset = self.annotate_nb_accesses(queryset)
 
         return self.get_response_for_queryset(queryset)
 
@@ -707,6 +1111,26 @@ class DocumentViewSet(
             {"message": "Document moved successfully."}, status=status.HTTP_200_OK
         )
 
+    @drf.decorators.action(detail=True, methods=["post"])
+    def duplicate(self, request, *args, **kwargs):
+        """
+        Duplicate a document, and optionally its descendants, to a new root document
+        owned by the current user. Contents and attachments are copied in object storage
+        so they are neither downloaded nor uploaded by the client.
+        """
+        document = self.get_object()
+
+        serializer = serializers.DuplicateDocumentSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        duplicated_document = document.duplicate(
+            request.user, with_descendants=serializer.validated_data["with_descendants"]
+        )
+
+        return drf_response.Response(
+            {"id": str(duplicated_document.id)}, status=status.HTTP_201_CREATED
+        )
+
     @drf.decorators.action(
         detail=True,
         methods=["post"],
@@ -762,7 +1186,6 @@ class DocumentViewSet(
         queryset = document.get_children().filter(deleted_at__isnull=True)
         queryset = self.filter_queryset(queryset)
         queryset = self.annotate_is_favorite(queryset)
-        queryset = self.annotate_user_roles(queryset)
         return self.get_response_for_queryset(queryset)
 
     @drf.decorators.action(detail=True, methods=["get"], url_path="versions")
@@ -785,7 +1208,7 @@ class DocumentViewSet(
         # document. Filter to get the minimum access date for the logged-in user
         access_queryset = models.DocumentAccess.objects.filter(
             db.Q(user=user) | db.Q(team__in=user.teams),
-            document__path=Left(db.Value(document.path), Length("document__path")),
+            models.Document.get_ancestors_lookup(document.path),
         ).aggregate(min_date=db.Min("created_at"))
 
         # Handle the case where the user has no accesses
@@ -810,27 +1233,19 @@ class DocumentViewSet(
     )
     # pylint: disable=unused-argument
     def versions_detail(self, request, pk, version_id, *args, **kwargs):
-        """Custom action to retrieve a specific version of a document"""
-        document = self.get_object()
-
-        try:
-            response = document.get_content_response(version_id=version_id)
-        except (FileNotFoundError, ClientError) as err:
-            raise Http404 from err
+        """
+        Custom action to retrieve a specific version of a document.
 
-        # Don't let users access versions that were created before they were given access
-        # to the document
-        user = request.user
-        min_datetime = min(
-            access.created_at
-            for access in models.DocumentAccess.objects.filter(
-                db.Q(user=user) | db.Q(team__in=user.teams),
-                document__path=Left(db.Value(document.path), Length("document__path")),
-            )
-        )
+        Versions are looked up in the version index so that the date at which the user
+        was given access is checked in the database.
 
-        if response["LastModified"] < min_datetime:
-            raise Http404
+        Versions are immutable so they are identified by a strong ETag built from their
+        version id and can be cached for long by the browser. A request with a matching
+        `If-None-Match` header is answered with a 304 without reading the version from
+        object storage.
+        """
+        document = self.get_object()
+        self.get_version_or_404(document, version_id)
 
         if request.method == "DELETE":
             response = document.delete_version(version_id)
@@ -838,14 +1253,71 @@ class DocumentViewSet(
                 status=response["ResponseMetadata"]["HTTPStatusCode"]
             )
 
+        etag = f'"{version_id:s}"'
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            try:
+                s3_response = document.get_content_response(version_id=version_id)
+            except (FileNotFoundError, ClientError) as err:
+                raise Http404 from err
+
+            response = drf.response.Response(
+                {
+                    "content": s3_response["Body"].read().decode("utf-8"),
+                    "last_modified": s3_response["LastModified"],
+                    "id": version_id,
+                }
+            )
+
+        response["ETag"] = etag
+        response["Cache-Control"] = "private, max-age=31536000, immutable"
+        return response
+
+    @drf.decorators.action(
+        detail=True,
+        methods=["post"],
+        url_path="versions/(?P<version_id>[0-9a-f-]{36})/restore",
+    )
+    # pylint: disable=unused-argument
+    def versions_restore(self, request, pk, version_id, *args, **kwargs):
+        """
+        Restore a version of a document as its current content. The version is copied in
+        object storage so the content is neither downloaded nor uploaded by the client.
+        """
+        document = self.get_object()
+        version = self.get_version_or_404(document, version_id)
+
+        try:
+            document.restore_version(version)
+        except ClientError as err:
+            raise Http404 from err
+
         return drf.response.Response(
-            {
-                "content": response["Body"].read().decode("utf-8"),
-                "last_modified": response["LastModified"],
-                "id": version_id,
-            }
+            {"detail": "Version has been successfully restored."},
+            status=status.HTTP_200_OK,
         )
 
+    def get_version_or_404(self, document, version_id):
+        """
+        Return a version of the document from the version index. Don't let users access
+        versions that were created before they were given access to the document.
+        """
+        user = self.request.user
+        min_datetime = models.DocumentAccess.objects.filter(
+            db.Q(user=user) | db.Q(team__in=user.teams),
+            models.Document.get_ancestors_lookup(document.path),
+        ).aggregate(min_date=db.Min("created_at"))["min_date"]
+
+        if min_datetime is None:
+            raise Http404
+
+        try:
+            return document.versions.get(
+                version_id=version_id, last_modified__gte=min_datetime
+            )
+        except models.DocumentVersion.DoesNotExist as err:
+            raise Http404 from err
+
     @drf.decorators.action(detail=True, methods=["put"], url_path="link-configuration")
     def link_configuration(self, request, *args, **kwargs):
         """Update link configuration with specific rights (cf get_abilities)."""
@@ -1006,14 +1478,19 @@ class DocumentViewSet(
             logger.debug("Document ID (pk) not found in URL parameters: %s", url_params)
             raise drf.exceptions.PermissionDenied()
 
-        # Fetch the document and check if the user has access
-        try:
-            document = models.Document.objects.get(pk=pk)
-        except models.Document.DoesNotExist as exc:
-            logger.debug("Document with ID '%s' does not exist", pk)
-            raise drf.exceptions.PermissionDenied() from exc
+        # Check if the user has access, fetching the document only if the decision
+        # is not cached
+        user_abilities = models.Document.get_cached_auth_abilities(
+            pk, request.user, self.action
+        )
+        if user_abilities is None:
+            try:
+                document = models.Document.objects.get(pk=pk)
+            except models.Document.DoesNotExist as exc:
+                logger.debug("Document with ID '%s' does not exist", pk)
+                raise drf.exceptions.PermissionDenied() from exc
 
-        user_abilities = document.get_abilities(request.user)
+            user_abilities = document.get_auth_abilities(request.user, self.action)
 
         if not user_abilities.get(self.action, False):
             logger.debug(
@@ -1037,15 +1514,30 @@ class DocumentViewSet(
         annotation. The request will then be proxied to the object storage backend who will
         respond with the file after checking the signature included in headers.
         """
-        url_params, _, _ = self._authorize_subrequest(
+        url_params, _, user_id = self._authorize_subrequest(
             request, MEDIA_STORAGE_URL_PATTERN
         )
         pk, key = url_params.values()
 
         # Generate S3 authorization headers using the extracted URL parameters
-        request = utils.generate_s3_authorization_headers(f"{pk:s}/{key:s}")
+        headers = utils.generate_s3_authorization_headers(f"{pk:s}/{key:s}")
+
+        response = drf.response.Response("authorized", headers=headers, status=200)
+
+        # Let the next attachments of the document be authorized by "media-check"
+        # without querying the database
+        if settings.MEDIA_CAPABILITY_TIMEOUT:
+            response.set_cookie(
+                utils.MEDIA_CAPABILITY_COOKIE_NAME,
+                utils.sign_media_capability(pk, user_id),
+                max_age=settings.MEDIA_CAPABILITY_TIMEOUT,
+                path=f"{settings.MEDIA_URL:s}{pk:s}/{ATTACHMENTS_FOLDER:s}/",
+                secure=settings.SESSION_COOKIE_SECURE,
+                httponly=True,
+                samesite="Lax",
+            )
 
-        return drf.response.Response("authorized", headers=request.headers, status=200)
+        return response
 
     @drf.decorators.action(detail=False, methods=["get"], url_path="collaboration-auth")
     def collaboration_auth(self, request, *args, **kwargs):
@@ -1433,3 +1925,35 @@ class ConfigView(drf.views.APIView):
                 dict_settings[setting] = getattr(settings, setting)
 
         return drf.response.Response(dict_settings)
+
+
+class MediaCheckView(View):
+    """
+    Authorize access to an attachment from an Nginx subrequest, like the "media-auth"
+    action of documents, but without touching the database when the request carries a
+    capability minted by "media-auth" for the document and the user of the session (see
+    `sign_media_capability`). The user is read from the session, not from the database.
+    Other requests are delegated to "media-auth", which mints a capability.
+    """
+
+    def get(self, request):
+        """
+        GET /api/v1.0/documents/media-check/
+            Return S3 authorization headers for the original URL of the subrequest.
+        """
+        original_url = request.META.get("HTTP_X_ORIGINAL_URL")
+        match = original_url and MEDIA_STORAGE_URL_PATTERN.search(
+            urlparse(original_url).path
+        )
+
+        if match and utils.verify_media_capability(
+            request.COOKIES.get(utils.MEDIA_CAPABILITY_COOKIE_NAME),
+            match["pk"],
+            request.session.get(SESSION_KEY),
+        ):
+            headers = utils.generate_s3_authorization_headers(
+                f"{match['pk']:s}/{match['key']:s}"
+            )
+            return HttpResponse("authorized", headers=headers)
+
+        return DocumentViewSet.as_view({"get": "media_auth"})(request)
@@ -0,0 +1,83 @@
+"""Management command benchmarking the strategies filtering root documents of lists."""
+
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+
+from rest_framework.request import Request
+
+from core.api import utils, viewsets
+from core.models import User
+
+
+class Command(BaseCommand):
+    """
+    Compare the strategies keeping only the highest ancestors in the list of documents
+    (see DOCUMENT_LIST_ROOT_DOCUMENTS_STRATEGY) on the documents accessible to a user.
+
+    Each iteration counts the root documents and fetches the first page, like the list
+    endpoint does. Strategies are checked to return the same documents.
+    """
+
+    help = __doc__
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "email", help="Email of the user whose list of documents is benchmarked."
+        )
+        parser.add_argument(
+            "--iterations",
+            type=int,
+            default=5,
+            help="Number of times each strategy is run.",
+        )
+
+    def handle(self, *args, **options):
+        """Execute management command."""
+        try:
+            user = User.objects.get(email=options["email"])
+        except User.DoesNotExist as err:
+            raise CommandError(f"No user with email {options['email']:s}.") from err
+
+        request = Request(RequestFactory().get("/api/v1.0/documents/"))
+        request.user = user
+        viewset = viewsets.DocumentViewSet(
+            request=request, action="list", detail=False, format_kwarg=None, kwargs={}
+        )
+        queryset = viewset.get_queryset()
+        self.stdout.write(
+            f"[INFO] Found {queryset.count()} documents accessible to the user."
+        )
+
+        strategies = [
+            utils.ROOT_DOCUMENTS_STRATEGY_PYTHON,
+            utils.ROOT_DOCUMENTS_STRATEGY_SQL,
+        ]
+        root_ids = {}
+        for strategy in strategies:
+            filtered = utils.filter_root_documents(queryset, strategy)
+            root_ids[strategy] = set(filtered.values_list("pk", flat=True))
+
+            durations = []
+            for _i in range(options["iterations"]):
+                start = time.perf_counter()
+                filtered = utils.filter_root_documents(queryset, strategy)
+                filtered.count()
+                list(
+                    filtered.values_list("pk", flat=True)[
+                        : settings.REST_FRAMEWORK["PAGE_SIZE"]
+                    ]
+                )
+                durations.append((time.perf_counter() - start) * 1000)
+
+            self.stdout.write(
+                f"[INFO] Strategy {strategy:s}: {len(root_ids[strategy])} root "
+                f"documents, median {statistics.median(durations):.1f} ms, "
+                f"min {min(durations):.1f} ms, max {max(durations):.1f} ms."
+            )
+
+        if len({frozenset(ids) for ids in root_ids.values()}) > 1:
+            raise CommandError("Strategies returned different root documents.")
@@ -0,0 +1,72 @@
+"""Management command checking the effective roles against document accesses."""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import DocumentAccess, EffectiveDocumentRole
+
+
+class Command(BaseCommand):
+    """
+    Report the document accesses whose effective role is missing or does not match the
+    access or the current path of its document. With "--fix", the effective roles of
+    these accesses are synchronized. Fail if inconsistencies remain.
+    """
+
+    help = __doc__
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of accesses fetched from the database at once.",
+        )
+        parser.add_argument(
+            "--fix",
+            action="store_true",
+            help="Synchronize the effective roles found inconsistent.",
+        )
+
+    def handle(self, *args, **options):
+        """Execute management command."""
+        accesses = DocumentAccess.objects.select_related("document", "effective_role")
+        self.stdout.write(
+            f"[INFO] Found {accesses.count()} accesses. Checking effective roles..."
+        )
+
+        inconsistent = []
+        for access in accesses.iterator(chunk_size=options["batch_size"]):
+            if self.is_consistent(access):
+                continue
+            self.stderr.write(
+                f"[ERROR] Effective role of access {access.id!s} on document "
+                f"{access.document_id!s} is missing or out of date."
+            )
+            inconsistent.append(access)
+
+        if not inconsistent:
+            self.stdout.write("[INFO] Effective roles are consistent.")
+            return
+
+        if not options["fix"]:
+            raise CommandError(
+                f"{len(inconsistent)} access(es) have an inconsistent effective role."
+            )
+
+        EffectiveDocumentRole.sync_accesses(inconsistent)
+        self.stdout.write(f"[INFO] Synchronized {len(inconsistent)} effective role(s).")
+
+    @staticmethod
+    def is_consistent(access):
+        """Check that the effective role of an access is a projection of the access."""
+        try:
+            effective_role = access.effective_role
+        except EffectiveDocumentRole.DoesNotExist:
+            return False
+
+        return (
+            effective_role.user_id,
+            effective_role.team,
+            effective_role.path,
+            effective_role.role,
+        ) == (access.user_id, access.team, access.document.path, access.role)
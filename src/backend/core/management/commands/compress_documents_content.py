@@ -0,0 +1,184 @@
+"""Management command rewriting document contents with the configured content codec."""
+
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+
+from botocore.exceptions import ClientError
+
+from core.models import Document, DocumentVersion
+from core.services.content_codec_services import (
+    UnknownCodecError,
+    decode_content,
+    encode_content,
+    get_codec,
+    get_object_codec_name,
+)
+
+REWRITTEN, SKIPPED, FAILED = "rewritten", "skipped", "failed"
+
+
+class Command(BaseCommand):
+    """
+    Rewrite the content of documents in object storage with the codec configured in
+    DOCUMENT_CONTENT_CODEC, e.g. to compress contents written before compression at rest
+    was activated. Objects already encoded with this codec are left untouched.
+
+    Documents are processed in batches and the objects of a batch are rewritten in
+    parallel. An object is only replaced if it did not change since it was read, so a
+    concurrent save is never overwritten. Each rewrite adds a version of the object.
+    """
+
+    help = __doc__
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of documents fetched from the database at once.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=8,
+            help="Number of objects rewritten in parallel.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report documents that would be rewritten.",
+        )
+
+    def handle(self, *args, **options):
+        """Execute management command."""
+        codec_name = settings.DOCUMENT_CONTENT_CODEC or None
+        if codec_name is not None:
+            try:
+                get_codec(codec_name)
+            except UnknownCodecError as err:
+                raise CommandError(str(err)) from err
+
+        documents = Document.objects.filter(content_digest__isnull=False).only(
+            "id", "content_digest", "content_size"
+        )
+        self.stdout.write(
+            f"[INFO] Found {documents.count()} documents. "
+            f"Rewriting contents with codec {codec_name}..."
+        )
+
+        totals = {REWRITTEN: 0, SKIPPED: 0, FAILED: 0}
+        batch_size = options["batch_size"]
+        with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+            batch = []
+            for document in documents.iterator(chunk_size=batch_size):
+                # In write-behind mode, the pending flush will write the content encoded
+                if (
+                    settings.DOCUMENT_CONTENT_WRITE_BEHIND
+                    and document.is_content_flush_pending()
+                ):
+                    totals[SKIPPED] += 1
+                    continue
+
+                batch.append(document)
+                if len(batch) >= batch_size:
+                    self.rewrite_batch(executor, batch, codec_name, options, totals)
+                    batch = []
+            self.rewrite_batch(executor, batch, codec_name, options, totals)
+
+        self.stdout.write(
+            f"[INFO] Done: {totals[REWRITTEN]} rewritten, {totals[SKIPPED]} skipped, "
+            f"{totals[FAILED]} failed."
+        )
+
+    def rewrite_batch(self, executor, documents, codec_name, options, totals):
+        """
+        Rewrite the objects of a batch of documents in parallel and index the versions
+        created. Workers only talk to object storage, the database is queried from the
+        main thread.
+        """
+        versions = []
+        for document, (status, response) in zip(
+            documents,
+            executor.map(
+                lambda document: self.rewrite_document(
+                    document, codec_name, options["dry_run"]
+                ),
+                documents,
+            ),
+            strict=True,
+        ):
+            totals[status] += 1
+            if response and (
+                version := DocumentVersion.from_put_response(
+                    document, response, document.content_digest, document.content_size
+                )
+            ):
+                versions.append(version)
+
+        DocumentVersion.objects.bulk_create(versions, ignore_conflicts=True)
+
+    def rewrite_document(self, document, codec_name, dry_run):
+        """
+        Rewrite the object of a document with the codec and return the outcome along
+        with the response of the write if any.
+        """
+        s3_client = default_storage.connection.meta.client
+        bucket_name = default_storage.bucket_name
+
+        try:
+            response = s3_client.get_object(Bucket=bucket_name, Key=document.file_key)
+        except ClientError as excpt:
+            return (
+                self.get_error_status(document, excpt, "read", ["404", "NoSuchKey"]),
+                None,
+            )
+
+        metadata = response.get("Metadata", {})
+        if get_object_codec_name(metadata) == codec_name:
+            return SKIPPED, None
+
+        bytes_content = decode_content(response["Body"].read(), metadata)
+        # Leave drifted objects to the "reconcile_documents_content_digest" command
+        if hashlib.sha256(bytes_content).hexdigest() != document.content_digest:
+            self.stderr.write(
+                f"[ERROR] Content of {document.id!s} does not match its digest."
+            )
+            return FAILED, None
+
+        if dry_run:
+            self.stdout.write(f"[INFO] -> Would rewrite document {document.id!s}.")
+            return REWRITTEN, None
+
+        body, new_metadata = encode_content(bytes_content)
+        try:
+            response = s3_client.put_object(
+                Bucket=bucket_name,
+                Key=document.file_key,
+                Body=body,
+                Metadata=new_metadata,
+                IfMatch=response["ETag"],
+            )
+        except ClientError as excpt:
+            # The document was saved in the meantime, with the configured codec
+            return (
+                self.get_error_status(
+                    document, excpt, "rewrite", ["PreconditionFailed"]
+                ),
+                None,
+            )
+
+        return REWRITTEN, response
+
+    def get_error_status(self, document, excpt, operation, skipped_codes):
+        """Skip documents for expected errors, report the others as failures."""
+        if excpt.response["Error"]["Code"] in skipped_codes:
+            return SKIPPED
+
+        self.stderr.write(
+            f"[ERROR] Could not {operation:s} content for {document.id!s}: {excpt}"
+        )
+        return FAILED
@@ -0,0 +1,89 @@
+"""Management command replaying pending write-behind flushes of document contents."""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import ContentFlushInProgressError, Document
+
+
+class Command(BaseCommand):
+    """
+    Write to object storage the buffered contents that were not flushed, e.g. because
+    a worker crashed before running its flush task.
+
+    A buffer is only kept for DOCUMENT_CONTENT_BUFFER_TIMEOUT seconds and each buffered
+    write goes with a save of the document, so only documents updated during this period
+    need to be looked at. Documents for which a flush is still scheduled are skipped.
+    """
+
+    help = __doc__
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of documents checked in the cache at once.",
+        )
+
+    def handle(self, *args, **options):
+        """Execute management command."""
+        buffer_cache = caches[settings.DOCUMENT_CONTENT_BUFFER_CACHE]
+        batch_size = options["batch_size"]
+
+        since = timezone.now() - timedelta(
+            seconds=settings.DOCUMENT_CONTENT_BUFFER_TIMEOUT
+        )
+        document_ids = Document.objects.filter(updated_at__gte=since).values_list(
+            "id", flat=True
+        )
+
+        total_flushed = 0
+        batch = []
+        for document_id in document_ids.iterator(chunk_size=batch_size):
+            batch.append(Document(pk=document_id))
+            if len(batch) >= batch_size:
+                total_flushed += self.flush_batch(buffer_cache, batch)
+                batch = []
+        total_flushed += self.flush_batch(buffer_cache, batch)
+
+        self.stdout.write(
+            f"[INFO] Flushed {total_flushed} pending document content(s)."
+        )
+
+    def flush_batch(self, buffer_cache, documents):
+        """Flush the documents of a batch that have pending content in one cache round trip."""
+        keys = []
+        for document in documents:
+            keys.extend(
+                [
+                    document.get_content_buffer_cache_key(),
+                    document.get_content_flushed_cache_key(),
+                    document.get_content_flush_scheduled_cache_key(),
+                ]
+            )
+        values = buffer_cache.get_many(keys)
+
+        total_flushed = 0
+        for document in documents:
+            buffered = values.get(document.get_content_buffer_cache_key())
+            if (
+                buffered is None
+                or values.get(document.get_content_flushed_cache_key()) == buffered[0]
+                or document.get_content_flush_scheduled_cache_key() in values
+            ):
+                continue
+
+            try:
+                flushed = document.flush_content()
+            except ContentFlushInProgressError:
+                # A worker is flushing it right now
+                continue
+            if flushed:
+                total_flushed += 1
+
+        return total_flushed
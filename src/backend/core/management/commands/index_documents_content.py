@@ -0,0 +1,94 @@
+"""Management command indexing the content of existing documents for full-text search."""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import models
+
+from core.models import Document, DocumentSearchVector
+from core.services.content_text_services import extract_text
+
+
+class Command(BaseCommand):
+    """
+    Index the content of documents for full-text search, e.g. documents written before
+    full-text search was deployed or whose indexing task was lost. Only documents whose
+    content changed since they were last indexed are processed, unless `--all` is given.
+
+    Documents are processed in batches: the contents of a batch are read from object
+    storage and their text is extracted in parallel, then their search vectors are
+    written in one query.
+    """
+
+    help = __doc__
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of documents fetched from the database at once.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=8,
+            help="Number of contents read and extracted in parallel.",
+        )
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Index all documents, even those already indexed.",
+        )
+
+    def handle(self, *args, **options):
+        """Execute management command."""
+        documents = Document.objects.filter(content_digest__isnull=False).only(
+            "id", "content_digest"
+        )
+        if not options["all"]:
+            documents = documents.exclude(
+                search_vector__content_digest=models.F("content_digest")
+            )
+        self.stdout.write(f"[INFO] Found {documents.count()} documents to index...")
+
+        totals = {"indexed": 0, "failed": 0}
+        batch_size = options["batch_size"]
+        with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+            batch = []
+            for document in documents.iterator(chunk_size=batch_size):
+                batch.append(document)
+                if len(batch) >= batch_size:
+                    self.index_batch(executor, batch, totals)
+                    batch = []
+            self.index_batch(executor, batch, totals)
+
+        self.stdout.write(
+            f"[INFO] Done: {totals['indexed']} indexed, {totals['failed']} failed."
+        )
+
+    def index_batch(self, executor, documents, totals):
+        """
+        Extract the text of a batch of documents in parallel and write their search
+        vectors. Workers only talk to object storage, the database is queried from the
+        main thread.
+        """
+        documents_texts = [
+            (document, text)
+            for document, text in zip(
+                documents, executor.map(self.get_text, documents), strict=True
+            )
+            if text is not None
+        ]
+        DocumentSearchVector.index_documents(documents_texts)
+
+        totals["indexed"] += len(documents_texts)
+        totals["failed"] += len(documents) - len(documents_texts)
+
+    def get_text(self, document):
+        """Return the text of the content of a document, or None if it can't be read."""
+        content = document.content
+        if content is None:
+            self.stderr.write(f"[ERROR] Could not read content for {document.id!s}.")
+            return None
+        return extract_text(content)
@@ -0,0 +1,100 @@
+"""Management command filling the version index from object storage."""
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import Document, DocumentVersion
+
+
+class Command(BaseCommand):
+    """
+    Synchronize the version index of each document with the versions of its content
+    actually stored in the bucket, e.g. to index versions written before the index
+    existed. Missing versions are added and versions deleted from the bucket are removed.
+
+    Versions are indexed on write with the date of the response of object storage,
+    which is only precise to the second: their exact modification date is set here.
+    """
+
+    help = __doc__
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of documents fetched from the database at once.",
+        )
+
+    def handle(self, *args, **options):
+        """Execute management command."""
+        paginator = default_storage.connection.meta.client.get_paginator(
+            "list_object_versions"
+        )
+        bucket_name = default_storage.bucket_name
+
+        documents = Document.objects.only("id", "content_digest", "content_size")
+        self.stdout.write(
+            f"[INFO] Found {documents.count()} documents. Starting indexing..."
+        )
+
+        total_created = total_updated = total_deleted = 0
+        for document in documents.iterator(chunk_size=options["batch_size"]):
+            listed_at = timezone.now()
+            versions = {}
+            for page in paginator.paginate(
+                Bucket=bucket_name, Prefix=document.file_key
+            ):
+                for version in page.get("Versions", []):
+                    # The prefix also matches the keys that only start with the file key
+                    if version["Key"] != document.file_key:
+                        continue
+                    indexed_version = DocumentVersion(
+                        document=document,
+                        version_id=version["VersionId"],
+                        etag=version["ETag"],
+                        last_modified=version["LastModified"],
+                    )
+                    # Only the digest of the current content is known
+                    if version["IsLatest"]:
+                        indexed_version.content_digest = document.content_digest
+                        indexed_version.content_size = document.content_size
+                    versions[version["VersionId"]] = indexed_version
+
+            indexed_versions = {
+                indexed.version_id: indexed
+                for indexed in document.versions.only(
+                    "id", "version_id", "last_modified"
+                )
+            }
+            total_created += len(
+                DocumentVersion.objects.bulk_create(
+                    [
+                        version
+                        for version_id, version in versions.items()
+                        if version_id not in indexed_versions
+                    ],
+                    ignore_conflicts=True,
+                )
+            )
+            outdated_versions = []
+            for indexed in indexed_versions.values():
+                listed = versions.get(indexed.version_id)
+                if listed and listed.last_modified != indexed.last_modified:
+                    indexed.last_modified = listed.last_modified
+                    outdated_versions.append(indexed)
+            total_updated += DocumentVersion.objects.bulk_update(
+                outdated_versions, ["last_modified"]
+            )
+            # Versions indexed while listing the bucket are not in the listing
+            total_deleted += (
+                document.versions.filter(created_at__lt=listed_at)
+                .exclude(version_id__in=list(versions))
+                .delete()[0]
+            )
+
+        self.stdout.write(
+            f"[INFO] Indexing done: {total_created} version(s) added, "
+            f"{total_updated} version(s) dated, {total_deleted} version(s) removed."
+        )
@@ -0,0 +1,49 @@
+"""Management command rebuilding the effective roles from document accesses."""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import DocumentAccess, EffectiveDocumentRole
+
+
+class Command(BaseCommand):
+    """
+    Rebuild the effective roles of all document accesses from scratch, e.g. after
+    accesses or documents were modified without going through the models. The table is
+    rebuilt in a transaction so permissions are never checked against a partial table.
+    """
+
+    help = __doc__
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of accesses fetched from the database at once.",
+        )
+
+    def handle(self, *args, **options):
+        """Execute management command."""
+        batch_size = options["batch_size"]
+        accesses = DocumentAccess.objects.select_related("document").only(
+            "id", "user_id", "team", "role", "document__path"
+        )
+        self.stdout.write(
+            f"[INFO] Found {accesses.count()} accesses. Rebuilding effective roles..."
+        )
+
+        total = 0
+        with transaction.atomic():
+            EffectiveDocumentRole.objects.all().delete()
+            batch = []
+            for access in accesses.iterator(chunk_size=batch_size):
+                batch.append(access)
+                if len(batch) >= batch_size:
+                    EffectiveDocumentRole.sync_accesses(batch)
+                    total += len(batch)
+                    batch = []
+            EffectiveDocumentRole.sync_accesses(batch)
+            total += len(batch)
+
+        self.stdout.write(f"[INFO] Rebuild done: {total} effective role(s) created.")
@@ -0,0 +1,89 @@
+"""Management command re-verifying document content digests against object storage."""
+
+import hashlib
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from botocore.exceptions import ClientError
+
+from core.models import Document
+
+
+class Command(BaseCommand):
+    """
+    Re-verify the content digest and size stored on each document against the object
+    actually stored in the bucket, and fix the rows that drifted.
+
+    Digests are computed on the object body so the check is reliable whatever the
+    bucket configuration (multipart uploads or SSE-KMS break the ETag/MD5 equivalence).
+    """
+
+    help = __doc__
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of documents fetched from the database at once.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report documents for which the digest drifted.",
+        )
+
+    def handle(self, *args, **options):
+        """Execute management command."""
+        dry_run = options["dry_run"]
+
+        documents = Document.objects.only("id", "content_digest", "content_size")
+        self.stdout.write(
+            f"[INFO] Found {documents.count()} documents. Starting reconciliation..."
+        )
+
+        total_fixed = 0
+        for document in documents.iterator(chunk_size=options["batch_size"]):
+            # In write-behind mode, the digest may describe content not flushed yet
+            if (
+                settings.DOCUMENT_CONTENT_WRITE_BEHIND
+                and document.is_content_flush_pending()
+            ):
+                continue
+
+            try:
+                # Digests describe the decoded content, whatever the codec
+                response = document.get_content_response()
+            except ClientError as excpt:
+                if excpt.response["Error"]["Code"] not in ["404", "NoSuchKey"]:
+                    self.stderr.write(
+                        f"[ERROR] Could not read content for {document.id!s}: {excpt}"
+                    )
+                    continue
+                content_digest = content_size = None
+            else:
+                body = response["Body"].read()
+                content_digest = hashlib.sha256(body).hexdigest()
+                content_size = len(body)
+
+            if (content_digest, content_size) == (
+                document.content_digest,
+                document.content_size,
+            ):
+                continue
+
+            total_fixed += 1
+            self.stdout.write(
+                f"[INFO] -> Digest drifted for document {document.id!s}: "
+                f"{document.content_digest} != {content_digest}"
+            )
+            if not dry_run:
+                # Use "update" so that "updated_at" is left untouched
+                Document.objects.filter(pk=document.pk).update(
+                    content_digest=content_digest, content_size=content_size
+                )
+
+        self.stdout.write(
+            f"[INFO] Reconciliation done: {total_fixed} document(s) drifted."
+        )
@@ -0,0 +1,148 @@
+"""Management command deleting the document versions the retention policy does not keep."""
+
+from concurrent.futures import ThreadPoolExecutor
+from itertools import groupby
+from operator import attrgetter
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import Document, DocumentVersion
+from core.services.version_retention_services import (
+    MAX_DELETE_OBJECTS,
+    RetentionPolicy,
+    delete_versions_objects,
+    get_latest_version_id,
+)
+
+
+class Command(BaseCommand):
+    """
+    Delete the versions of document contents that are not kept by the retention policy
+    configured in DOCUMENT_VERSIONS_RETENTION. Versions are read from the version index
+    and deleted from object storage with DeleteObjects calls of up to 1000 versions.
+
+    The index may lag behind object storage (e.g. a write that could not be indexed):
+    the version object storage reports as the latest version of each object is never
+    deleted, whatever the index says.
+    """
+
+    help = __doc__
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of documents for which versions are fetched at once.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=8,
+            help="Number of latest versions looked up in parallel.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report the number of versions that would be deleted.",
+        )
+
+    def handle(self, *args, **options):
+        """Execute management command."""
+        policy = RetentionPolicy.from_settings()
+        if not policy.tiers:
+            self.stdout.write("[INFO] No retention policy configured.")
+            return
+
+        now = timezone.now()
+        batch_size = options["batch_size"]
+        document_ids = (
+            DocumentVersion.objects.order_by("document_id")
+            .values_list("document_id", flat=True)
+            .distinct()
+        )
+
+        total_deleted = 0
+        expired = []
+        batch = []
+        with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+            for document_id in document_ids.iterator(chunk_size=batch_size):
+                batch.append(document_id)
+                if len(batch) < batch_size:
+                    continue
+
+                expired.extend(self.get_expired_versions(policy, batch, now))
+                batch = []
+                if len(expired) >= MAX_DELETE_OBJECTS:
+                    total_deleted += self.delete_versions(
+                        executor, expired, options["dry_run"]
+                    )
+                    expired = []
+
+            expired.extend(self.get_expired_versions(policy, batch, now))
+            total_deleted += self.delete_versions(executor, expired, options["dry_run"])
+
+        self.stdout.write(
+            f"[INFO] Thinning done: {total_deleted} version(s) "
+            f"{'would be ' if options['dry_run'] else ''}deleted."
+        )
+
+    def get_expired_versions(self, policy, document_ids, now):
+        """Return the versions of a batch of documents that the policy does not keep."""
+        versions = DocumentVersion.objects.filter(
+            document_id__in=document_ids
+        ).order_by("document_id", "-last_modified", "-id")
+
+        expired = []
+        for _document_id, document_versions in groupby(
+            versions, key=attrgetter("document_id")
+        ):
+            expired.extend(policy.get_expired_versions(list(document_versions), now))
+        return expired
+
+    def exclude_latest_versions(self, executor, versions):
+        """
+        Leave out the versions object storage reports as the latest version of their
+        object, and all the versions of objects whose latest version can't be found.
+        """
+        keys = {Document(pk=version.document_id).file_key for version in versions}
+        latest_versions_ids = dict(
+            zip(keys, executor.map(get_latest_version_id, keys), strict=True)
+        )
+
+        for key, latest_version_id in latest_versions_ids.items():
+            if latest_version_id is None:
+                self.stderr.write(
+                    f"[ERROR] Could not find the latest version of {key:s}, skipping."
+                )
+
+        return [
+            version
+            for version in versions
+            if latest_versions_ids[Document(pk=version.document_id).file_key]
+            not in (None, version.version_id)
+        ]
+
+    def delete_versions(self, executor, versions, dry_run):
+        """Delete versions from object storage and the version index."""
+        versions = self.exclude_latest_versions(executor, versions)
+        if dry_run or not versions:
+            return len(versions)
+
+        versions_by_object = {
+            (Document(pk=version.document_id).file_key, version.version_id): version
+            for version in versions
+        }
+        deleted, errors = delete_versions_objects(list(versions_by_object))
+
+        for error in errors:
+            self.stderr.write(
+                f"[ERROR] Could not delete version {error.get('VersionId')} "
+                f"of {error.get('Key')}: {error.get('Message')}"
+            )
+
+        DocumentVersion.objects.filter(
+            pk__in=[versions_by_object[item].pk for item in deleted]
+        ).delete()
+        return len(deleted)
@@ -0,0 +1,18 @@
+"""Middlewares for the impress core application."""
+
+from core.models import abilities_context
+
+
+class AbilitiesContextMiddleware:
+    """
+    Memoize the roles and abilities computed on documents for the duration of each
+    request, so that they are computed at most once per user and document whether
+    they are needed for permission checks or for serialization.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with abilities_context():
+            return self.get_response(request)
@@ -0,0 +1,35 @@
+# Generated by Django 5.1.6 on 2026-10-17 07:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0018_update_blank_title"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="document",
+            name="content_digest",
+            field=models.CharField(
+                blank=True,
+                editable=False,
+                help_text="SHA-256 hex digest of the content stored in object storage.",
+                max_length=64,
+                null=True,
+                verbose_name="content digest",
+            ),
+        ),
+        migrations.AddField(
+            model_name="document",
+            name="content_size",
+            field=models.PositiveBigIntegerField(
+                blank=True,
+                editable=False,
+                help_text="Size in bytes of the content stored in object storage.",
+                null=True,
+                verbose_name="content size",
+            ),
+        ),
+    ]
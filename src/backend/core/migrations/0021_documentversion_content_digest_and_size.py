@@ -0,0 +1,33 @@
+# Generated by Django 5.1.6 on 2026-10-17 08:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0020_add_document_version"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="documentversion",
+            name="content_digest",
+            field=models.CharField(
+                blank=True,
+                help_text="SHA-256 hex digest of the content of the version.",
+                max_length=64,
+                null=True,
+                verbose_name="content digest",
+            ),
+        ),
+        migrations.AddField(
+            model_name="documentversion",
+            name="content_size",
+            field=models.PositiveBigIntegerField(
+                blank=True,
+                help_text="Size in bytes of the content of the version.",
+                null=True,
+                verbose_name="content size",
+            ),
+        ),
+    ]
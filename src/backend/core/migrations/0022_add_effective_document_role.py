@@ -0,0 +1,125 @@
+# Generated by Django 5.1.6 on 2026-10-17 11:20
+
+import uuid
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def populate_effective_document_roles(apps, schema_editor):
+    """Project existing document accesses on the document tree."""
+    DocumentAccess = apps.get_model("core", "DocumentAccess")
+    EffectiveDocumentRole = apps.get_model("core", "EffectiveDocumentRole")
+
+    EffectiveDocumentRole.objects.bulk_create(
+        (
+            EffectiveDocumentRole(
+                access_id=access.id,
+                user_id=access.user_id,
+                team=access.team,
+                path=access.document.path,
+                role=access.role,
+            )
+            for access in DocumentAccess.objects.select_related("document").iterator(
+                chunk_size=1000
+            )
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0021_documentversion_content_digest_and_size"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EffectiveDocumentRole",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        help_text="primary key for the record as UUID",
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="id",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True,
+                        help_text="date and time at which a record was created",
+                        verbose_name="created on",
+                    ),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(
+                        auto_now=True,
+                        help_text="date and time at which a record was last updated",
+                        verbose_name="updated on",
+                    ),
+                ),
+                ("team", models.CharField(blank=True, max_length=100)),
+                ("path", models.CharField(db_collation="C", max_length=252)),
+                (
+                    "role",
+                    models.CharField(
+                        choices=[
+                            ("reader", "Reader"),
+                            ("editor", "Editor"),
+                            ("administrator", "Administrator"),
+                            ("owner", "Owner"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "access",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="effective_role",
+                        to="core.documentaccess",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="effective_document_roles",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Effective document role",
+                "verbose_name_plural": "Effective document roles",
+                "db_table": "impress_effective_document_role",
+                "indexes": [
+                    models.Index(
+                        condition=models.Q(("user__isnull", False)),
+                        fields=["user", "path"],
+                        name="effective_role_user_path_idx",
+                    ),
+                    models.Index(
+                        condition=models.Q(("team__gt", "")),
+                        fields=["team", "path"],
+                        name="effective_role_team_path_idx",
+                    ),
+                    models.Index(fields=["path"], name="effective_role_path_idx"),
+                ],
+            },
+        ),
+        migrations.RunPython(
+            populate_effective_document_roles,
+            reverse_code=migrations.RunPython.noop,
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.1.6 on 2026-10-17 14:05
+
+from django.db import migrations, models
+
+POPULATE_ANCESTORS_LINKS = """
+UPDATE impress_document AS document
+SET ancestors_links = COALESCE(
+    (
+        SELECT JSONB_AGG(
+            DISTINCT JSONB_BUILD_ARRAY(ancestor.link_reach, ancestor.link_role)
+        )
+        FROM impress_document AS ancestor
+        WHERE ancestor.path = ANY(
+            ARRAY(
+                SELECT LEFT(document.path, length)
+                FROM generate_series(7, LENGTH(document.path) - 7, 7) AS length
+            )
+        )
+    ),
+    '[]'::jsonb
+)
+WHERE document.depth > 1;
+"""
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0022_add_effective_document_role"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="document",
+            name="ancestors_links",
+            field=models.JSONField(
+                blank=True,
+                default=list,
+                editable=False,
+                help_text="Distinct (reach, role) pairs of the links of the ancestors.",
+                verbose_name="ancestors links",
+            ),
+        ),
+        migrations.RunSQL(POPULATE_ANCESTORS_LINKS, reverse_sql=migrations.RunSQL.noop),
+    ]
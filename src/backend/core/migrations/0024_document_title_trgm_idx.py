@@ -0,0 +1,25 @@
+# Generated by Django 5.1.6 on 2026-10-17 15:40
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # The index is built without locking writes on the documents table
+    atomic = False
+
+    dependencies = [
+        ("core", "0023_document_ancestors_links"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="document",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["title"],
+                name="document_title_trgm_idx",
+                opclasses=["gin_trgm_ops"],
+            ),
+        ),
+    ]
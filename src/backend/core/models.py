@@ -1,25 +1,34 @@
 """
 Declare and configure the models for the impress core application
 """
-# pylint: disable=too-many-lines
+# pylint: disable=too-many-lines,too-many-public-methods
 
+import contextvars
 import hashlib
+import io
 import smtplib
+import time
 import uuid
+from collections import Counter
+from contextlib import contextmanager
 from datetime import timedelta
+from email.utils import parsedate_to_datetime
+from functools import partial
 from logging import getLogger
 
 from django.conf import settings
 from django.contrib.auth import models as auth_models
 from django.contrib.auth.base_user import AbstractBaseUser
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.contrib.sites.models import Site
 from django.core import mail, validators
-from django.core.cache import cache
-from django.core.files.base import ContentFile
+from django.core.cache import cache, caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
 from django.core.files.storage import default_storage
 from django.core.mail import send_mail
 from django.db import models, transaction
-from django.db.models.functions import Left, Length
 from django.template.loader import render_to_string
 from django.utils import timezone
 from django.utils.functional import cached_property, lazy
@@ -27,12 +36,31 @@ from django.utils.translation import get_language, override
 from django.utils.translation import gettext_lazy as _
 
 from botocore.exceptions import ClientError
+from kombu.exceptions import OperationalError
 from rest_framework.exceptions import ValidationError
 from timezone_field import TimeZoneField
 from treebeard.mp_tree import MP_Node
 
+from core.services.content_cache_services import document_content_cache
+from core.services.content_codec_services import (
+    decode_content,
+    encode_content,
+    get_object_codec_name,
+)
+from core.services.content_text_services import extract_text
+from core.services.duplication_services import (
+    copy_documents_objects,
+    delete_documents_objects,
+)
+
 logger = getLogger(__name__)
 
+abilities_memo = contextvars.ContextVar("abilities_memo", default=None)
+
+# Texts indexed for full-text search are truncated to keep their vectors well under the
+# 1MB limit of PostgreSQL
+DOCUMENT_SEARCH_MAX_TEXT_LENGTH = 2**18
+
 
 def get_trashbin_cutoff():
     """
@@ -48,6 +76,103 @@ def get_trashbin_cutoff():
     return timezone.now() - timedelta(days=settings.TRASHBIN_CUTOFF_DAYS)
 
 
+@contextmanager
+def abilities_context():
+    """
+    Memoize the roles and abilities computed on documents until the context is exited,
+    typically for the duration of a request (see `AbilitiesContextMiddleware`), so that
+    the permission check and the serialization of a document share them.
+    """
+    token = abilities_memo.set({})
+    try:
+        yield
+    finally:
+        abilities_memo.reset(token)
+
+
+def get_or_compute_in_abilities_context(key, compute):
+    """Return the value memoized for the key in the abilities context or compute it."""
+    memo = abilities_memo.get()
+    if memo is None:
+        return compute()
+
+    try:
+        return memo[key]
+    except KeyError:
+        value = memo[key] = compute()
+        return value
+
+
+def clear_abilities_context():
+    """Forget roles and abilities memoized so far, e.g. after accesses changed."""
+    if (memo := abilities_memo.get()) is not None:
+        memo.clear()
+
+
+def get_cache_generations(generation_keys, timeout=DEFAULT_TIMEOUT):
+    """
+    Return the current value of cache generations, in the order of their keys.
+
+    Missing generations are started from a new value so that an evicted generation
+    does not make the stale entries versioned with it reachable again.
+    """
+    generations = cache.get_many(generation_keys)
+
+    if missing_keys := [key for key in generation_keys if key not in generations]:
+        for key in missing_keys:
+            cache.add(key, time.time_ns(), timeout=timeout)
+        generations.update(cache.get_many(missing_keys))
+
+    return [generations.get(key) for key in generation_keys]
+
+
+def bump_cache_generation(generation_key):
+    """Bump a cache generation, invalidating all the entries versioned with it."""
+    try:
+        cache.incr(generation_key)
+    except ValueError:
+        cache.set(generation_key, time.time_ns())
+
+
+def get_document_roots_generation_key(user_id=None, team=None):
+    """
+    Cache key of the generation versioning the root documents listed to a user, or to
+    the members of a team.
+    """
+    if user_id is not None:
+        return f"user_{user_id!s}_document_roots_generation"
+    return f"team_{team:s}_document_roots_generation"
+
+
+def invalidate_document_roots_cache(user_ids=(), teams=()):
+    """
+    Invalidate the root documents cached for users and for the members of teams.
+
+    Generations are bumped right away and again once the current transaction is
+    committed: roots computed in the meantime from the previous state, and cached under
+    the first new generations, are not served once the change is visible.
+    """
+    generation_keys = [
+        *(
+            get_document_roots_generation_key(user_id=user_id)
+            for user_id in user_ids
+            if user_id is not None
+        ),
+        *(get_document_roots_generation_key(team=team) for team in teams if team),
+    ]
+    if not generation_keys:
+        return
+
+    def bump_generations():
+        cache.set_many(
+            dict.fromkeys(generation_keys, time.time_ns()),
+            timeout=settings.DOCUMENT_LIST_ROOTS_CACHE_TIMEOUT,
+        )
+
+    bump_generations()
+    transaction.on_commit(bump_generations)
+
+
 class LinkRoleChoices(models.TextChoices):
     """Defines the possible roles a link can offer on a document."""
 
@@ -81,6 +206,10 @@ class LinkReachChoices(models.TextChoices):
     PUBLIC = "public", _("Public")  # Even anonymous users can access the document
 
 
+class ContentFlushInProgressError(Exception):
+    """Raised when the content of a document is already being flushed by another worker."""
+
+
 class DuplicateEmailError(Exception):
     """Raised when an email is already associated with a pre-existing user."""
 
@@ -262,7 +391,7 @@ class User(AbstractBaseUser, BaseModel, auth_models.PermissionsMixin):
         if not valid_invitations.exists():
             return
 
-        DocumentAccess.objects.bulk_create(
+        accesses = DocumentAccess.objects.bulk_create(
             [
                 DocumentAccess(
                     user=self, document=invitation.document, role=invitation.role
@@ -270,6 +399,7 @@ class User(AbstractBaseUser, BaseModel, auth_models.PermissionsMixin):
                 for invitation in valid_invitations
             ]
         )
+        EffectiveDocumentRole.sync_accesses(accesses)
 
         # Set creator of documents if not yet set (e.g. documents created via server-to-server API)
         document_ids = [invitation.document_id for invitation in valid_invitations]
@@ -293,6 +423,19 @@ class User(AbstractBaseUser, BaseModel, auth_models.PermissionsMixin):
         """
         return []
 
+    def get_document_roots_generation_keys(self):
+        """
+        Return the keys of the cache generations versioning the root documents listed
+        to the user: one for the user and one for each of their teams.
+        """
+        return [
+            get_document_roots_generation_key(user_id=self.pk),
+            *(
+                get_document_roots_generation_key(team=team)
+                for team in sorted(self.teams)
+            ),
+        ]
+
 
 class BaseAccess(BaseModel):
     """Base model for accesses to handle resources."""
@@ -367,6 +510,29 @@ class BaseAccess(BaseModel):
         }
 
 
+class PathAndAncestorsPaths(models.Func):
+    """
+    Array of the path of a node and of the paths of its ancestors, computed in SQL from
+    a path expression (e.g. `OuterRef("path")`) by cutting it every `steplen` characters.
+    """
+
+    template = (
+        "ARRAY(SELECT LEFT(node.path, length) "
+        "FROM (SELECT %(expressions)s AS path) AS node, "
+        "generate_series(%(steplen)d, LENGTH(node.path), %(steplen)d) AS length)"
+    )
+    output_field = ArrayField(models.CharField())
+
+
+class DistinctLinks(models.Func):
+    """Aggregate the distinct (reach, role) pairs of links as a JSON list of pairs."""
+
+    template = (
+        "COALESCE(JSONB_AGG(DISTINCT JSONB_BUILD_ARRAY(%(expressions)s)), '[]'::jsonb)"
+    )
+    output_field = models.JSONField()
+
+
 class Document(MP_Node, BaseModel):
     """Pad document carrying the content."""
 
@@ -389,8 +555,31 @@ class Document(MP_Node, BaseModel):
     )
     deleted_at = models.DateTimeField(null=True, blank=True)
     ancestors_deleted_at = models.DateTimeField(null=True, blank=True)
+    content_digest = models.CharField(
+        _("content digest"),
+        max_length=64,
+        null=True,
+        blank=True,
+        editable=False,
+        help_text=_("SHA-256 hex digest of the content stored in object storage."),
+    )
+    content_size = models.PositiveBigIntegerField(
+        _("content size"),
+        null=True,
+        blank=True,
+        editable=False,
+        help_text=_("Size in bytes of the content stored in object storage."),
+    )
+    ancestors_links = models.JSONField(
+        _("ancestors links"),
+        default=list,
+        blank=True,
+        editable=False,
+        help_text=_("Distinct (reach, role) pairs of the links of the ancestors."),
+    )
 
     _content = None
+    _saved_links = None
 
     # Tree structure
     alphabet = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
@@ -404,6 +593,14 @@ class Document(MP_Node, BaseModel):
         ordering = ("path",)
         verbose_name = _("Document")
         verbose_name_plural = _("Documents")
+        indexes = [
+            # Trigram index narrowing title searches (see `DocumentFilter.filter_q`)
+            GinIndex(
+                fields=["title"],
+                name="document_title_trgm_idx",
+                opclasses=["gin_trgm_ops"],
+            ),
+        ]
         constraints = [
             models.CheckConstraint(
                 check=(
@@ -418,34 +615,136 @@ class Document(MP_Node, BaseModel):
         return str(self.title) if self.title else str(_("Untitled Document"))
 
     def save(self, *args, **kwargs):
-        """Write content to object storage only if _content has changed."""
-        super().save(*args, **kwargs)
+        """
+        Write content to object storage only if _content has changed.
+
+        Change detection compares the digest of the new content with the digest persisted
+        on the row, so it does not need a round trip to object storage. The digest and the
+        row are updated in the same transaction as the upload: if the upload fails, the
+        row keeps pointing to the previous content.
+
+        In write-behind mode, the content is buffered in a cache instead of being uploaded
+        once the transaction is committed, and a worker flushes it to object storage
+        later (see `buffer_content`).
+
+        The read-through content cache entry of the replaced content is invalidated and
+        the new content is indexed for full-text search asynchronously.
+
+        Content is compressed at rest if a codec is configured (see `put_content_object`)
+        but the digest and size always describe the decoded content.
+
+        If the link reach or role changed, the links inherited by the descendants are
+        recomputed in the same transaction (see `sync_ancestors_links`), the
+        authorization decisions cached on the subtree are invalidated and the abilities
+        memoized in the abilities context are forgotten.
+        """
+        bytes_content = None
+        previous_digest, previous_size = self.content_digest, self.content_size
 
         if self._content:
-            file_key = self.file_key
             bytes_content = self._content.encode("utf-8")
+            content_digest = hashlib.sha256(bytes_content).hexdigest()
 
-            # Attempt to directly check if the object exists using the storage client.
-            try:
-                response = default_storage.connection.meta.client.head_object(
-                    Bucket=default_storage.bucket_name, Key=file_key
-                )
-            except ClientError as excpt:
-                # If the error is a 404, the object doesn't exist, so we should create it.
-                if excpt.response["Error"]["Code"] == "404":
-                    has_changed = True
-                else:
-                    raise
+            if content_digest == self.content_digest:
+                bytes_content = None
             else:
-                # Compare the existing ETag with the MD5 hash of the new content.
-                has_changed = (
-                    response["ETag"].strip('"')
-                    != hashlib.md5(bytes_content).hexdigest()  # noqa: S324
-                )
+                self.content_digest = content_digest
+                self.content_size = len(bytes_content)
+                if update_fields := kwargs.get("update_fields"):
+                    kwargs["update_fields"] = {
+                        *update_fields,
+                        "content_digest",
+                        "content_size",
+                    }
+
+        links = self.get_links_to_save(kwargs.get("update_fields"))
+        sync_links = (
+            links is not None and not self._state.adding and links != self._saved_links
+        )
 
-            if has_changed:
-                content_file = ContentFile(bytes_content)
-                default_storage.save(file_key, content_file)
+        try:
+            with transaction.atomic():
+                super().save(*args, **kwargs)
+
+                if sync_links:
+                    Document.sync_ancestors_links(self.path)
+                    clear_abilities_context()
+                    transaction.on_commit(self.invalidate_auth_cache)
+                    transaction.on_commit(self.invalidate_document_roots_cache)
+
+                if bytes_content is None:
+                    pass
+                elif settings.DOCUMENT_CONTENT_WRITE_BEHIND:
+                    # Content of a save rolled back must never be read nor flushed
+                    transaction.on_commit(
+                        partial(self.buffer_content, self.content_digest, self._content)
+                    )
+                else:
+                    self.put_content_object(bytes_content, self.content_digest)
+        except Exception:
+            self.content_digest, self.content_size = previous_digest, previous_size
+            raise
+
+        if links is not None:
+            self._saved_links = links
+
+        if bytes_content is not None:
+            # Drop the replaced content and warm the cache for the next reads
+            if previous_digest:
+                document_content_cache.delete(self.pk, previous_digest)
+            document_content_cache.set(self.pk, self.content_digest, self._content)
+            transaction.on_commit(self.schedule_content_indexing)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Remember the persisted links to detect changes when the document is saved."""
+        instance = super().from_db(db, field_names, values)
+        if {"link_reach", "link_role"}.issubset(field_names):
+            instance._saved_links = (instance.link_reach, instance.link_role)  # noqa: SLF001
+        return instance
+
+    def get_links_to_save(self, update_fields=None):
+        """Return the (reach, role) link written by a save, or None if not written."""
+        link_fields = {"link_reach", "link_role"}
+        if not link_fields.isdisjoint(self.get_deferred_fields()):
+            return None
+        if update_fields is not None and link_fields.isdisjoint(update_fields):
+            return None
+        return (self.link_reach, self.link_role)
+
+    def add_child(self, **kwargs):
+        """Add a child inheriting the links of the document and of its ancestors."""
+        link_reach, link_role, ancestors_links = Document.objects.values_list(
+            "link_reach", "link_role", "ancestors_links"
+        ).get(pk=self.pk)
+        children_ancestors_links = sorted(
+            {(reach, role) for reach, role in ancestors_links}
+            | {(link_reach, link_role)}
+        )
+        children_ancestors_links = [list(link) for link in children_ancestors_links]
+
+        if "instance" in kwargs:
+            kwargs["instance"].ancestors_links = children_ancestors_links
+        else:
+            kwargs["ancestors_links"] = children_ancestors_links
+        return super().add_child(**kwargs)
+
+    @classmethod
+    def sync_ancestors_links(cls, path):
+        """
+        Recompute the links inherited by a document and its descendants in one query,
+        e.g. after the links of the document changed or the document was moved.
+        """
+        return cls.objects.filter(path__startswith=path).update(
+            ancestors_links=models.Subquery(
+                cls.objects.filter(
+                    cls.get_ancestors_lookup(models.OuterRef("path"), "path")
+                )
+                .exclude(path=models.OuterRef("path"))
+                .order_by()
+                .values(links=DistinctLinks("link_reach", "link_role"))
+            )
+        )
 
     @property
     def key_base(self):
@@ -463,14 +762,35 @@ class Document(MP_Node, BaseModel):
 
     @property
     def content(self):
-        """Return the json content from object storage if available"""
+        """Return the json content from the write-behind buffer, the cache or object storage"""
         if self._content is None and self.id:
+            if settings.DOCUMENT_CONTENT_WRITE_BEHIND and (
+                buffered := self.get_buffered_content()
+            ):
+                self._content = buffered[1]
+                return self._content
+
+            if self.content_digest and (
+                cached := document_content_cache.get(self.pk, self.content_digest)
+            ):
+                self._content = cached
+                return self._content
+
             try:
                 response = self.get_content_response()
             except (FileNotFoundError, ClientError):
                 pass
             else:
-                self._content = response["Body"].read().decode("utf-8")
+                bytes_content = response["Body"].read()
+                self._content = bytes_content.decode("utf-8")
+                # Only cache what the digest describes, the object may have drifted
+                if (
+                    self.content_digest
+                    and hashlib.sha256(bytes_content).hexdigest() == self.content_digest
+                ):
+                    document_content_cache.set(
+                        self.pk, self.content_digest, self._content
+                    )
         return self._content
 
     @content.setter
@@ -481,52 +801,235 @@ class Document(MP_Node, BaseModel):
 
         self._content = content
 
+    def get_content_buffer_cache_key(self):
+        """Cache key under which the latest content is buffered in write-behind mode."""
+        return f"document_{self.id!s}_content_buffer"
+
+    def get_content_flushed_cache_key(self):
+        """Cache key storing the digest of the last buffered content that was flushed."""
+        return f"document_{self.id!s}_content_flushed"
+
+    def get_content_flush_scheduled_cache_key(self):
+        """Cache key marking that a flush is already scheduled for the current window."""
+        return f"document_{self.id!s}_content_flush_scheduled"
+
+    def get_content_flush_lock_cache_key(self):
+        """Cache key locking the content while it is flushed to object storage."""
+        return f"document_{self.id!s}_content_flush_lock"
+
+    def get_buffered_content(self):
+        """Return the buffered (digest, content) pair or None if nothing is buffered."""
+        buffer_cache = caches[settings.DOCUMENT_CONTENT_BUFFER_CACHE]
+        return buffer_cache.get(self.get_content_buffer_cache_key())
+
+    def buffer_content(self, content_digest, content):
+        """
+        Buffer a content in the shared cache and make sure a flush is scheduled.
+
+        A flush is scheduled only if none is pending, so content is written to object
+        storage at most once per flush window whatever the number of saves. If the worker
+        crashes, the buffer is kept until `DOCUMENT_CONTENT_BUFFER_TIMEOUT` so the flush
+        can be replayed (see the `flush_documents_content` management command).
+        """
+        # pylint: disable=import-outside-toplevel
+        from core.tasks.documents import flush_document_content
+
+        buffer_cache = caches[settings.DOCUMENT_CONTENT_BUFFER_CACHE]
+        buffer_cache.set(
+            self.get_content_buffer_cache_key(),
+            (content_digest, content),
+            timeout=settings.DOCUMENT_CONTENT_BUFFER_TIMEOUT,
+        )
+
+        flush_window = settings.DOCUMENT_CONTENT_FLUSH_WINDOW
+        if buffer_cache.add(
+            self.get_content_flush_scheduled_cache_key(), True, timeout=flush_window
+        ):
+            try:
+                flush_document_content.apply_async(
+                    (str(self.pk),), countdown=flush_window
+                )
+            except OperationalError as exc:
+                # The content is safe in the buffer, the flush will be replayed
+                logger.warning("Could not schedule flush for %s: %s", self.pk, exc)
+
+    def discard_buffered_content(self):
+        """Forget the buffered content, e.g. when it is replaced in object storage."""
+        caches[settings.DOCUMENT_CONTENT_BUFFER_CACHE].delete_many(
+            [
+                self.get_content_buffer_cache_key(),
+                self.get_content_flushed_cache_key(),
+            ]
+        )
+
+    def flush_content(self, wait=False):
+        """
+        Write the buffered content to object storage if it was not flushed yet.
+        Return True if an object was written.
+
+        Flushes of a document are serialized with a lock so that a slow flush can't
+        overwrite the newer content written by a concurrent one. If the lock is held,
+        ContentFlushInProgressError is raised, unless `wait` is set to wait for it.
+        """
+        buffer_cache = caches[settings.DOCUMENT_CONTENT_BUFFER_CACHE]
+        lock_timeout = settings.DOCUMENT_CONTENT_FLUSH_LOCK_TIMEOUT
+        lock_cache_key = self.get_content_flush_lock_cache_key()
+        deadline = time.monotonic() + (lock_timeout if wait else 0)
+        while not buffer_cache.add(lock_cache_key, True, timeout=lock_timeout):
+            if time.monotonic() >= deadline:
+                raise ContentFlushInProgressError(
+                    f"The content of document {self.pk!s} is being flushed."
+                )
+            time.sleep(0.1)
+
+        try:
+            # Release the schedule marker first: a save happening during the flush must
+            # schedule its own flush
+            buffer_cache.delete(self.get_content_flush_scheduled_cache_key())
+
+            buffered = self.get_buffered_content()
+            if buffered is None:
+                return False
+
+            content_digest, content = buffered
+            flushed_cache_key = self.get_content_flushed_cache_key()
+            if buffer_cache.get(flushed_cache_key) == content_digest:
+                return False
+
+            self.put_content_object(content.encode("utf-8"), content_digest)
+
+            # The buffer is not deleted to avoid losing a concurrent write: it expires on
+            # its own and keeps serving reads in the meantime.
+            buffer_cache.set(
+                flushed_cache_key,
+                content_digest,
+                timeout=settings.DOCUMENT_CONTENT_BUFFER_TIMEOUT,
+            )
+            return True
+        finally:
+            buffer_cache.delete(lock_cache_key)
+
+    def get_content_indexing_scheduled_cache_key(self):
+        """Cache key marking that the content is already scheduled for indexing."""
+        return f"document_{self.id!s}_content_indexing_scheduled"
+
+    def schedule_content_indexing(self):
+        """
+        Schedule the indexing of the content for full-text search if none is pending, so
+        that the content is indexed at most once per DOCUMENT_SEARCH_INDEXING_DELAY
+        whatever the number of saves: the task indexes the latest content.
+        """
+        # pylint: disable=import-outside-toplevel
+        from core.tasks.documents import index_document_content
+
+        delay = settings.DOCUMENT_SEARCH_INDEXING_DELAY
+        if cache.add(self.get_content_indexing_scheduled_cache_key(), True, delay):
+            try:
+                index_document_content.apply_async((str(self.pk),), countdown=delay)
+            except OperationalError as exc:
+                # The "index_documents_content" command will catch up
+                logger.warning("Could not schedule indexing for %s: %s", self.pk, exc)
+
+    def index_content(self):
+        """
+        Index the text of the content for full-text search if the content changed since
+        it was last indexed. Return True if the search vector was updated.
+        """
+        # Release the schedule marker first: a save happening during the indexing must
+        # schedule its own indexing
+        cache.delete(self.get_content_indexing_scheduled_cache_key())
+
+        if DocumentSearchVector.objects.filter(
+            document=self, content_digest=self.content_digest or ""
+        ).exists():
+            return False
+
+        # Leave unreadable contents unindexed so they are retried
+        if (content := self.content) is None and self.content_digest:
+            return False
+
+        DocumentSearchVector.index_documents([(self, extract_text(content))])
+        return True
+
+    def is_content_flush_pending(self):
+        """Return True if the buffered content was not written to object storage yet."""
+        buffered = self.get_buffered_content()
+        if buffered is None:
+            return False
+
+        buffer_cache = caches[settings.DOCUMENT_CONTENT_BUFFER_CACHE]
+        return buffer_cache.get(self.get_content_flushed_cache_key()) != buffered[0]
+
+    def put_content_object(self, bytes_content, content_digest):
+        """
+        Write content to object storage, encoded with the codec configured in the
+        DOCUMENT_CONTENT_CODEC setting. The codec is recorded in the object metadata so
+        that the object can be decoded whatever the setting when it is read.
+
+        The version created in object storage is recorded in the version index.
+        """
+        body, metadata = encode_content(bytes_content)
+        response = default_storage.connection.meta.client.put_object(
+            Bucket=default_storage.bucket_name,
+            Key=self.file_key,
+            Body=body,
+            Metadata=metadata,
+        )
+
+        if version := DocumentVersion.from_put_response(
+            self, response, content_digest, len(bytes_content)
+        ):
+            # Use "bulk_create" to skip the validation queries of "full_clean"
+            DocumentVersion.objects.bulk_create([version], ignore_conflicts=True)
+
     def get_content_response(self, version_id=""):
-        """Get the content in a specific version of the document"""
-        return default_storage.connection.meta.client.get_object(
+        """
+        Get the content in a specific version of the document. The body of the response
+        is decoded, objects stored raw are returned as is.
+        """
+        response = default_storage.connection.meta.client.get_object(
             Bucket=default_storage.bucket_name, Key=self.file_key, VersionId=version_id
         )
+        if get_object_codec_name(response.get("Metadata")):
+            body = decode_content(response["Body"].read(), response["Metadata"])
+            response["Body"] = io.BytesIO(body)
+            response["ContentLength"] = len(body)
+        return response
 
     def get_versions_slice(self, from_version_id="", min_datetime=None, page_size=None):
-        """Get document versions from object storage with pagination and starting conditions"""
-        # /!\ Trick here /!\
-        # The "KeyMarker" and "VersionIdMarker" fields must either be both set or both not set.
-        # The error we get otherwise is not helpful at all.
-        markers = {}
-        if from_version_id:
-            markers.update(
-                {"KeyMarker": self.file_key, "VersionIdMarker": from_version_id}
-            )
-
+        """
+        Get document versions from the version index with keyset pagination and starting
+        conditions. The latest version is the current content and is never listed.
+        """
         real_page_size = (
             min(page_size, settings.DOCUMENT_VERSIONS_PAGE_SIZE)
             if page_size
             else settings.DOCUMENT_VERSIONS_PAGE_SIZE
         )
 
-        response = default_storage.connection.meta.client.list_object_versions(
-            Bucket=default_storage.bucket_name,
-            Prefix=self.file_key,
-            # compensate the latest version that we exclude below and get one more to
-            # know if there are more pages
-            MaxKeys=real_page_size + 2,
-            **markers,
-        )
+        queryset = self.versions.order_by("-last_modified", "-id")
+        queryset = queryset.exclude(pk=models.Subquery(queryset.values("pk")[:1]))
+        queryset = queryset.filter(last_modified__gte=min_datetime or self.created_at)
 
-        min_last_modified = min_datetime or self.created_at
+        if from_version_id:
+            marker = self.versions.filter(version_id=from_version_id).first()
+            if marker is None:
+                queryset = queryset.none()
+            else:
+                queryset = queryset.filter(
+                    models.Q(last_modified__lt=marker.last_modified)
+                    | models.Q(last_modified=marker.last_modified, id__lt=marker.id)
+                )
+
+        # Get one more version to know if there are more pages
         versions = [
             {
-                key_snake: version[key_camel]
-                for key_snake, key_camel in [
-                    ("etag", "ETag"),
-                    ("is_latest", "IsLatest"),
-                    ("last_modified", "LastModified"),
-                    ("version_id", "VersionId"),
-                ]
+                "etag": version.etag,
+                "is_latest": False,
+                "last_modified": version.last_modified,
+                "version_id": version.version_id,
             }
-            for version in response.get("Versions", [])
-            if version["LastModified"] >= min_last_modified
-            and version["IsLatest"] is False
+            for version in queryset[: real_page_size + 1]
         ]
         results = versions[:real_page_size]
 
@@ -545,25 +1048,275 @@ class Document(MP_Node, BaseModel):
             "count": count,
         }
 
+    def restore_version(self, version):
+        """
+        Make a version the current content of the document. The object is copied in
+        object storage so the content never goes through the application. The digest
+        and size of the version become those of the document.
+
+        Versions indexed by the "index_documents_versions" command have no digest: their
+        content is read once to compute it, and the digest is recorded in the index.
+
+        In write-behind mode, the pending content is flushed first and the buffer is
+        discarded once the restoration is committed.
+        """
+        if version.content_digest is None:
+            bytes_content = self.get_content_response(version.version_id)["Body"].read()
+            version.content_digest = hashlib.sha256(bytes_content).hexdigest()
+            version.content_size = len(bytes_content)
+            DocumentVersion.objects.filter(pk=version.pk).update(
+                content_digest=version.content_digest,
+                content_size=version.content_size,
+            )
+
+        if settings.DOCUMENT_CONTENT_WRITE_BEHIND:
+            # The buffer may hold the only copy of the current content, which must stay
+            # readable if the restoration fails
+            self.flush_content(wait=True)
+
+        previous_digest, previous_size = self.content_digest, self.content_size
+        self._content = None
+        self.content_digest = version.content_digest
+        self.content_size = version.content_size
+
+        try:
+            with transaction.atomic():
+                self.save(
+                    update_fields=["content_digest", "content_size", "updated_at"]
+                )
+                response = default_storage.connection.meta.client.copy_object(
+                    Bucket=default_storage.bucket_name,
+                    Key=self.file_key,
+                    CopySource={
+                        "Bucket": default_storage.bucket_name,
+                        "Key": self.file_key,
+                        "VersionId": version.version_id,
+                    },
+                )
+                if new_version := DocumentVersion.from_put_response(
+                    self,
+                    {
+                        "VersionId": response.get("VersionId"),
+                        "ETag": response["CopyObjectResult"]["ETag"],
+                        "LastModified": response["CopyObjectResult"]["LastModified"],
+                    },
+                    version.content_digest,
+                    version.content_size,
+                ):
+                    DocumentVersion.objects.bulk_create([new_version])
+                if settings.DOCUMENT_CONTENT_WRITE_BEHIND:
+                    # The buffer would be read and flushed over the restored content
+                    transaction.on_commit(self.discard_buffered_content)
+                transaction.on_commit(self.schedule_content_indexing)
+        except Exception:
+            self.content_digest, self.content_size = previous_digest, previous_size
+            raise
+
+    @transaction.atomic
+    def duplicate(self, user, with_descendants=False):
+        """
+        Copy the document, and its descendants if requested, to a new root document owned
+        by the user. Deleted descendants are not copied.
+
+        Rows of the copies are inserted at once, their paths being computed from those of
+        the copied documents. Contents and attachments are copied in parallel in object
+        storage and attachment URLs are rewritten to point to the copied attachments.
+        Copies only get a content digest if an object was copied for them, and the copied
+        objects are deleted if the duplication fails. Copies of unchanged contents get
+        the search vectors of their source, the others are indexed after the commit.
+        """
+        sources = [self]
+        if with_descendants:
+            copied_paths = {self.path}
+            for descendant in self.get_descendants().filter(deleted_at__isnull=True):
+                # Skip the descendants of deleted documents
+                if descendant.path[: -self.steplen] in copied_paths:
+                    sources.append(descendant)
+                    copied_paths.add(descendant.path)
+
+        if len(sources) > settings.DOCUMENT_DUPLICATION_MAX_DOCUMENTS:
+            raise ValidationError(
+                {
+                    "with_descendants": [
+                        _("This document has too many descendants to be duplicated.")
+                    ]
+                }
+            )
+
+        if settings.DOCUMENT_CONTENT_WRITE_BEHIND:
+            # Copy the latest content of each document
+            for source in sources:
+                source.flush_content(wait=True)
+
+        nb_children = Counter(source.path[: -self.steplen] for source in sources[1:])
+        root = Document.add_root(
+            title=_("Copy of {title:s}").format(title=self.title)[:255]
+            if self.title
+            else None,
+            excerpt=self.excerpt,
+            creator=user,
+            numchild=nb_children[self.path],
+        )
+        copies = [root]
+        copies.extend(
+            Document.objects.bulk_create(
+                Document(
+                    title=source.title,
+                    excerpt=source.excerpt,
+                    link_reach=source.link_reach,
+                    link_role=source.link_role,
+                    creator=user,
+                    path=f"{root.path:s}{source.path[len(self.path) :]:s}",
+                    depth=source.depth - self.depth + 1,
+                    numchild=nb_children[source.path],
+                )
+                for source in sources[1:]
+            )
+        )
+        if len(copies) > 1:
+            Document.sync_ancestors_links(root.path)
+        DocumentAccess.objects.create(document=root, user=user, role=RoleChoices.OWNER)
+
+        try:
+            self.copy_duplicated_objects(sources, copies)
+        except Exception:
+            # Rows are rolled back with the transaction, objects must be deleted
+            delete_documents_objects([copy.key_base for copy in copies])
+            raise
+        return root
+
+    @staticmethod
+    def copy_duplicated_objects(sources, copies):
+        """
+        Copy the objects of duplicated documents to their copies, then record the digest,
+        size, version and search vector of the contents that were actually copied.
+        """
+        versions, copied, unchanged = [], [], {}
+        for source, copy, (response, rewritten) in zip(
+            sources,
+            copies,
+            copy_documents_objects(
+                [
+                    (source.key_base, copy.key_base)
+                    for source, copy in zip(sources, copies, strict=True)
+                ]
+            ),
+            strict=True,
+        ):
+            if response is None:
+                continue
+
+            if rewritten is not None:
+                copy.content_digest = hashlib.sha256(rewritten).hexdigest()
+                copy.content_size = len(rewritten)
+            else:
+                copy.content_digest = source.content_digest
+                copy.content_size = source.content_size
+                unchanged[source.pk] = copy
+            copied.append(copy)
+            if version := DocumentVersion.from_put_response(
+                copy, response, copy.content_digest, copy.content_size
+            ):
+                versions.append(version)
+
+        Document.objects.bulk_update(copied, ["content_digest", "content_size"])
+        DocumentVersion.objects.bulk_create(versions, ignore_conflicts=True)
+
+        # Copy the up to date search vectors of the sources along with their content
+        indexed = {
+            copy.pk
+            for copy in DocumentSearchVector.copy_vectors(
+                [
+                    (source, unchanged[source.pk])
+                    for source in sources
+                    if source.pk in unchanged
+                ]
+            )
+        }
+        for copy in copied:
+            if copy.pk not in indexed:
+                transaction.on_commit(copy.schedule_content_indexing)
+
     def delete_version(self, version_id):
-        """Delete a version from object storage given its version id"""
-        return default_storage.connection.meta.client.delete_object(
+        """Delete a version from object storage and the version index given its version id"""
+        response = default_storage.connection.meta.client.delete_object(
             Bucket=default_storage.bucket_name, Key=self.file_key, VersionId=version_id
         )
+        self.versions.filter(version_id=version_id).delete()
+        return response
+
+    @classmethod
+    def get_path_and_ancestors_paths(cls, path):
+        """Return the path of a node and the paths of its ancestors, from the root."""
+        return [
+            path[:length] for length in range(cls.steplen, len(path) + 1, cls.steplen)
+        ]
+
+    @classmethod
+    def get_ancestors_lookup(cls, path, field_name="document__path"):
+        """
+        Return a filter matching a document and its ancestors on `field_name`.
+
+        The paths of the ancestors are enumerated, in Python for a known path or in SQL
+        for a path expression, so the filter is served by the index on paths instead of
+        comparing each path with a prefix of the document's path.
+        """
+        if isinstance(path, str):
+            return models.Q(
+                **{f"{field_name:s}__in": cls.get_path_and_ancestors_paths(path)}
+            )
+
+        return models.Q(
+            **{
+                field_name: models.Func(
+                    PathAndAncestorsPaths(path, steplen=cls.steplen),
+                    function="ANY",
+                    output_field=models.CharField(),
+                )
+            }
+        )
+
+    def get_nb_accesses_generation_key(self, path=None):
+        """
+        Cache key of the generation of the number of accesses of a document, addressed by
+        its path so that the keys of all ancestors are known without a query.
+        """
+        return f"document_nb_accesses_generation_{path or self.path:s}"
 
     def get_nb_accesses_cache_key(self):
-        """Generate a unique cache key for each document."""
-        return f"document_{self.id!s}_nb_accesses"
+        """
+        Generate a unique cache key for each document. The key is versioned with the
+        generations of the document and of all its ancestors, so that bumping the
+        generation of a document invalidates the cache of its whole subtree.
+        """
+        generations = get_cache_generations(
+            [
+                self.get_nb_accesses_generation_key(path)
+                for path in self.get_path_and_ancestors_paths(self.path)
+            ]
+        )
+        version = hashlib.sha256(
+            ":".join(str(generation) for generation in generations).encode()
+        ).hexdigest()
+        return f"document_{self.id!s}_nb_accesses_{version:s}"
 
     @property
     def nb_accesses(self):
-        """Calculate the number of accesses."""
+        """
+        Calculate the number of accesses, unless it was annotated on the instance (see
+        `DocumentViewSet.annotate_nb_accesses`).
+        """
+        try:
+            return self.computed_nb_accesses
+        except AttributeError:
+            pass
+
         cache_key = self.get_nb_accesses_cache_key()
         nb_accesses = cache.get(cache_key)
 
         if nb_accesses is None:
-            nb_accesses = DocumentAccess.objects.filter(
-                document__path=Left(models.Value(self.path), Length("document__path")),
+            nb_accesses = EffectiveDocumentRole.objects.filter(
+                self.get_ancestors_lookup(self.path, "path")
             ).count()
             cache.set(cache_key, nb_accesses)
 
@@ -571,11 +1324,96 @@ class Document(MP_Node, BaseModel):
 
     def invalidate_nb_accesses_cache(self):
         """
-        Invalidate the cache for number of accesses, including on affected descendants.
+        Invalidate the cache for number of accesses, including on affected descendants,
+        by bumping the generation of the document which versions all their cache keys.
+        """
+        bump_cache_generation(self.get_nb_accesses_generation_key())
+
+    @classmethod
+    def get_auth_generation_keys(cls, path):
+        """
+        Cache keys of the generations of the authorization decisions on the node at
+        `path` and its ancestors. Bumping the generation of a document invalidates the
+        decisions cached on its whole subtree.
         """
-        for document in Document.objects.filter(path__startswith=self.path).only("id"):
-            cache_key = document.get_nb_accesses_cache_key()
-            cache.delete(cache_key)
+        return [
+            f"document_auth_generation_{ancestor_path:s}"
+            for ancestor_path in cls.get_path_and_ancestors_paths(path)
+        ]
+
+    @staticmethod
+    def get_auth_cache_key(document_id, user, action):
+        """Cache key of the authorization decision of a user for an action."""
+        principal = user.pk if user.is_authenticated else "anonymous"
+        return f"document_{document_id!s}_auth_{action:s}_{principal!s}"
+
+    @classmethod
+    def get_cached_auth_abilities(cls, document_id, user, action):
+        """
+        Return the abilities cached by `get_auth_abilities` for a document without
+        fetching it, or None if they are not cached or were invalidated since.
+        """
+        if not settings.DOCUMENT_AUTH_CACHE_TIMEOUT:
+            return None
+
+        entry = cache.get(cls.get_auth_cache_key(document_id, user, action))
+        if entry is None:
+            return None
+
+        path, generations, abilities = entry
+        generation_keys = cls.get_auth_generation_keys(path)
+        current_generations = cache.get_many(generation_keys)
+        if [current_generations.get(key) for key in generation_keys] != generations:
+            return None
+        return abilities
+
+    def get_auth_abilities(self, user, action):
+        """
+        Return the abilities of a user on the document and cache them for a short time
+        to authorize the next subrequests of the user for this action without queries
+        (see `get_cached_auth_abilities`).
+        """
+        if not settings.DOCUMENT_AUTH_CACHE_TIMEOUT:
+            return self.get_abilities(user)
+
+        # Read generations first so an invalidation during computation is not missed
+        generations = get_cache_generations(self.get_auth_generation_keys(self.path))
+        abilities = self.get_abilities(user)
+        cache.set(
+            self.get_auth_cache_key(self.pk, user, action),
+            (self.path, generations, abilities),
+            timeout=settings.DOCUMENT_AUTH_CACHE_TIMEOUT,
+        )
+        return abilities
+
+    def invalidate_auth_cache(self, path=None):
+        """
+        Invalidate the authorization decisions cached on the document, or on the node
+        at `path`, and on their subtree.
+        """
+        bump_cache_generation(self.get_auth_generation_keys(path or self.path)[-1])
+
+    def invalidate_document_roots_cache(self, path=None):
+        """
+        Invalidate the root documents cached for the users and teams that may list the
+        document, or the node at `path`, or one of their descendants: those with an
+        access or a link trace in the subtree.
+        """
+        path = path or self.path
+        principals = EffectiveDocumentRole.objects.filter(
+            path__startswith=path
+        ).values_list("user_id", "team")
+        traced_user_ids = LinkTrace.objects.filter(
+            document__path__startswith=path
+        ).values_list("user_id", flat=True)
+
+        user_ids, teams = set(traced_user_ids), set()
+        for user_id, team in principals.distinct():
+            if user_id is None:
+                teams.add(team)
+            else:
+                user_ids.add(user_id)
+        invalidate_document_roots_cache(user_ids=user_ids, teams=teams)
 
     def get_roles(self, user):
         """Return the roles a user has on a document."""
@@ -585,43 +1423,101 @@ class Document(MP_Node, BaseModel):
         try:
             roles = self.user_roles or []
         except AttributeError:
-            try:
-                roles = DocumentAccess.objects.filter(
-                    models.Q(user=user) | models.Q(team__in=user.teams),
-                    document__path=Left(
-                        models.Value(self.path), Length("document__path")
-                    ),
-                ).values_list("role", flat=True)
-            except (models.ObjectDoesNotExist, IndexError):
-                roles = []
+            roles = get_or_compute_in_abilities_context(
+                ("roles", user.pk, self.path),
+                lambda: list(
+                    EffectiveDocumentRole.objects.filter(
+                        models.Q(user=user) | models.Q(team__in=user.teams),
+                        self.get_ancestors_lookup(self.path, "path"),
+                    ).values_list("role", flat=True)
+                ),
+            )
         return roles
 
     @cached_property
     def links_definitions(self):
-        """Get links reach/role definitions for the current document and its ancestors."""
+        """
+        Get links reach/role definitions for the current document and its ancestors.
+        The links of ancestors are denormalized on the document so no query is needed.
+        """
         links_definitions = {self.link_reach: {self.link_role}}
 
         # Ancestors links definitions are only interesting if the document is not the highest
         # ancestor to which the current user has access. Look for the annotation:
         if self.depth > 1 and not getattr(self, "is_highest_ancestor_for_user", False):
-            for ancestor in self.get_ancestors().values("link_reach", "link_role"):
-                links_definitions.setdefault(ancestor["link_reach"], set()).add(
-                    ancestor["link_role"]
-                )
+            for link_reach, link_role in self.ancestors_links:
+                links_definitions.setdefault(link_reach, set()).add(link_role)
 
         return links_definitions
 
     def get_abilities(self, user):
+        """
+        Return abilities for a given user on the document, memoized in the abilities
+        context for the current state of the document.
+        """
+        key = (
+            "abilities",
+            user.pk,
+            self.pk,
+            self.path,
+            self.link_reach,
+            self.link_role,
+            self.ancestors_deleted_at,
+            getattr(self, "is_highest_ancestor_for_user", False),
+        )
+        return dict(
+            get_or_compute_in_abilities_context(
+                key, lambda: self.compute_abilities(user)
+            )
+        )
+
+    def compute_abilities(self, user):
         """
         Compute and return abilities for a given user on the document.
         """
-        roles = set(
-            self.get_roles(user)
-        )  # at this point only roles based on specific access
+        return self.get_abilities_for_signature(self.get_abilities_signature(user))
+
+    def get_abilities_signature(
+        self, user, links_definitions=None, ai_allow_reach_from=None
+    ):
+        """
+        Return the inputs from which abilities are computed as a hashable tuple, so that
+        documents with the same signature share the same abilities.
+        """
+        if links_definitions is None:
+            links_definitions = self.links_definitions
+        if ai_allow_reach_from is None:
+            ai_allow_reach_from = settings.AI_ALLOW_REACH_FROM
+
+        return (
+            # At this point only roles based on specific access
+            frozenset(self.get_roles(user)),
+            frozenset(
+                (link_reach, frozenset(link_roles))
+                for link_reach, link_roles in links_definitions.items()
+            ),
+            bool(self.ancestors_deleted_at),
+            user.is_authenticated,
+            ai_allow_reach_from,
+        )
+
+    @staticmethod
+    def get_abilities_for_signature(signature):
+        """
+        Compute and return abilities from a signature (see `get_abilities_signature`).
+        """
+        (
+            roles,
+            links_definitions,
+            has_deleted_ancestors,
+            is_authenticated,
+            ai_allow_reach_from,
+        ) = signature
+        links_definitions = dict(links_definitions)
 
         # Characteristics that are based only on specific access
         is_owner = RoleChoices.OWNER in roles
-        is_deleted = self.ancestors_deleted_at and not is_owner
+        is_deleted = has_deleted_ancestors and not is_owner
         is_owner_or_admin = (is_owner or RoleChoices.ADMIN in roles) and not is_deleted
 
         # Compute access roles before adding link roles because we don't
@@ -634,13 +1530,10 @@ class Document(MP_Node, BaseModel):
         ) and not is_deleted
 
         # Add roles provided by the document link, taking into account its ancestors
-
-        # Add roles provided by the document link
-        links_definitions = self.links_definitions
         public_roles = links_definitions.get(LinkReachChoices.PUBLIC, set())
         authenticated_roles = (
             links_definitions.get(LinkReachChoices.AUTHENTICATED, set())
-            if user.is_authenticated
+            if is_authenticated
             else set()
         )
         roles = roles | public_roles | authenticated_roles
@@ -650,12 +1543,11 @@ class Document(MP_Node, BaseModel):
             is_owner_or_admin or RoleChoices.EDITOR in roles
         ) and not is_deleted
 
-        ai_allow_reach_from = settings.AI_ALLOW_REACH_FROM
         ai_access = any(
             [
                 ai_allow_reach_from == LinkReachChoices.PUBLIC and can_update,
                 ai_allow_reach_from == LinkReachChoices.AUTHENTICATED
-                and user.is_authenticated
+                and is_authenticated
                 and can_update,
                 ai_allow_reach_from == LinkReachChoices.RESTRICTED
                 and can_update_from_access,
@@ -669,13 +1561,14 @@ class Document(MP_Node, BaseModel):
             "ai_translate": ai_access,
             "attachment_upload": can_update,
             "children_list": can_get,
-            "children_create": can_update and user.is_authenticated,
+            "children_create": can_update and is_authenticated,
             "collaboration_auth": can_get,
             "destroy": is_owner,
-            "favorite": can_get and user.is_authenticated,
+            "duplicate": can_get and is_authenticated,
+            "favorite": can_get and is_authenticated,
             "link_configuration": is_owner_or_admin,
             "invite_owner": is_owner,
-            "move": is_owner_or_admin and not self.ancestors_deleted_at,
+            "move": is_owner_or_admin and not has_deleted_ancestors,
             "partial_update": can_update,
             "restore": is_owner,
             "retrieve": can_get,
@@ -683,6 +1576,7 @@ class Document(MP_Node, BaseModel):
             "update": can_update,
             "versions_destroy": is_owner_or_admin,
             "versions_list": has_access_role,
+            "versions_restore": has_access_role and can_update,
             "versions_retrieve": has_access_role,
         }
 
@@ -749,11 +1643,41 @@ class Document(MP_Node, BaseModel):
 
         self.send_email(subject, [email], context, language)
 
+    @transaction.atomic
+    def move(self, target, pos=None):
+        """
+        Move the document in the tree and update the path of the effective roles of the
+        moved subtree and of the nodes shifted to make room for it, as well as the links
+        inherited by the moved subtree. Authorization decisions cached on the previous
+        and new locations are invalidated, as well as the root documents cached for the
+        users listing the moved subtree.
+        """
+        previous_path = self.path
+        super().move(target, pos=pos)
+
+        path = Document.objects.values_list("path", flat=True).get(pk=self.pk)
+        EffectiveDocumentRole.sync_paths([previous_path, path[: -self.steplen]])
+        Document.sync_ancestors_links(path)
+        self.invalidate_auth_cache(previous_path)
+        self.invalidate_auth_cache(path[: -self.steplen] or path)
+        self.invalidate_document_roots_cache(path)
+        clear_abilities_context()
+
+    def delete(self, *args, **kwargs):
+        """
+        Override delete to invalidate the authorization decisions cached on the document
+        and on its descendants, which are deleted along with it.
+        """
+        path = self.path
+        result = super().delete(*args, **kwargs)
+        self.invalidate_auth_cache(path)
+        return result
+
     @transaction.atomic
     def soft_delete(self):
         """
         Soft delete the document, marking the deletion on descendants.
-        We still keep the .delete() method untouched for programmatic purposes.
+        We still keep the .delete() method deleting for programmatic purposes.
         """
         if self.deleted_at or self.ancestors_deleted_at:
             raise RuntimeError(
@@ -773,6 +1697,9 @@ class Document(MP_Node, BaseModel):
         self.get_descendants().filter(ancestors_deleted_at__isnull=True).update(
             ancestors_deleted_at=self.ancestors_deleted_at
         )
+        self.invalidate_auth_cache()
+        self.invalidate_document_roots_cache()
+        clear_abilities_context()
 
     @transaction.atomic
     def restore(self):
@@ -821,6 +1748,37 @@ class Document(MP_Node, BaseModel):
         self.get_descendants().exclude(exclude_condition).update(
             ancestors_deleted_at=self.ancestors_deleted_at
         )
+        self.invalidate_auth_cache()
+        self.invalidate_document_roots_cache()
+        clear_abilities_context()
+
+
+class DocumentAbilitiesEngine:
+    """
+    Compute the abilities of a user on a batch of documents, typically a page of a list.
+
+    Abilities only depend on a few inputs (see `Document.get_abilities_signature`) that
+    most documents of a page share, so they are computed once per distinct signature.
+    Settings are read once.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self.ai_allow_reach_from = settings.AI_ALLOW_REACH_FROM
+        self.abilities = {}
+
+    def get_abilities(self, document):
+        """Return the abilities of the user on a document."""
+        signature = document.get_abilities_signature(
+            self.user, ai_allow_reach_from=self.ai_allow_reach_from
+        )
+        try:
+            abilities = self.abilities[signature]
+        except KeyError:
+            abilities = self.abilities[signature] = (
+                Document.get_abilities_for_signature(signature)
+            )
+        return dict(abilities)
 
 
 class LinkTrace(BaseModel):
@@ -854,6 +1812,11 @@ class LinkTrace(BaseModel):
     def __str__(self):
         return f"{self.user!s} trace on document {self.document!s}"
 
+    def save(self, *args, **kwargs):
+        """Override save to invalidate the root documents cached for the user."""
+        super().save(*args, **kwargs)
+        invalidate_document_roots_cache(user_ids=[self.user_id])
+
 
 class DocumentFavorite(BaseModel):
     """Relation model to store a user's favorite documents."""
@@ -886,6 +1849,111 @@ class DocumentFavorite(BaseModel):
         return f"{self.user!s} favorite on document {self.document!s}"
 
 
+def get_response_date(response):
+    """
+    Return the date at which object storage answered a request, from the "Date" header
+    of its response. The header is only precise to the second: the local time is kept
+    when both clocks agree so that successive writes stay ordered.
+    """
+    now = timezone.now()
+    try:
+        date = parsedate_to_datetime(
+            response["ResponseMetadata"]["HTTPHeaders"]["date"]
+        )
+    except (KeyError, TypeError, ValueError):
+        return now
+    return now if abs(now - date) < timedelta(seconds=1) else date
+
+
+class DocumentVersion(BaseModel):
+    """
+    Index of the versions of the content of a document stored in object storage, so
+    that versions can be filtered and paginated in the database instead of listing
+    object versions. Rows are added each time a version is written.
+    """
+
+    document = models.ForeignKey(
+        Document,
+        on_delete=models.CASCADE,
+        related_name="versions",
+    )
+    version_id = models.CharField(_("version id"), max_length=1024)
+    etag = models.CharField(_("ETag"), max_length=255, blank=True)
+    last_modified = models.DateTimeField(_("last modified"))
+    content_digest = models.CharField(
+        _("content digest"),
+        max_length=64,
+        blank=True,
+        null=True,
+        help_text=_("SHA-256 hex digest of the content of the version."),
+    )
+    content_size = models.PositiveBigIntegerField(
+        _("content size"),
+        blank=True,
+        null=True,
+        help_text=_("Size in bytes of the content of the version."),
+    )
+
+    class Meta:
+        db_table = "impress_document_version"
+        verbose_name = _("Document version")
+        verbose_name_plural = _("Document versions")
+        constraints = [
+            models.UniqueConstraint(
+                fields=["document", "version_id"],
+                name="unique_document_version_id",
+                violation_error_message=_(
+                    "This version is already indexed for this document."
+                ),
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["document", "-last_modified", "-id"],
+                name="document_version_keyset_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"Version {self.version_id:s} of document {self.document_id!s}"
+
+    @classmethod
+    def from_put_response(cls, document, response, content_digest, content_size):
+        """
+        Return an unsaved instance for the version created by a `put_object` call or None
+        if the bucket is not versioned ("VersionId" is missing or "null").
+
+        The modification date is the one of object storage: copy responses carry it
+        ("LastModified"), the date of the response is used for the other writes to
+        avoid a round trip. The "index_documents_versions" command sets the exact dates.
+        """
+        version_id = response.get("VersionId")
+        if not version_id or version_id == "null":
+            return None
+
+        return cls(
+            document=document,
+            version_id=version_id,
+            etag=response.get("ETag", ""),
+            last_modified=response.get("LastModified") or get_response_date(response),
+            content_digest=content_digest,
+            content_size=content_size,
+        )
+
+
+class DocumentAccessQuerySet(models.QuerySet):
+    """Queryset of document accesses."""
+
+    def delete(self):
+        """
+        Forget the roles and abilities memoized in the abilities context when accesses
+        are deleted in bulk, bypassing `DocumentAccess.delete`.
+        """
+        result = super().delete()
+        clear_abilities_context()
+        return result
+
+
 class DocumentAccess(BaseAccess):
     """Relation model to give access to a document for a user or a team with a role."""
 
@@ -895,6 +1963,8 @@ class DocumentAccess(BaseAccess):
         related_name="accesses",
     )
 
+    objects = DocumentAccessQuerySet.as_manager()
+
     class Meta:
         db_table = "impress_document_access"
         ordering = ("-created_at",)
@@ -925,14 +1995,31 @@ class DocumentAccess(BaseAccess):
         return f"{self.user!s} is {self.role:s} in document {self.document!s}"
 
     def save(self, *args, **kwargs):
-        """Override save to clear the document's cache for number of accesses."""
-        super().save(*args, **kwargs)
+        """
+        Override save to maintain the effective role of the access, clear the document's
+        cache for number of accesses and authorization decisions, the root documents
+        cached for the user or team and the roles and abilities memoized in the
+        abilities context.
+        """
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            EffectiveDocumentRole.sync_accesses([self])
         self.document.invalidate_nb_accesses_cache()
+        self.document.invalidate_auth_cache()
+        invalidate_document_roots_cache(user_ids=[self.user_id], teams=[self.team])
+        clear_abilities_context()
 
     def delete(self, *args, **kwargs):
-        """Override delete to clear the document's cache for number of accesses."""
+        """
+        Override delete to clear the document's cache for number of accesses and
+        authorization decisions, the root documents cached for the user or team and the
+        roles and abilities memoized in the abilities context.
+        """
         super().delete(*args, **kwargs)
         self.document.invalidate_nb_accesses_cache()
+        self.document.invalidate_auth_cache()
+        invalidate_document_roots_cache(user_ids=[self.user_id], teams=[self.team])
+        clear_abilities_context()
 
     def get_abilities(self, user):
         """
@@ -941,6 +2028,179 @@ class DocumentAccess(BaseAccess):
         return self._get_abilities(self.document, user)
 
 
+class EffectiveDocumentRole(BaseModel):
+    """
+    Projection of a document access on the document tree: the role a user or a team has
+    on the subtree rooted at the document of the access, along with the path of this
+    document. The roles of a principal on a document and its ancestors are found with a
+    single indexed lookup on (principal, path), without joining documents.
+
+    Effective roles are maintained when accesses are saved or deleted and when documents
+    are moved. See the "check_effective_document_roles" and
+    "rebuild_effective_document_roles" management commands.
+    """
+
+    access = models.OneToOneField(
+        DocumentAccess, on_delete=models.CASCADE, related_name="effective_role"
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="effective_document_roles",
+        null=True,
+        blank=True,
+    )
+    team = models.CharField(max_length=100, blank=True)
+    path = models.CharField(max_length=7 * 36, db_collation="C")
+    role = models.CharField(max_length=20, choices=RoleChoices.choices)
+
+    class Meta:
+        db_table = "impress_effective_document_role"
+        verbose_name = _("Effective document role")
+        verbose_name_plural = _("Effective document roles")
+        indexes = [
+            models.Index(
+                fields=["user", "path"],
+                name="effective_role_user_path_idx",
+                condition=models.Q(user__isnull=False),
+            ),
+            models.Index(
+                fields=["team", "path"],
+                name="effective_role_team_path_idx",
+                condition=models.Q(team__gt=""),
+            ),
+            models.Index(fields=["path"], name="effective_role_path_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.user or self.team!s} is {self.role:s} under {self.path:s}"
+
+    @classmethod
+    def from_access(cls, access):
+        """Return an unsaved effective role for an access."""
+        return cls(
+            access=access,
+            user_id=access.user_id,
+            team=access.team,
+            path=access.document.path,
+            role=access.role,
+        )
+
+    @classmethod
+    def sync_accesses(cls, accesses):
+        """
+        Create or update the effective roles of accesses in one query, skipping the
+        validation queries of "full_clean". Roles memoized in the abilities context are
+        forgotten.
+        """
+        cls.objects.bulk_create(
+            [cls.from_access(access) for access in accesses],
+            update_conflicts=True,
+            unique_fields=["access"],
+            update_fields=["user", "team", "path", "role", "updated_at"],
+        )
+        clear_abilities_context()
+
+    @classmethod
+    def sync_paths(cls, path_prefixes):
+        """
+        Update the path of the effective roles under the given path prefixes whose
+        document was moved.
+        """
+        prefixes_filter = models.Q()
+        for path_prefix in path_prefixes:
+            prefixes_filter |= models.Q(path__startswith=path_prefix)
+
+        return (
+            cls.objects.filter(prefixes_filter)
+            .exclude(path=models.F("access__document__path"))
+            .update(
+                path=models.Subquery(
+                    DocumentAccess.objects.filter(
+                        pk=models.OuterRef("access_id")
+                    ).values("document__path")[:1]
+                )
+            )
+        )
+
+
+class DocumentSearchVector(BaseModel):
+    """
+    Full-text search vector of the text extracted from the content of a document, kept
+    in a side table so that indexing does not rewrite documents. It is maintained
+    asynchronously after content writes (see `Document.schedule_content_indexing`) and
+    records the digest of the content it was computed from.
+
+    See the "index_documents_content" management command to index existing documents.
+    """
+
+    document = models.OneToOneField(
+        Document, on_delete=models.CASCADE, related_name="search_vector"
+    )
+    content_digest = models.CharField(max_length=64, blank=True)
+    vector = SearchVectorField(null=True, blank=True)
+
+    class Meta:
+        db_table = "impress_document_search_vector"
+        verbose_name = _("Document search vector")
+        verbose_name_plural = _("Document search vectors")
+        indexes = [GinIndex(fields=["vector"], name="document_search_vector_idx")]
+
+    def __str__(self):
+        return f"Search vector of document {self.document_id!s}"
+
+    @classmethod
+    def index_documents(cls, documents_texts):
+        """
+        Create or update the search vectors of (document, text) pairs in one query,
+        skipping the validation queries of "full_clean". Texts are truncated to keep
+        vectors under the size limit of PostgreSQL.
+        """
+        cls.objects.bulk_create(
+            [
+                cls(
+                    document=document,
+                    content_digest=document.content_digest or "",
+                    vector=SearchVector(
+                        models.Value(text[:DOCUMENT_SEARCH_MAX_TEXT_LENGTH]),
+                        config=settings.DOCUMENT_SEARCH_CONFIG,
+                    ),
+                )
+                for document, text in documents_texts
+            ],
+            update_conflicts=True,
+            unique_fields=["document"],
+            update_fields=["content_digest", "vector", "updated_at"],
+        )
+
+    @classmethod
+    def copy_vectors(cls, sources_copies):
+        """
+        Give copies of documents the search vectors of their source, when they were
+        computed from the content the copies were given. Return the copies indexed.
+        """
+        copies = {source.pk: copy for source, copy in sources_copies}
+        indexed_sources = [
+            source_id
+            for source_id, content_digest in cls.objects.filter(
+                document_id__in=copies.keys()
+            ).values_list("document_id", "content_digest")
+            if content_digest == (copies[source_id].content_digest or "")
+        ]
+        cls.objects.bulk_create(
+            cls(
+                document=copies[source_id],
+                content_digest=copies[source_id].content_digest or "",
+                # Copy the vector in the database rather than parsing it back
+                vector=models.Subquery(
+                    cls.objects.filter(document_id=source_id).values("vector")[:1]
+                ),
+            )
+            for source_id in indexed_sources
+        )
+        return [copies[source_id] for source_id in indexed_sources]
+
+
 class Template(BaseModel):
     """HTML and CSS code used for formatting the print around the MarkDown body."""
 
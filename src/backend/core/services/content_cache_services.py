@@ -0,0 +1,134 @@
+"""Document content cache services."""
+
+import threading
+import zlib
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+RAW_MARKER = b"r"
+ZLIB_MARKER = b"z"
+
+
+class LocalLRUCache:
+    """
+    Process-local cache evicting its least recently used entries to stay under a total
+    size in bytes. Values must be bytes.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.size = 0
+
+    def get(self, key):
+        """Return the value stored for a key and mark it as recently used."""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, max_size):
+        """Store a value and evict the least recently used entries beyond max_size."""
+        if len(value) > max_size:
+            return
+
+        with self._lock:
+            if (previous := self._entries.pop(key, None)) is not None:
+                self.size -= len(previous)
+            self._entries[key] = value
+            self.size += len(value)
+            while self.size > max_size:
+                _key, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def delete(self, key):
+        """Remove a key from the cache if it is present."""
+        with self._lock:
+            if (previous := self._entries.pop(key, None)) is not None:
+                self.size -= len(previous)
+
+    def clear(self):
+        """Remove all entries from the cache."""
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+class DocumentContentCache:
+    """
+    Read-through cache for document contents with a process-local LRU (L1) in front of
+    a shared Django cache (L2).
+
+    Entries are keyed by document id and content digest: a digest identifies a content
+    so entries never go stale and a save only has to drop the entry of the content it
+    replaces. Settings are read on each call so they can be changed at runtime.
+    """
+
+    def __init__(self):
+        self.local = LocalLRUCache()
+
+    @property
+    def shared(self):
+        """Return the shared cache or None if it is disabled."""
+        alias = settings.DOCUMENT_CONTENT_CACHE
+        return caches[alias] if alias else None
+
+    @staticmethod
+    def get_cache_key(document_id, digest):
+        """Key of the cache entry holding the content of a document for a digest."""
+        return f"document_{document_id!s}_content_{digest:s}"
+
+    @staticmethod
+    def encode(content):
+        """Encode a content to bytes, compressing it if it is big enough."""
+        bytes_content = content.encode("utf-8")
+        min_size = settings.DOCUMENT_CONTENT_CACHE_COMPRESS_MIN_SIZE
+        if min_size and len(bytes_content) >= min_size:
+            return ZLIB_MARKER + zlib.compress(bytes_content)
+        return RAW_MARKER + bytes_content
+
+    @staticmethod
+    def decode(value):
+        """Decode a content encoded with `encode`."""
+        marker, data = value[:1], value[1:]
+        if marker == ZLIB_MARKER:
+            data = zlib.decompress(data)
+        return data.decode("utf-8")
+
+    def get(self, document_id, digest):
+        """Return the cached content of a document or None if it is not cached."""
+        key = self.get_cache_key(document_id, digest)
+        value = self.local.get(key)
+
+        if value is None and (shared := self.shared) is not None:
+            value = shared.get(key)
+            if value is not None:
+                self.local.set(
+                    key, value, settings.DOCUMENT_CONTENT_CACHE_LOCAL_MAX_SIZE
+                )
+
+        return None if value is None else self.decode(value)
+
+    def set(self, document_id, digest, content):
+        """Cache the content of a document unless it exceeds the per entry budget."""
+        value = self.encode(content)
+        if len(value) > settings.DOCUMENT_CONTENT_CACHE_MAX_ENTRY_SIZE:
+            return
+
+        key = self.get_cache_key(document_id, digest)
+        self.local.set(key, value, settings.DOCUMENT_CONTENT_CACHE_LOCAL_MAX_SIZE)
+        if (shared := self.shared) is not None:
+            shared.set(key, value, timeout=settings.DOCUMENT_CONTENT_CACHE_TIMEOUT)
+
+    def delete(self, document_id, digest):
+        """Drop the cached content of a document for a digest."""
+        key = self.get_cache_key(document_id, digest)
+        self.local.delete(key)
+        if (shared := self.shared) is not None:
+            shared.delete(key)
+
+
+document_content_cache = DocumentContentCache()
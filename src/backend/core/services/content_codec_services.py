@@ -0,0 +1,62 @@
+"""Document content codec services."""
+
+import gzip
+
+from django.conf import settings
+
+# Key of the object metadata naming the codec with which an object body was encoded.
+# Objects without it were written before compression at rest and are stored raw.
+CODEC_METADATA_KEY = "codec"
+
+
+class GzipCodec:
+    """Gzip codec, deterministic so that identical contents give identical bodies."""
+
+    name = "gzip"
+
+    @staticmethod
+    def compress(data):
+        """Compress bytes."""
+        return gzip.compress(data, mtime=0)
+
+    @staticmethod
+    def decompress(data):
+        """Decompress bytes."""
+        return gzip.decompress(data)
+
+
+CODECS = {codec.name: codec for codec in [GzipCodec]}
+
+
+class UnknownCodecError(ValueError):
+    """Raised when an object was encoded with a codec that is not supported."""
+
+
+def get_codec(name):
+    """Return the codec registered for a name."""
+    try:
+        return CODECS[name]
+    except KeyError as err:
+        raise UnknownCodecError(f"Unknown content codec: {name:s}") from err
+
+
+def get_object_codec_name(metadata):
+    """Return the name of the codec of an object from its metadata, None if raw."""
+    return (metadata or {}).get(CODEC_METADATA_KEY) or None
+
+
+def encode_content(bytes_content):
+    """
+    Encode bytes with the codec configured in DOCUMENT_CONTENT_CODEC and return them
+    along with the object metadata to store next to them.
+    """
+    if not (name := settings.DOCUMENT_CONTENT_CODEC):
+        return bytes_content, {}
+    return get_codec(name).compress(bytes_content), {CODEC_METADATA_KEY: name}
+
+
+def decode_content(body, metadata):
+    """Decode an object body according to the codec named in its metadata."""
+    if (name := get_object_codec_name(metadata)) is None:
+        return body
+    return get_codec(name).decompress(body)
@@ -0,0 +1,525 @@
+"""Extraction of the plain text of document contents for full-text search."""
+
+import base64
+import binascii
+import bisect
+
+# Content references of the structs of a Yjs update (see yjs/src/structs/Item.js)
+GC, DELETED, JSON, BINARY, STRING, EMBED, FORMAT, TYPE, ANY, DOC, SKIP = range(11)
+# References of the shared types whose content starts with a name
+XML_ELEMENT, XML_HOOK = 3, 5
+
+
+class UpdateDecodingError(ValueError):
+    """Raised when a content is not a valid Yjs update."""
+
+
+class UpdateDecoder:
+    """
+    Minimal decoder of Yjs updates (v1 encoding), reading the integers and strings
+    encoded with lib0 that make up the structs of an update.
+    """
+
+    def __init__(self, update):
+        self.update = update
+        self.position = 0
+
+    def read_uint8(self):
+        """Read one byte."""
+        try:
+            value = self.update[self.position]
+        except IndexError as exc:
+            raise UpdateDecodingError("Unexpected end of update.") from exc
+        self.position += 1
+        return value
+
+    def read_var_uint(self):
+        """Read an unsigned integer encoded on a variable number of bytes."""
+        value, shift = 0, 0
+        while True:
+            byte = self.read_uint8()
+            value |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return value
+            shift += 7
+
+    def read_var_int(self):
+        """Read a signed integer encoded on a variable number of bytes."""
+        byte = self.read_uint8()
+        value, shift = byte & 0x3F, 6
+        sign = -1 if byte & 0x40 else 1
+        while byte & 0x80:
+            byte = self.read_uint8()
+            value |= (byte & 0x7F) << shift
+            shift += 7
+        return sign * value
+
+    def read_bytes(self, length):
+        """Read a given number of bytes."""
+        if self.position + length > len(self.update):
+            raise UpdateDecodingError("Unexpected end of update.")
+        value = self.update[self.position : self.position + length]
+        self.position += length
+        return value
+
+    def read_var_bytes(self):
+        """Read bytes prefixed with their length."""
+        return self.read_bytes(self.read_var_uint())
+
+    def read_var_string(self):
+        """Read an UTF-8 string prefixed with its length in bytes."""
+        try:
+            return self.read_var_bytes().decode("utf-8")
+        except UnicodeDecodeError as exc:
+            raise UpdateDecodingError("Invalid string in update.") from exc
+
+    def read_any(self):
+        """Skip a value encoded with the lib0 "any" encoding."""
+        kind = self.read_uint8()
+        if kind in (127, 126, 121, 120):  # undefined, null, false, true
+            return
+        if kind == 125:
+            self.read_var_int()
+        elif kind == 124:
+            self.read_bytes(4)
+        elif kind in (123, 122):
+            self.read_bytes(8)
+        elif kind == 119:
+            self.read_var_string()
+        elif kind == 118:
+            for _i in range(self.read_var_uint()):
+                self.read_var_string()
+                self.read_any()
+        elif kind == 117:
+            for _i in range(self.read_var_uint()):
+                self.read_any()
+        elif kind == 116:
+            self.read_var_bytes()
+        else:
+            raise UpdateDecodingError(f"Unknown value type {kind:d} in update.")
+
+    def read_content(self, content_ref):
+        """
+        Read the content of an item and return its length in the clock of its client,
+        along with its text if it is a string.
+        """
+        if content_ref == STRING:
+            text = self.read_var_string()
+            return len(text.encode("utf-16-le")) // 2, text
+
+        length = 1
+        if content_ref in (DELETED, JSON, ANY):
+            length = self.read_var_uint()
+            for _i in range(length if content_ref != DELETED else 0):
+                if content_ref == JSON:
+                    self.read_var_string()
+                else:
+                    self.read_any()
+        elif content_ref == BINARY:
+            self.read_var_bytes()
+        elif content_ref == EMBED:
+            self.read_var_string()
+        elif content_ref == FORMAT:
+            self.read_var_string()
+            self.read_var_string()
+        elif content_ref == TYPE:
+            if self.read_var_uint() in (XML_ELEMENT, XML_HOOK):
+                self.read_var_string()
+        elif content_ref == DOC:
+            self.read_var_string()
+            self.read_any()
+        else:
+            raise UpdateDecodingError(
+                f"Unknown content type {content_ref:d} in update."
+            )
+        return length, None
+
+    def read_structs(self):
+        """
+        Return the items of the update and the ranges of clocks garbage collected, by
+        client. Items are `Item` instances, not integrated yet.
+        """
+        items, collected = {}, {}
+        for _i in range(self.read_var_uint()):
+            nb_structs = self.read_var_uint()
+            client = self.read_var_uint()
+            clock = self.read_var_uint()
+            client_items = items.setdefault(client, [])
+            for _j in range(nb_structs):
+                info = self.read_uint8()
+                content_ref = info & 0x1F
+                if content_ref in (GC, SKIP):
+                    length = self.read_var_uint()
+                    if content_ref == GC:
+                        collected.setdefault(client, []).append((clock, length))
+                    clock += length
+                    continue
+
+                item = Item(client, clock, content_ref)
+                if info & 0x80:
+                    item.origin = (self.read_var_uint(), self.read_var_uint())
+                if info & 0x40:
+                    item.right_origin = (self.read_var_uint(), self.read_var_uint())
+                if not info & 0xC0:
+                    if self.read_var_uint() == 1:
+                        item.parent = self.read_var_string()
+                    else:
+                        item.parent = (self.read_var_uint(), self.read_var_uint())
+                    if info & 0x20:
+                        item.parent_sub = self.read_var_string()
+
+                item.length, text = self.read_content(content_ref)
+                if text is not None:
+                    item.units = text.encode("utf-16-le")
+                # Some encoders write empty strings, which take no clock
+                if item.length:
+                    client_items.append(item)
+                clock += item.length
+        return items, collected
+
+    def read_delete_set(self):
+        """Return the ranges of deleted clocks of the update, by client."""
+        delete_set = {}
+        for _i in range(self.read_var_uint()):
+            client = self.read_var_uint()
+            delete_set[client] = [
+                (self.read_var_uint(), self.read_var_uint())
+                for _j in range(self.read_var_uint())
+            ]
+        return delete_set
+
+
+class Item:
+    """
+    An item of a Yjs update: a piece of content inserted in a shared type, between the
+    items it was inserted after (origin) and before (right origin) by its author.
+    """
+
+    __slots__ = (
+        "client",
+        "clock",
+        "content_ref",
+        "deleted",
+        "left",
+        "length",
+        "origin",
+        "parent",
+        "parent_sub",
+        "right",
+        "right_origin",
+        "start",
+        "units",
+    )
+
+    def __init__(self, client, clock, content_ref):
+        self.client = client
+        self.clock = clock
+        self.content_ref = content_ref
+        self.length = 1
+        self.origin = self.right_origin = self.parent = self.parent_sub = None
+        self.left = self.right = None
+        # First child of the type created by the item, if any
+        self.start = None
+        # Text of string items, in UTF-16 code units as clocks count them
+        self.units = None
+        self.deleted = False
+
+    def split(self, diff):
+        """Split the item after `diff` clocks and return the right part."""
+        right = Item(self.client, self.clock + diff, self.content_ref)
+        right.length = self.length - diff
+        right.origin = (self.client, self.clock + diff - 1)
+        right.right_origin = self.right_origin
+        right.parent, right.parent_sub = self.parent, self.parent_sub
+        if self.units is not None:
+            right.units = self.units[2 * diff :]
+            self.units = self.units[: 2 * diff]
+        self.length = diff
+
+        right.left, right.right = self, self.right
+        if self.right is not None:
+            self.right.left = right
+        self.right = right
+        return right
+
+
+class Root:
+    """A shared type at the root of a document, e.g. the fragment of an editor."""
+
+    __slots__ = ("start",)
+
+    def __init__(self):
+        self.start = None
+
+
+class SharedDocument:
+    """
+    Integrate the items of a Yjs update in their shared types, in the order a Yjs client
+    gives them, to read the text of the document.
+    """
+
+    def __init__(self, update):
+        decoder = UpdateDecoder(update)
+        self.pending, self.collected = decoder.read_structs()
+        self.delete_set = decoder.read_delete_set()
+        self.roots = {}
+        # Integrated items of each client, sorted by clock
+        self.items = {}
+        self.clocks = {}
+        self.pending_clocks = {
+            client: [item.clock for item in client_items]
+            for client, client_items in self.pending.items()
+        }
+        self.integrated, self.visiting = set(), set()
+
+        for client_items in self.pending.values():
+            for item in client_items:
+                self.integrate(item)
+        self.apply_delete_set()
+
+    def find(self, item_id):
+        """Return the integrated item containing a clock of a client, if any."""
+        client, clock = item_id
+        clocks = self.clocks.get(client, [])
+        index = bisect.bisect_right(clocks, clock) - 1
+        if index < 0:
+            return None
+        item = self.items[client][index]
+        return item if clock < item.clock + item.length else None
+
+    def find_clean_end(self, item_id):
+        """Return the integrated item ending at a clock of a client, splitting it."""
+        item = self.find(item_id)
+        if item is not None and item_id[1] < item.clock + item.length - 1:
+            self.register(item.split(item_id[1] - item.clock + 1))
+        return item
+
+    def find_clean_start(self, item_id):
+        """Return the integrated item starting at a clock of a client, splitting it."""
+        item = self.find(item_id)
+        if item is not None and item.clock < item_id[1]:
+            item = item.split(item_id[1] - item.clock)
+            self.register(item)
+        return item
+
+    def register(self, item):
+        """Record an integrated item so it can be found by clock."""
+        clocks = self.clocks.setdefault(item.client, [])
+        index = bisect.bisect_left(clocks, item.clock)
+        clocks.insert(index, item.clock)
+        self.items.setdefault(item.client, []).insert(index, item)
+
+    def is_collected(self, item_id):
+        """Check if a clock of a client was garbage collected."""
+        client, clock = item_id
+        return any(
+            start <= clock < start + length
+            for start, length in self.collected.get(client, [])
+        )
+
+    def get_dependencies(self, item):
+        """Return the ids of the items that must be integrated before an item."""
+        dependencies = [item.origin, item.right_origin]
+        if isinstance(item.parent, tuple):
+            dependencies.append(item.parent)
+        return [item_id for item_id in dependencies if item_id is not None]
+
+    def find_pending(self, item_id):
+        """Return the item of the update containing a clock of a client, if any."""
+        client, clock = item_id
+        clocks = self.pending_clocks.get(client, [])
+        index = bisect.bisect_right(clocks, clock) - 1
+        if index < 0:
+            return None
+        item = self.pending[client][index]
+        return item if clock < item.clock + item.length else None
+
+    def integrate(self, item):
+        """
+        Integrate an item after the items it depends on, which may come later in the
+        update. Items depending on content that is missing or was garbage collected
+        belong to deleted types and are left out.
+        """
+        stack = [item]
+        while stack:
+            current = stack[-1]
+            if id(current) in self.integrated:
+                stack.pop()
+                continue
+
+            missing = [
+                pending
+                for item_id in self.get_dependencies(current)
+                if self.find(item_id) is None
+                and (pending := self.find_pending(item_id)) is not None
+                and id(pending) not in self.integrated
+                and id(pending) not in self.visiting
+            ]
+            if missing:
+                self.visiting.add(id(current))
+                stack.extend(missing)
+                continue
+
+            stack.pop()
+            self.integrated.add(id(current))
+            self.integrate_item(current)
+
+    def find_neighbours(self, item):
+        """
+        Return the integrated items an item was inserted between, or None if one of
+        them is missing.
+        """
+        neighbours = []
+        for item_id, find in (
+            (item.origin, self.find_clean_end),
+            (item.right_origin, self.find_clean_start),
+        ):
+            if item_id is None:
+                neighbours.append(None)
+                continue
+            neighbour = None if self.is_collected(item_id) else find(item_id)
+            if neighbour is None:
+                return None
+            neighbours.append(neighbour)
+        return neighbours
+
+    def find_parent(self, item):
+        """Return the root or type item containing an item, if it is a sequence."""
+        if item.parent_sub is not None:
+            # Entries of maps (e.g. attributes) are not part of the text
+            return None
+        if isinstance(item.parent, str):
+            return self.roots.setdefault(item.parent, Root())
+        parent = self.find(item.parent)
+        return parent if parent is not None and parent.content_ref == TYPE else None
+
+    def integrate_item(self, item):
+        """
+        Insert an item in the sequence of its parent with the conflict resolution of
+        YATA, as implemented by `Item.integrate` in Yjs.
+        """
+        neighbours = self.find_neighbours(item)
+        if neighbours is None:
+            return
+        left, right = neighbours
+
+        if item.parent is None:
+            neighbour = left or right
+            if neighbour is None:
+                return
+            item.parent, item.parent_sub = neighbour.parent, neighbour.parent_sub
+
+        self.register(item)
+        parent = self.find_parent(item)
+        if parent is None:
+            return
+
+        if (left is None and (right is None or right.left is not None)) or (
+            left is not None and left.right is not right
+        ):
+            left = self.resolve_conflicts(item, parent, left, right)
+
+        item.left = left
+        if left is not None:
+            item.right, left.right = left.right, item
+        else:
+            item.right, parent.start = parent.start, item
+        if item.right is not None:
+            item.right.left = item
+
+    def resolve_conflicts(self, item, parent, left, right):
+        """
+        Return the item after which to insert an item when other items were inserted
+        concurrently between its origins.
+        """
+        current = left.right if left is not None else parent.start
+        conflicting, before_origin = set(), set()
+        while current is not None and current is not right:
+            before_origin.add(id(current))
+            conflicting.add(id(current))
+            if item.origin == current.origin:
+                if current.client < item.client:
+                    left = current
+                    conflicting.clear()
+                elif item.right_origin == current.right_origin:
+                    break
+            elif (
+                current.origin is not None
+                and id(self.find(current.origin)) in before_origin
+            ):
+                if id(self.find(current.origin)) not in conflicting:
+                    left = current
+                    conflicting.clear()
+            else:
+                break
+            current = current.right
+        return left
+
+    def apply_delete_set(self):
+        """Mark the deleted items, splitting those partly deleted."""
+        for client, ranges in self.delete_set.items():
+            for clock, length in ranges:
+                end = clock + length
+                item = self.find_clean_start((client, clock))
+                if item is None:
+                    continue
+                self.find_clean_end((client, end - 1))
+                while item is not None and item.clock < end:
+                    item.deleted = True
+                    item = self.find((client, item.clock + item.length))
+
+    def get_texts(self):
+        """
+        Return the texts of the document in order, one for each sequence of strings
+        (e.g. a paragraph), leaving out deleted content.
+        """
+        texts = []
+        stack = [root.start for root in reversed(self.roots.values())]
+        current_text = []
+        while stack:
+            item = stack.pop()
+            if item is None:
+                continue
+            stack.append(item.right)
+            if item.deleted:
+                continue
+            if item.units is not None:
+                current_text.append(item.units)
+            elif item.content_ref == TYPE:
+                if current_text:
+                    texts.append(b"".join(current_text).decode("utf-16-le", "ignore"))
+                    current_text = []
+                stack.append(item.start)
+        if current_text:
+            texts.append(b"".join(current_text).decode("utf-16-le", "ignore"))
+        return texts
+
+
+def extract_update_text(update):
+    """
+    Return the text inserted in the shared types of a Yjs update, without the deleted
+    characters, formatting or attributes. Items are integrated like a Yjs client does
+    so strings come in the order of the document, separated by a space when they
+    belong to different types (e.g. paragraphs).
+    """
+    return " ".join(text for text in SharedDocument(update).get_texts() if text)
+
+
+def extract_text(content):
+    """
+    Return the plain text of a document content: contents are base64 encoded Yjs
+    updates, contents that are not base64 are returned as is. Invalid updates have no
+    text.
+    """
+    if not content:
+        return ""
+
+    try:
+        update = base64.b64decode(content, validate=True)
+    except (binascii.Error, ValueError):
+        return content
+
+    try:
+        return extract_update_text(update)
+    except UpdateDecodingError:
+        return ""
@@ -0,0 +1,167 @@
+"""Document duplication services."""
+
+import base64
+import binascii
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+from botocore.exceptions import ClientError
+
+from core.services.content_codec_services import decode_content, encode_content
+
+ATTACHMENTS_FOLDER = "attachments"
+
+
+def rewrite_attachment_urls(bytes_content, source_key_base, target_key_base):
+    """
+    Point the attachment URLs found in a content to the attachments of another document.
+
+    Contents are base64 encoded Yjs updates in which strings are prefixed with their
+    length: a key base is only replaced by a key base of the same length (document ids)
+    so the update remains valid. Contents that are not base64 are rewritten as is.
+    """
+    if len(source_key_base) != len(target_key_base):
+        raise ValueError("Key bases must have the same length.")
+
+    source = f"{source_key_base:s}/{ATTACHMENTS_FOLDER:s}/".encode("utf-8")
+    target = f"{target_key_base:s}/{ATTACHMENTS_FOLDER:s}/".encode("utf-8")
+
+    try:
+        update = base64.b64decode(bytes_content, validate=True)
+    except binascii.Error:
+        return bytes_content.replace(source, target)
+
+    if source not in update:
+        return bytes_content
+    return base64.b64encode(update.replace(source, target))
+
+
+def list_attachment_keys(key_base):
+    """Return the keys of the attachments stored under a key base."""
+    paginator = default_storage.connection.meta.client.get_paginator("list_objects_v2")
+    return [
+        item["Key"]
+        for page in paginator.paginate(
+            Bucket=default_storage.bucket_name,
+            Prefix=f"{key_base:s}/{ATTACHMENTS_FOLDER:s}/",
+        )
+        for item in page.get("Contents", [])
+    ]
+
+
+def copy_object(source_key, target_key):
+    """
+    Copy an object in object storage without downloading it. Return the response of the
+    write with the shape of a `put_object` response.
+    """
+    response = default_storage.connection.meta.client.copy_object(
+        Bucket=default_storage.bucket_name,
+        Key=target_key,
+        CopySource={"Bucket": default_storage.bucket_name, "Key": source_key},
+    )
+    return {
+        "VersionId": response.get("VersionId"),
+        "ETag": response["CopyObjectResult"]["ETag"],
+        "LastModified": response["CopyObjectResult"]["LastModified"],
+    }
+
+
+def delete_documents_objects(key_bases):
+    """
+    Delete all the versions of all the objects stored under key bases, e.g. the objects
+    copied for documents whose duplication failed.
+    """
+    s3_client = default_storage.connection.meta.client
+    paginator = s3_client.get_paginator("list_object_versions")
+    for key_base in key_bases:
+        for page in paginator.paginate(
+            Bucket=default_storage.bucket_name, Prefix=f"{key_base:s}/"
+        ):
+            objects = [
+                {"Key": item["Key"], "VersionId": item["VersionId"]}
+                for item in page.get("Versions", []) + page.get("DeleteMarkers", [])
+            ]
+            if objects:
+                s3_client.delete_objects(
+                    Bucket=default_storage.bucket_name,
+                    Delete={"Objects": objects, "Quiet": True},
+                )
+
+
+def copy_content(source_key_base, target_key_base, has_attachments):
+    """
+    Copy the content of a document under the key base of another document.
+
+    The object is copied server side unless the document has attachments: its content
+    must then be rewritten to point to the copied attachments. Return the response of
+    the write and the rewritten content if it changed, or (None, None) if the document
+    has no content.
+    """
+    s3_client = default_storage.connection.meta.client
+    source_key = f"{source_key_base:s}/file"
+    target_key = f"{target_key_base:s}/file"
+
+    try:
+        if not has_attachments:
+            return copy_object(source_key, target_key), None
+
+        response = s3_client.get_object(
+            Bucket=default_storage.bucket_name, Key=source_key
+        )
+    except ClientError as excpt:
+        if excpt.response["Error"]["Code"] in ["404", "NoSuchKey"]:
+            return None, None
+        raise
+
+    bytes_content = decode_content(response["Body"].read(), response.get("Metadata"))
+    rewritten = rewrite_attachment_urls(bytes_content, source_key_base, target_key_base)
+    if rewritten == bytes_content:
+        return copy_object(source_key, target_key), None
+
+    body, metadata = encode_content(rewritten)
+    response = s3_client.put_object(
+        Bucket=default_storage.bucket_name, Key=target_key, Body=body, Metadata=metadata
+    )
+    return response, rewritten
+
+
+def copy_documents_objects(key_bases):
+    """
+    Copy the content and attachments of documents to other documents in parallel.
+    `key_bases` is a list of (source key base, target key base) pairs. Return the result
+    of `copy_content` for each pair, in the same order.
+    """
+
+    def copy_attachment(source_key_base, target_key_base, key):
+        return copy_object(key, f"{target_key_base:s}{key[len(source_key_base) :]:s}")
+
+    with ThreadPoolExecutor(
+        max_workers=settings.DOCUMENT_DUPLICATION_WORKERS
+    ) as executor:
+        attachment_keys = list(
+            executor.map(lambda key_base: list_attachment_keys(key_base[0]), key_bases)
+        )
+        attachment_copies = [
+            executor.submit(copy_attachment, source_key_base, target_key_base, key)
+            for (source_key_base, target_key_base), keys in zip(
+                key_bases, attachment_keys, strict=True
+            )
+            for key in keys
+        ]
+        results = list(
+            executor.map(
+                lambda args: copy_content(*args),
+                [
+                    (source_key_base, target_key_base, bool(keys))
+                    for (source_key_base, target_key_base), keys in zip(
+                        key_bases, attachment_keys, strict=True
+                    )
+                ],
+            )
+        )
+        for future in attachment_copies:
+            future.result()
+
+    return results
@@ -0,0 +1,128 @@
+"""Document version retention services."""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.storage import default_storage
+
+from botocore.exceptions import ClientError
+
+# Maximum number of objects that can be deleted in one DeleteObjects call
+MAX_DELETE_OBJECTS = 1000
+
+
+class RetentionPolicy:
+    """
+    Decide which versions of a document to keep from a list of tiers. Each tier is a
+    (max_age, interval) pair: versions younger than max_age that fall in the tier are
+    all kept if interval is 0, otherwise only the most recent version of each interval
+    is kept. A version falls in the first tier whose max_age is greater than its age.
+    Versions older than all tiers are deleted. The latest version is always kept.
+
+    e.g. [(1 day, 0), (1 week, 1 hour), (1 year, 1 day)] keeps all versions of the last
+    day, then hourly versions for a week, then daily versions for a year.
+    """
+
+    def __init__(self, tiers):
+        self.tiers = sorted(tiers)
+
+    @classmethod
+    def from_settings(cls):
+        """
+        Build the policy from the DOCUMENT_VERSIONS_RETENTION setting, a list of
+        "max_age:interval" strings expressed in seconds.
+        """
+        tiers = []
+        for tier in settings.DOCUMENT_VERSIONS_RETENTION:
+            try:
+                max_age, interval = (int(value) for value in tier.split(":"))
+            except ValueError as err:
+                raise ImproperlyConfigured(
+                    f"Invalid version retention tier: {tier:s}"
+                ) from err
+            tiers.append((timedelta(seconds=max_age), timedelta(seconds=interval)))
+        return cls(tiers)
+
+    def get_expired_versions(self, versions, now):
+        """
+        Return the versions to delete among versions of a document sorted from the most
+        recent to the oldest. Versions must have a `last_modified` attribute.
+        """
+        if not self.tiers:
+            return []
+
+        expired = []
+        kept_slots = set()
+        # The first version is the current content of the document
+        for version in versions[1:]:
+            age = now - version.last_modified
+            tier = next(
+                (
+                    index
+                    for index, (max_age, _) in enumerate(self.tiers)
+                    if age < max_age
+                ),
+                None,
+            )
+            if tier is None:
+                expired.append(version)
+                continue
+
+            interval = self.tiers[tier][1]
+            if not interval:
+                continue
+
+            # Versions are sorted so the first version seen in a slot is the most recent
+            slot = (tier, version.last_modified.timestamp() // interval.total_seconds())
+            if slot in kept_slots:
+                expired.append(version)
+            else:
+                kept_slots.add(slot)
+
+        return expired
+
+
+def get_latest_version_id(key):
+    """
+    Return the id of the version object storage reports as the latest version of an
+    object, or None if the object does not exist or its latest version is a delete
+    marker.
+    """
+    try:
+        response = default_storage.connection.meta.client.head_object(
+            Bucket=default_storage.bucket_name, Key=key
+        )
+    except ClientError as excpt:
+        if excpt.response["Error"]["Code"] in ["404", "NoSuchKey", "405"]:
+            return None
+        raise
+    return response.get("VersionId")
+
+
+def delete_versions_objects(objects):
+    """
+    Delete object versions from object storage with as few DeleteObjects calls as
+    possible. Objects are (key, version_id) pairs. Return the pairs that were deleted
+    and the errors reported by object storage.
+    """
+    s3_client = default_storage.connection.meta.client
+
+    deleted, errors = [], []
+    for start in range(0, len(objects), MAX_DELETE_OBJECTS):
+        response = s3_client.delete_objects(
+            Bucket=default_storage.bucket_name,
+            Delete={
+                "Objects": [
+                    {"Key": key, "VersionId": version_id}
+                    for key, version_id in objects[start : start + MAX_DELETE_OBJECTS]
+                ],
+                "Quiet": False,
+            },
+        )
+        deleted.extend(
+            (item["Key"], item["VersionId"]) for item in response.get("Deleted", [])
+        )
+        errors.extend(response.get("Errors", []))
+
+    return deleted, errors
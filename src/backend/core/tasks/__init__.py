@@ -0,0 +1,7 @@
+"""Celery tasks for the impress core application."""
+
+# Task modules must be imported here to be registered: workers only autodiscover the
+# "tasks" package of each application
+from .documents import flush_document_content, index_document_content
+
+__all__ = ["flush_document_content", "index_document_content"]
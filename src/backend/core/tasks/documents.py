@@ -0,0 +1,33 @@
+"""Celery tasks related to documents."""
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+from core import models
+
+from impress.celery_app import app
+
+
+@app.task(
+    autoretry_for=(BotoCoreError, ClientError, models.ContentFlushInProgressError),
+    retry_backoff=True,
+    retry_backoff_max=600,
+    max_retries=None,
+)
+def flush_document_content(document_id):
+    """
+    Write the content buffered for a document in write-behind mode to object storage.
+    The buffer is the only copy of the content until it is flushed: failed writes are
+    retried with an exponential backoff until object storage is available again, and
+    flushes finding the document already being flushed are retried the same way.
+    """
+    models.Document(pk=document_id).flush_content()
+
+
+@app.task
+def index_document_content(document_id):
+    """Index the latest content of a document for full-text search."""
+    try:
+        document = models.Document.objects.get(pk=document_id)
+    except models.Document.DoesNotExist:
+        return
+    document.index_content()
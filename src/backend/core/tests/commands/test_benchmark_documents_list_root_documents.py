@@ -0,0 +1,40 @@
+"""
+Unit test for `benchmark_documents_list_root_documents` command.
+"""
+
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+
+import pytest
+
+from core import factories
+
+pytestmark = pytest.mark.django_db
+
+
+def test_benchmark_documents_list_root_documents():
+    """The command should report the root documents found by each strategy."""
+    user = factories.UserFactory(email="user@example.com")
+    root = factories.DocumentFactory(users=[user])
+    factories.DocumentFactory(parent=root, users=[user])
+    factories.DocumentFactory(users=[user])
+
+    stdout = StringIO()
+    call_command(
+        "benchmark_documents_list_root_documents",
+        "user@example.com",
+        iterations=2,
+        stdout=stdout,
+    )
+
+    output = stdout.getvalue()
+    assert "[INFO] Found 3 documents accessible to the user." in output
+    assert "[INFO] Strategy python: 2 root documents" in output
+    assert "[INFO] Strategy sql: 2 root documents" in output
+
+
+def test_benchmark_documents_list_root_documents_unknown_user():
+    """The command should fail for an unknown user."""
+    with pytest.raises(CommandError, match="No user with email unknown@example.com."):
+        call_command("benchmark_documents_list_root_documents", "unknown@example.com")
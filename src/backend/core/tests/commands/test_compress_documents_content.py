@@ -0,0 +1,77 @@
+"""
+Unit test for `compress_documents_content` command.
+"""
+
+import gzip
+
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+
+import pytest
+
+from core import factories, models
+
+pytestmark = pytest.mark.django_db
+
+
+def test_compress_documents_content(settings):
+    """
+    The command should compress the raw objects of documents, keep their content
+    readable and leave objects already compressed untouched.
+    """
+    s3_client = default_storage.connection.meta.client
+    bucket_name = default_storage.bucket_name
+
+    settings.DOCUMENT_CONTENT_CODEC = None
+    document_raw = factories.DocumentFactory(content="raw content")
+    settings.DOCUMENT_CONTENT_CODEC = "gzip"
+    document_compressed = factories.DocumentFactory(content="compressed content")
+    etag = s3_client.head_object(Bucket=bucket_name, Key=document_compressed.file_key)[
+        "ETag"
+    ]
+
+    call_command("compress_documents_content")
+
+    response = s3_client.get_object(Bucket=bucket_name, Key=document_raw.file_key)
+    assert response["Metadata"] == {"codec": "gzip"}
+    assert gzip.decompress(response["Body"].read()) == b"raw content"
+    document = models.Document.objects.get(pk=document_raw.pk)
+    assert document.get_content_response()["Body"].read() == b"raw content"
+
+    response = s3_client.head_object(
+        Bucket=bucket_name, Key=document_compressed.file_key
+    )
+    assert response["ETag"] == etag
+
+
+def test_compress_documents_content_dry_run(settings):
+    """In dry run mode, the command should not rewrite any object."""
+    s3_client = default_storage.connection.meta.client
+    bucket_name = default_storage.bucket_name
+
+    settings.DOCUMENT_CONTENT_CODEC = None
+    document = factories.DocumentFactory(content="raw content")
+    settings.DOCUMENT_CONTENT_CODEC = "gzip"
+
+    call_command("compress_documents_content", "--dry-run")
+
+    response = s3_client.get_object(Bucket=bucket_name, Key=document.file_key)
+    assert response["Metadata"] == {}
+    assert response["Body"].read() == b"raw content"
+
+
+def test_compress_documents_content_drifted(settings):
+    """Objects that do not match the digest of their document should be left as is."""
+    s3_client = default_storage.connection.meta.client
+    bucket_name = default_storage.bucket_name
+
+    settings.DOCUMENT_CONTENT_CODEC = None
+    document = factories.DocumentFactory(content="before")
+    s3_client.put_object(Bucket=bucket_name, Key=document.file_key, Body=b"after")
+    settings.DOCUMENT_CONTENT_CODEC = "gzip"
+
+    call_command("compress_documents_content")
+
+    response = s3_client.get_object(Bucket=bucket_name, Key=document.file_key)
+    assert response["Metadata"] == {}
+    assert response["Body"].read() == b"after"
@@ -0,0 +1,61 @@
+"""
+Unit tests for the `check_effective_document_roles` and
+`rebuild_effective_document_roles` commands.
+"""
+
+from django.core.management import CommandError, call_command
+
+import pytest
+
+from core import factories, models
+
+pytestmark = pytest.mark.django_db
+
+
+def test_rebuild_effective_document_roles():
+    """The command should rebuild the effective roles of all accesses."""
+    accesses = factories.UserDocumentAccessFactory.create_batch(3)
+    # Simulate a table out of sync with accesses
+    models.EffectiveDocumentRole.objects.filter(access=accesses[0]).delete()
+    models.EffectiveDocumentRole.objects.filter(access=accesses[1]).update(
+        role="owner", path="0000000"
+    )
+
+    call_command("rebuild_effective_document_roles", batch_size=2)
+
+    assert {
+        (role.access_id, role.user_id, role.path, role.role)
+        for role in models.EffectiveDocumentRole.objects.all()
+    } == {
+        (access.id, access.user_id, access.document.path, access.role)
+        for access in accesses
+    }
+
+
+def test_check_effective_document_roles_consistent():
+    """The command should succeed when effective roles match accesses."""
+    factories.UserDocumentAccessFactory.create_batch(2)
+    factories.TeamDocumentAccessFactory()
+
+    call_command("check_effective_document_roles")
+
+
+def test_check_effective_document_roles_inconsistent():
+    """The command should fail on missing or out of date effective roles."""
+    missing, stale, _valid = factories.UserDocumentAccessFactory.create_batch(3)
+    models.EffectiveDocumentRole.objects.filter(access=missing).delete()
+    models.EffectiveDocumentRole.objects.filter(access=stale).update(user=None)
+
+    with pytest.raises(CommandError, match="2 access"):
+        call_command("check_effective_document_roles")
+
+
+def test_check_effective_document_roles_fix():
+    """The command should synchronize inconsistent effective roles with "--fix"."""
+    access = factories.UserDocumentAccessFactory(role="reader")
+    models.EffectiveDocumentRole.objects.filter(access=access).update(role="owner")
+
+    call_command("check_effective_document_roles", fix=True)
+
+    assert models.EffectiveDocumentRole.objects.get(access=access).role == "reader"
+    call_command("check_effective_document_roles")
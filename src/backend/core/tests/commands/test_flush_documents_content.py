@@ -0,0 +1,54 @@
+"""
+Unit test for `flush_documents_content` command.
+"""
+
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+
+import pytest
+
+from core import factories
+
+pytestmark = pytest.mark.django_db
+
+
+def test_flush_documents_content_replays_pending_flushes(
+    settings, django_capture_on_commit_callbacks
+):
+    """
+    Buffered contents for which the flush task never ran (e.g. the worker crashed)
+    should be written to object storage by the command.
+    """
+    settings.DOCUMENT_CONTENT_WRITE_BEHIND = True
+    document_pending = factories.DocumentFactory(content="initial")
+    document_scheduled = factories.DocumentFactory(content="initial")
+    document_untouched = factories.DocumentFactory(content="initial")
+
+    # Simulate flush tasks lost by a crashed worker
+    with (
+        mock.patch("core.tasks.documents.flush_document_content.apply_async"),
+        django_capture_on_commit_callbacks(execute=True),
+    ):
+        document_pending.content = "pending"
+        document_pending.save()
+        document_scheduled.content = "scheduled"
+        document_scheduled.save()
+
+    # The schedule marker of the lost flush has expired for the first document
+    cache.delete(document_pending.get_content_flush_scheduled_cache_key())
+
+    call_command("flush_documents_content")
+
+    response = document_pending.get_content_response()
+    assert response["Body"].read() == b"pending"
+    assert document_pending.is_content_flush_pending() is False
+
+    # A flush is still scheduled for this document within the current window
+    response = document_scheduled.get_content_response()
+    assert response["Body"].read() == b"initial"
+    assert document_scheduled.is_content_flush_pending() is True
+
+    response = document_untouched.get_content_response()
+    assert response["Body"].read() == b"initial"
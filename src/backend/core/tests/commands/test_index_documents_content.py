@@ -0,0 +1,45 @@
+"""
+Unit test for `index_documents_content` command.
+"""
+
+from django.core.management import call_command
+
+import pytest
+
+from core import factories, models
+
+pytestmark = pytest.mark.django_db
+
+
+def test_index_documents_content():
+    """
+    The command should index the documents whose content changed since they were last
+    indexed and leave the others untouched unless all documents are requested.
+    """
+    indexed = factories.DocumentFactory(content="Budget review")
+    indexed.index_content()
+    updated_at = indexed.search_vector.updated_at
+
+    stale = factories.DocumentFactory(content="Old content")
+    stale.index_content()
+    stale.content = "Roadmap notes"
+    stale.save()
+
+    never_indexed = factories.DocumentFactory(content="Meeting minutes")
+
+    call_command("index_documents_content")
+
+    indexed.search_vector.refresh_from_db()
+    assert indexed.search_vector.updated_at == updated_at
+    for document in [stale, never_indexed]:
+        search_vector = models.DocumentSearchVector.objects.get(document=document)
+        assert search_vector.content_digest == document.content_digest
+    assert list(models.Document.objects.filter(search_vector__vector="roadmap")) == [
+        stale
+    ]
+    assert not models.Document.objects.filter(search_vector__vector="old").exists()
+
+    call_command("index_documents_content", "--all")
+
+    indexed.search_vector.refresh_from_db()
+    assert indexed.search_vector.updated_at > updated_at
@@ -0,0 +1,61 @@
+"""
+Unit test for `index_documents_versions` command.
+"""
+
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+
+import pytest
+
+from core import factories, models
+
+pytestmark = pytest.mark.django_db
+
+
+def test_index_documents_versions():
+    """
+    The command should index the versions stored in the bucket that are missing from
+    the index and remove the versions that are not in the bucket anymore.
+    """
+    document = factories.DocumentFactory(content="initial")
+    document.content = "new content"
+    document.save()
+
+    response = default_storage.connection.meta.client.list_object_versions(
+        Bucket=default_storage.bucket_name, Prefix=document.file_key
+    )
+    expected_ids = {version["VersionId"] for version in response["Versions"]}
+
+    # Simulate versions written before the index existed and a stale version
+    document.versions.all().delete()
+    models.DocumentVersion.objects.create(
+        document=document,
+        version_id="stale",
+        last_modified=document.created_at,
+    )
+
+    call_command("index_documents_versions")
+
+    assert set(document.versions.values_list("version_id", flat=True)) == expected_ids
+    assert document.get_versions_slice()["count"] == 1
+
+
+def test_index_documents_versions_dates():
+    """
+    The command should set the exact modification date of object storage on the
+    versions indexed on write.
+    """
+    document = factories.DocumentFactory(content="initial")
+    version = document.versions.get()
+    version.last_modified = document.created_at - timedelta(seconds=1)
+    version.save()
+
+    call_command("index_documents_versions")
+
+    response = default_storage.connection.meta.client.list_object_versions(
+        Bucket=default_storage.bucket_name, Prefix=document.file_key
+    )
+    version.refresh_from_db()
+    assert version.last_modified == response["Versions"][0]["LastModified"]
@@ -0,0 +1,64 @@
+"""
+Unit test for `reconcile_documents_content_digest` command.
+"""
+
+import hashlib
+
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+
+import pytest
+
+from core import factories, models
+
+pytestmark = pytest.mark.django_db
+
+
+def test_reconcile_documents_content_digest():
+    """
+    The command should fix documents whose digest does not match the content
+    stored in object storage and leave the others untouched.
+    """
+    s3_client = default_storage.connection.meta.client
+    bucket_name = default_storage.bucket_name
+
+    document_ok = factories.DocumentFactory(content="ok")
+    document_drifted = factories.DocumentFactory(content="before")
+    document_legacy = factories.DocumentFactory(content="legacy")
+
+    # Simulate a write done outside of the application
+    s3_client.put_object(
+        Bucket=bucket_name, Key=document_drifted.file_key, Body=b"after"
+    )
+    # Simulate a document created before digests were stored
+    models.Document.objects.filter(pk=document_legacy.pk).update(
+        content_digest=None, content_size=None
+    )
+    updated_at = document_drifted.updated_at
+
+    call_command("reconcile_documents_content_digest")
+
+    document_ok.refresh_from_db()
+    assert document_ok.content_digest == hashlib.sha256(b"ok").hexdigest()
+
+    document_drifted.refresh_from_db()
+    assert document_drifted.content_digest == hashlib.sha256(b"after").hexdigest()
+    assert document_drifted.content_size == 5
+    assert document_drifted.updated_at == updated_at
+
+    document_legacy.refresh_from_db()
+    assert document_legacy.content_digest == hashlib.sha256(b"legacy").hexdigest()
+    assert document_legacy.content_size == 6
+
+
+def test_reconcile_documents_content_digest_dry_run():
+    """In dry run mode, the command should only report drifted documents."""
+    document = factories.DocumentFactory(content="before")
+    default_storage.connection.meta.client.put_object(
+        Bucket=default_storage.bucket_name, Key=document.file_key, Body=b"after"
+    )
+
+    call_command("reconcile_documents_content_digest", "--dry-run")
+
+    document.refresh_from_db()
+    assert document.content_digest == hashlib.sha256(b"before").hexdigest()
@@ -0,0 +1,121 @@
+"""
+Unit test for `thin_documents_versions` command.
+"""
+
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.utils import timezone
+
+import pytest
+
+from core import factories
+
+pytestmark = pytest.mark.django_db
+
+
+def list_versions_ids(document):
+    """Return the ids of the versions of a document stored in object storage."""
+    response = default_storage.connection.meta.client.list_object_versions(
+        Bucket=default_storage.bucket_name, Prefix=document.file_key
+    )
+    return {version["VersionId"] for version in response.get("Versions", [])}
+
+
+def test_thin_documents_versions(settings):
+    """
+    The command should delete the versions not kept by the retention policy from
+    object storage and from the version index.
+    """
+    settings.DOCUMENT_VERSIONS_RETENTION = ["86400:0"]
+
+    document = factories.DocumentFactory(content="initial")
+    for i in range(3):
+        document.content = f"content {i:d}"
+        document.save()
+
+    # Age the two oldest versions beyond the retention period
+    old_versions = document.versions.order_by("last_modified")[:2]
+    old_ids = {version.version_id for version in old_versions}
+    document.versions.filter(version_id__in=old_ids).update(
+        last_modified=timezone.now() - timedelta(days=2)
+    )
+
+    call_command("thin_documents_versions", "--dry-run")
+    assert document.versions.count() == 4
+
+    call_command("thin_documents_versions")
+
+    kept_ids = set(document.versions.values_list("version_id", flat=True))
+    assert len(kept_ids) == 2
+    assert kept_ids.isdisjoint(old_ids)
+    assert list_versions_ids(document) == kept_ids
+    assert document.get_content_response()["Body"].read() == b"content 2"
+
+
+def test_thin_documents_versions_no_policy(settings):
+    """Without retention policy, no version should be deleted."""
+    settings.DOCUMENT_VERSIONS_RETENTION = []
+
+    document = factories.DocumentFactory(content="initial")
+    document.content = "new content"
+    document.save()
+    document.versions.update(last_modified=timezone.now() - timedelta(days=1000))
+
+    call_command("thin_documents_versions")
+
+    assert document.versions.count() == 2
+
+
+def test_thin_documents_versions_keep_latest_object_version(settings):
+    """
+    The version object storage reports as the latest should never be deleted, even if
+    the version index does not see it as the most recent version.
+    """
+    settings.DOCUMENT_VERSIONS_RETENTION = ["86400:0"]
+
+    document = factories.DocumentFactory(content="initial")
+    for content in ["middle", "current"]:
+        document.content = content
+        document.save()
+
+    # The index lags behind: the current version looks older than the other ones
+    s3_client = default_storage.connection.meta.client
+    latest_version_id = s3_client.head_object(
+        Bucket=default_storage.bucket_name, Key=document.file_key
+    )["VersionId"]
+    initial_version_id = document.versions.order_by("last_modified")[0].version_id
+    document.versions.update(last_modified=timezone.now() - timedelta(days=2))
+    document.versions.filter(version_id=initial_version_id).update(
+        last_modified=timezone.now() - timedelta(days=2, hours=1)
+    )
+    document.versions.filter(version_id=latest_version_id).update(
+        last_modified=timezone.now() - timedelta(days=3)
+    )
+
+    call_command("thin_documents_versions")
+
+    kept_ids = set(document.versions.values_list("version_id", flat=True))
+    assert len(kept_ids) == 2
+    assert latest_version_id in kept_ids
+    assert initial_version_id not in kept_ids
+    assert list_versions_ids(document) == kept_ids
+    assert document.get_content_response()["Body"].read() == b"current"
+
+
+def test_thin_documents_versions_missing_object(settings):
+    """The versions of a document whose object can't be found should not be deleted."""
+    settings.DOCUMENT_VERSIONS_RETENTION = ["86400:0"]
+
+    document = factories.DocumentFactory(content="initial")
+    document.content = "current"
+    document.save()
+    document.versions.update(last_modified=timezone.now() - timedelta(days=2))
+    default_storage.connection.meta.client.delete_object(
+        Bucket=default_storage.bucket_name, Key=document.file_key
+    )
+
+    call_command("thin_documents_versions")
+
+    assert document.versions.count() == 2
@@ -131,6 +131,39 @@ def test_api_document_accesses_list_authenticated_related(via, mock_user_teams):
     )
 
 
+def test_api_document_accesses_list_cursor_pagination():
+    """
+    Document accesses should be paginated with a cursor on their creation date, most
+    recent first, if the client asks for it.
+    """
+    user = factories.UserFactory()
+
+    client = APIClient()
+    client.force_login(user)
+
+    document = factories.DocumentFactory(users=[user])
+    factories.UserDocumentAccessFactory.create_batch(2, document=document)
+    accesses = list(document.accesses.order_by("-created_at", "-pk"))
+
+    response = client.get(
+        f"/api/v1.0/documents/{document.id!s}/accesses/?cursor=&page_size=2"
+    )
+
+    assert response.status_code == 200
+    content = response.json()
+    assert "count" not in content
+    assert len(content["results"]) == 2
+
+    response = client.get(content["next"])
+
+    assert response.status_code == 200
+    next_content = response.json()
+    assert next_content["next"] is None
+    assert [
+        result["id"] for result in content["results"] + next_content["results"]
+    ] == [str(access.id) for access in accesses]
+
+
 def test_api_document_accesses_retrieve_anonymous():
     """
     Anonymous users should not be allowed to retrieve a document access.
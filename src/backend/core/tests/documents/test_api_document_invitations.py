@@ -184,6 +184,44 @@ def test_api_document_invitations_list_expired_invitations_still_listed():
     )
 
 
+def test_api_document_invitations_list_cursor_pagination():
+    """
+    Invitations should be paginated with a cursor on their creation date, most recent
+    first, if the client asks for it.
+    """
+    user = factories.UserFactory()
+    document = factories.DocumentFactory(users=[(user, "owner")])
+    invitations = factories.InvitationFactory.create_batch(
+        3, document=document, issuer=user
+    )
+
+    client = APIClient()
+    client.force_login(user)
+
+    response = client.get(
+        f"/api/v1.0/documents/{document.id!s}/invitations/?cursor=&page_size=2"
+    )
+
+    assert response.status_code == 200
+    content = response.json()
+    assert "count" not in content
+    assert len(content["results"]) == 2
+
+    response = client.get(content["next"])
+
+    assert response.status_code == 200
+    next_content = response.json()
+    assert next_content["next"] is None
+    assert [
+        result["id"] for result in content["results"] + next_content["results"]
+    ] == [
+        str(invitation.id)
+        for invitation in sorted(
+            invitations, key=lambda i: (i.created_at, i.id), reverse=True
+        )
+    ]
+
+
 # Retrieve
 
 
@@ -2,8 +2,12 @@
 Test document versions API endpoints for users in impress's core app.
 """
 
+import hashlib
 import random
 import time
+from unittest import mock
+
+from django.core.files.storage import default_storage
 
 import pytest
 from rest_framework.test import APIClient
@@ -731,3 +735,166 @@ def test_api_document_versions_delete_administrator_or_owner(via, mock_user_team
 
     versions = document.get_versions_slice()["versions"]
     assert len(versions) == 1
+
+
+def test_api_document_versions_retrieve_etag_not_modified():
+    """
+    Versions should be cacheable for long and a request with a matching "If-None-Match"
+    header should be answered with a 304 without reading the version body.
+    """
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+
+    document = factories.DocumentFactory()
+    factories.UserDocumentAccessFactory(document=document, user=user)
+    time.sleep(1)  # minio stores datetimes with the precision of a second
+    document.content = "new content 1"
+    document.save()
+    document.content = "new content 2"
+    document.save()
+
+    version_id = document.get_versions_slice()["versions"][0]["version_id"]
+    url = f"/api/v1.0/documents/{document.id!s}/versions/{version_id:s}/"
+
+    response = client.get(url)
+
+    assert response.status_code == 200
+    assert response["ETag"] == f'"{version_id:s}"'
+    assert response["Cache-Control"] == "private, max-age=31536000, immutable"
+
+    with mock.patch.object(
+        default_storage.connection.meta.client, "get_object"
+    ) as mock_get_object:
+        response = client.get(url, HTTP_IF_NONE_MATCH=f'"{version_id:s}"')
+
+    assert response.status_code == 304
+    assert response["ETag"] == f'"{version_id:s}"'
+    mock_get_object.assert_not_called()
+
+
+def test_api_document_versions_restore_anonymous():
+    """Anonymous users should not be allowed to restore a document version."""
+    document = factories.DocumentFactory(link_reach="public", link_role="editor")
+    document.content = "new content"
+    document.save()
+    version_id = document.get_versions_slice()["versions"][0]["version_id"]
+
+    response = APIClient().post(
+        f"/api/v1.0/documents/{document.id!s}/versions/{version_id:s}/restore/",
+    )
+
+    assert response.status_code == 401
+
+
+@pytest.mark.parametrize("via", VIA)
+def test_api_document_versions_restore_reader(via, mock_user_teams):
+    """Readers of a document should not be allowed to restore a version."""
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+
+    document = factories.DocumentFactory()
+    if via == USER:
+        factories.UserDocumentAccessFactory(document=document, user=user, role="reader")
+    elif via == TEAM:
+        mock_user_teams.return_value = ["lasuite", "unknown"]
+        factories.TeamDocumentAccessFactory(
+            document=document, team="lasuite", role="reader"
+        )
+    document.content = "new content"
+    document.save()
+    version_id = document.get_versions_slice()["versions"][0]["version_id"]
+
+    response = client.post(
+        f"/api/v1.0/documents/{document.id!s}/versions/{version_id:s}/restore/",
+    )
+
+    assert response.status_code == 403
+
+
+@pytest.mark.parametrize("role", ["editor", "administrator", "owner"])
+def test_api_document_versions_restore_success(role):
+    """
+    Users who can update a document should be allowed to restore one of its versions
+    without the content going through the application.
+    """
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+
+    document = factories.DocumentFactory()
+    factories.UserDocumentAccessFactory(document=document, user=user, role=role)
+    for content in ["content 1", "content 2"]:
+        document.content = content
+        document.save()
+
+    versions = document.get_versions_slice()["versions"]
+    version_id = versions[0]["version_id"]
+
+    s3_client = default_storage.connection.meta.client
+    with (
+        mock.patch.object(s3_client, "get_object") as mock_get_object,
+        mock.patch.object(s3_client, "put_object") as mock_put_object,
+    ):
+        response = client.post(
+            f"/api/v1.0/documents/{document.id!s}/versions/{version_id:s}/restore/",
+        )
+
+    assert response.status_code == 200
+    mock_get_object.assert_not_called()
+    mock_put_object.assert_not_called()
+
+    document = models.Document.objects.get(pk=document.pk)
+    assert document.content == "content 1"
+    assert document.content_digest == hashlib.sha256(b"content 1").hexdigest()
+    assert document.content_size == 9
+    assert document.get_versions_slice()["count"] == len(versions) + 1
+
+
+def test_api_document_versions_restore_backfilled_version():
+    """
+    Restoring a version indexed without digest, e.g. by the backfill command, should
+    give the document the digest and size of the restored content.
+    """
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+
+    document = factories.DocumentFactory(content="content 1", users=[(user, "owner")])
+    document.content = "content 2"
+    document.save()
+    document.versions.update(content_digest=None, content_size=None)
+    version_id = document.get_versions_slice()["versions"][0]["version_id"]
+
+    response = client.post(
+        f"/api/v1.0/documents/{document.id!s}/versions/{version_id:s}/restore/",
+    )
+
+    assert response.status_code == 200
+    document = models.Document.objects.get(pk=document.pk)
+    assert document.content == "content 1"
+    assert document.content_digest == hashlib.sha256(b"content 1").hexdigest()
+    assert document.content_size == 9
+    assert document.versions.get(version_id=version_id).content_digest == (
+        document.content_digest
+    )
+
+
+def test_api_document_versions_restore_unknown_version():
+    """Restoring a version that is not indexed for the document should return a 404."""
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+
+    document = factories.DocumentFactory(users=[(user, "owner")])
+    other_document = factories.DocumentFactory(users=[(user, "owner")])
+    other_document.content = "new content"
+    other_document.save()
+    version_id = other_document.get_versions_slice()["versions"][0]["version_id"]
+
+    response = client.post(
+        f"/api/v1.0/documents/{document.id!s}/versions/{version_id:s}/restore/",
+    )
+
+    assert response.status_code == 404
@@ -3,10 +3,12 @@ Tests for Documents API endpoint in impress's core app: retrieve
 """
 
 import random
+from unittest import mock
 
 from django.contrib.auth.models import AnonymousUser
 
 import pytest
+from rest_framework.pagination import PageNumberPagination
 from rest_framework.test import APIClient
 
 from core import factories
@@ -539,3 +541,51 @@ def test_api_documents_children_list_authenticated_related_team_members(
             },
         ],
     }
+
+
+def test_api_documents_children_list_sparse_fieldset():
+    """Only the fields selected with the "fields" query parameter should be returned."""
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+
+    document = factories.DocumentFactory(users=[(user, "owner")])
+    child = factories.DocumentFactory(parent=document)
+
+    response = client.get(
+        f"/api/v1.0/documents/{document.id!s}/children/?fields=id,user_roles"
+    )
+
+    assert response.status_code == 200
+    assert response.json()["results"] == [
+        {"id": str(child.id), "user_roles": ["owner"]}
+    ]
+
+
+def test_api_documents_children_list_cursor_pagination():
+    """
+    Children should be paginated with a cursor on their path if the client asks for it.
+    """
+    user = factories.UserFactory()
+
+    client = APIClient()
+    client.force_login(user)
+
+    document = factories.DocumentFactory(users=[user])
+    children = factories.DocumentFactory.create_batch(3, parent=document)
+
+    with mock.patch.object(PageNumberPagination, "get_page_size", return_value=2):
+        response = client.get(f"/api/v1.0/documents/{document.id!s}/children/?cursor=")
+        assert response.status_code == 200
+        content = response.json()
+
+        response = client.get(content["next"])
+        assert response.status_code == 200
+        next_content = response.json()
+
+    assert "count" not in content
+    assert content["previous"] is None
+    assert next_content["next"] is None
+    assert [
+        result["id"] for result in content["results"] + next_content["results"]
+    ] == [str(child.id) for child in children]
@@ -0,0 +1,325 @@
+"""
+Test duplicating documents API endpoint for users in impress's core app.
+"""
+
+import base64
+import hashlib
+from unittest import mock
+
+from django.core.files.storage import default_storage
+
+import pytest
+from rest_framework.test import APIClient
+
+from core import factories, models
+
+pytestmark = pytest.mark.django_db
+
+
+def test_api_documents_duplicate_anonymous():
+    """Anonymous users should not be allowed to duplicate a document."""
+    document = factories.DocumentFactory(link_reach="public")
+
+    response = APIClient().post(f"/api/v1.0/documents/{document.id!s}/duplicate/")
+
+    assert response.status_code == 401
+    assert models.Document.objects.count() == 1
+
+
+def test_api_documents_duplicate_authenticated_no_access():
+    """Users should not be allowed to duplicate a document they can't read."""
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+
+    document = factories.DocumentFactory(link_reach="restricted")
+
+    response = client.post(f"/api/v1.0/documents/{document.id!s}/duplicate/")
+
+    assert response.status_code == 403
+    assert models.Document.objects.count() == 1
+
+
+def test_api_documents_duplicate_reader_success():
+    """
+    Users who can read a document should be allowed to duplicate it to a new root
+    document they own, the content being copied in object storage.
+    """
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+
+    document = factories.DocumentFactory(
+        title="my document", link_reach="authenticated", link_role="reader"
+    )
+    document.content = "my content"
+    document.save()
+
+    s3_client = default_storage.connection.meta.client
+    with (
+        mock.patch.object(
+            s3_client, "get_object", wraps=s3_client.get_object
+        ) as mock_get_object,
+        mock.patch.object(
+            s3_client, "put_object", wraps=s3_client.put_object
+        ) as mock_put_object,
+    ):
+        response = client.post(f"/api/v1.0/documents/{document.id!s}/duplicate/")
+
+    assert response.status_code == 201
+    mock_get_object.assert_not_called()
+    mock_put_object.assert_not_called()
+
+    duplicate = models.Document.objects.get(pk=response.json()["id"])
+    assert duplicate.is_root()
+    assert duplicate.title == "Copy of my document"
+    assert duplicate.link_reach == "restricted"
+    assert duplicate.creator == user
+    assert duplicate.content == "my content"
+    assert duplicate.content_digest == document.content_digest
+    assert duplicate.content_size == document.content_size
+    assert duplicate.get_versions_slice()["count"] == 0
+    assert duplicate.versions.count() == 1
+    assert list(duplicate.accesses.values_list("user", "role")) == [(user.id, "owner")]
+
+
+def test_api_documents_duplicate_with_descendants():
+    """
+    Descendants should be duplicated with the document if requested, except those
+    that are deleted along with their own descendants.
+    """
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+
+    document = factories.DocumentFactory(users=[(user, "owner")])
+    child1 = factories.DocumentFactory(parent=document, title="child 1")
+    grand_child = factories.DocumentFactory(
+        parent=child1, title="grand child", link_reach="public"
+    )
+    grand_child.content = "grand child content"
+    grand_child.save()
+    child2 = factories.DocumentFactory(parent=document, title="child 2")
+    factories.DocumentFactory(parent=child2, title="deleted child")
+    child2.soft_delete()
+
+    response = client.post(
+        f"/api/v1.0/documents/{document.id!s}/duplicate/",
+        {"with_descendants": True},
+        format="json",
+    )
+
+    assert response.status_code == 201
+    duplicate = models.Document.objects.get(pk=response.json()["id"])
+    assert duplicate.numchild == 1
+    assert duplicate.get_descendant_count() == 2
+
+    [child1_copy] = duplicate.get_children()
+    assert child1_copy.title == "child 1"
+    assert child1_copy.path.startswith(duplicate.path)
+    assert child1_copy.numchild == 1
+
+    [grand_child_copy] = child1_copy.get_children()
+    assert grand_child_copy.title == "grand child"
+    assert grand_child_copy.link_reach == "public"
+    assert grand_child_copy.depth == 3
+    assert grand_child_copy.creator == user
+    assert grand_child_copy.content == "grand child content"
+    assert {tuple(link) for link in grand_child_copy.ancestors_links} == {
+        ("restricted", "reader"),
+        (child1.link_reach, child1.link_role),
+    }
+    assert not grand_child_copy.accesses.exists()
+
+    # The duplicated tree remains consistent
+    assert models.Document.find_problems() == ([], [], [], [], [])
+
+
+def test_api_documents_duplicate_without_descendants():
+    """Descendants should not be duplicated by default."""
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+
+    document = factories.DocumentFactory(users=[(user, "owner")])
+    factories.DocumentFactory(parent=document)
+
+    response = client.post(f"/api/v1.0/documents/{document.id!s}/duplicate/")
+
+    assert response.status_code == 201
+    duplicate = models.Document.objects.get(pk=response.json()["id"])
+    assert duplicate.numchild == 0
+    assert duplicate.get_descendant_count() == 0
+
+
+def test_api_documents_duplicate_attachments():
+    """
+    Attachments should be copied with the document and the attachment URLs of the
+    content rewritten to point to the copies.
+    """
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+
+    document = factories.DocumentFactory(users=[(user, "owner")])
+    key = f"{document.id!s}/attachments/f00b5a8e-7c43-4bd6-a5fc-1f8a0a0b5e47.png"
+    default_storage.connection.meta.client.put_object(
+        Bucket=default_storage.bucket_name, Key=key, Body=b"image", ContentType="png"
+    )
+    original_content = base64.b64encode(
+        f"my content with /media/{key:s}".encode()
+    ).decode()
+    document.content = original_content
+    document.save()
+
+    response = client.post(f"/api/v1.0/documents/{document.id!s}/duplicate/")
+
+    assert response.status_code == 201
+    duplicate = models.Document.objects.get(pk=response.json()["id"])
+    copied_key = key.replace(str(document.id), str(duplicate.id))
+    copied_file = default_storage.connection.meta.client.get_object(
+        Bucket=default_storage.bucket_name, Key=copied_key
+    )
+    assert copied_file["Body"].read() == b"image"
+
+    content = base64.b64encode(f"my content with /media/{copied_key:s}".encode())
+    assert duplicate.content == content.decode()
+    assert duplicate.content_digest == hashlib.sha256(content).hexdigest()
+    assert duplicate.content_size == len(content)
+    # The original document is left untouched
+    assert models.Document.objects.get(pk=document.pk).content == original_content
+
+
+def test_api_documents_duplicate_too_many_documents(settings):
+    """Duplicating more documents than allowed at once should be refused."""
+    settings.DOCUMENT_DUPLICATION_MAX_DOCUMENTS = 2
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+
+    document = factories.DocumentFactory(users=[(user, "owner")])
+    factories.DocumentFactory.create_batch(2, parent=document)
+
+    response = client.post(
+        f"/api/v1.0/documents/{document.id!s}/duplicate/",
+        {"with_descendants": True},
+        format="json",
+    )
+
+    assert response.status_code == 400
+    assert response.json() == {
+        "with_descendants": ["This document has too many descendants to be duplicated."]
+    }
+    assert models.Document.objects.count() == 3
+
+
+def list_objects_keys():
+    """Return the keys of all the objects of all the versions in the bucket."""
+    paginator = default_storage.connection.meta.client.get_paginator(
+        "list_object_versions"
+    )
+    return {
+        (item["Key"], item["VersionId"])
+        for page in paginator.paginate(Bucket=default_storage.bucket_name)
+        for item in page.get("Versions", []) + page.get("DeleteMarkers", [])
+    }
+
+
+def test_api_documents_duplicate_failure_deletes_copied_objects():
+    """
+    Objects copied for a duplication that fails should be deleted along with the
+    rows of the copies.
+    """
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+
+    document = factories.DocumentFactory(users=[(user, "owner")])
+    key = f"{document.id!s}/attachments/f00b5a8e-7c43-4bd6-a5fc-1f8a0a0b5e47.png"
+    default_storage.connection.meta.client.put_object(
+        Bucket=default_storage.bucket_name, Key=key, Body=b"image", ContentType="png"
+    )
+    objects_keys = list_objects_keys()
+
+    client.raise_request_exception = False
+    with mock.patch.object(
+        models.DocumentVersion.objects, "bulk_create", side_effect=OSError
+    ):
+        response = client.post(f"/api/v1.0/documents/{document.id!s}/duplicate/")
+
+    assert response.status_code == 500
+    assert models.Document.objects.count() == 1
+    assert list_objects_keys() == objects_keys
+
+
+def test_api_documents_duplicate_without_object():
+    """
+    Copies of documents that have no object in object storage should not get the digest
+    of their source.
+    """
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+
+    document = factories.DocumentFactory(users=[(user, "owner")])
+    default_storage.connection.meta.client.delete_object(
+        Bucket=default_storage.bucket_name, Key=document.file_key
+    )
+
+    response = client.post(f"/api/v1.0/documents/{document.id!s}/duplicate/")
+
+    assert response.status_code == 201
+    duplicate = models.Document.objects.get(pk=response.json()["id"])
+    assert duplicate.content_digest is None
+    assert duplicate.content_size is None
+    assert not duplicate.versions.exists()
+
+
+def test_api_documents_duplicate_search_vectors(
+    settings, django_capture_on_commit_callbacks
+):
+    """
+    Copies should get the up to date search vectors of their source without indexing
+    them again, copies of documents not indexed yet should be indexed after the commit.
+    """
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+
+    document = factories.DocumentFactory(
+        content="Quarterly budget review",
+        users=[(user, "reader")],
+    )
+    document.index_content()
+    child = factories.DocumentFactory(parent=document, content="Roadmap")
+
+    with (
+        mock.patch(
+            "core.tasks.documents.index_document_content.apply_async"
+        ) as mock_index,
+        django_capture_on_commit_callbacks(execute=True),
+    ):
+        response = client.post(
+            f"/api/v1.0/documents/{document.id!s}/duplicate/",
+            {"with_descendants": True},
+            format="json",
+        )
+
+    assert response.status_code == 201
+    duplicate = models.Document.objects.get(pk=response.json()["id"])
+    search_vector = models.DocumentSearchVector.objects.get(document=duplicate)
+    assert search_vector.content_digest == document.content_digest
+    assert list(
+        models.Document.objects.filter(search_vector__vector="budget").order_by(
+            "created_at"
+        )
+    ) == [document, duplicate]
+
+    duplicated_child = duplicate.get_children().get()
+    assert duplicated_child.content_digest == child.content_digest
+    assert not models.DocumentSearchVector.objects.filter(
+        document=duplicated_child
+    ).exists()
+    mock_index.assert_called_once_with(
+        (str(duplicated_child.pk),), countdown=settings.DOCUMENT_SEARCH_INDEXING_DELAY
+    )
@@ -6,6 +6,9 @@ import random
 from datetime import timedelta
 from unittest import mock
 
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 
 import pytest
@@ -14,6 +17,7 @@ from rest_framework.pagination import PageNumberPagination
 from rest_framework.test import APIClient
 
 from core import factories, models
+from core.api import utils
 
 fake = Faker()
 pytestmark = pytest.mark.django_db
@@ -147,11 +151,12 @@ def test_api_documents_list_authenticated_direct(django_assert_num_queries):
         str(child4_with_access.id),
     }
 
-    with django_assert_num_queries(8):
+    with django_assert_num_queries(4):
         response = client.get("/api/v1.0/documents/")
 
-    # nb_accesses should now be cached
-    with django_assert_num_queries(4):
+    # Root documents are now cached and nb_accesses are counted in the query fetching
+    # the page, not one by one
+    with django_assert_num_queries(3):
         response = client.get("/api/v1.0/documents/")
 
     assert response.status_code == 200
@@ -185,11 +190,12 @@ def test_api_documents_list_authenticated_via_team(
 
     expected_ids = {str(document.id) for document in documents_team1 + documents_team2}
 
-    with django_assert_num_queries(9):
+    with django_assert_num_queries(4):
         response = client.get("/api/v1.0/documents/")
 
-    # nb_accesses should now be cached
-    with django_assert_num_queries(4):
+    # Root documents are now cached and nb_accesses are counted in the query fetching
+    # the page, not one by one
+    with django_assert_num_queries(3):
         response = client.get("/api/v1.0/documents/")
 
     assert response.status_code == 200
@@ -218,11 +224,12 @@ def test_api_documents_list_authenticated_link_reach_restricted(
     other_document = factories.DocumentFactory(link_reach="public")
     models.LinkTrace.objects.create(document=other_document, user=user)
 
-    with django_assert_num_queries(5):
+    with django_assert_num_queries(4):
         response = client.get("/api/v1.0/documents/")
 
-    # nb_accesses should now be cached
-    with django_assert_num_queries(4):
+    # Root documents are now cached and nb_accesses are counted in the query fetching
+    # the page, not one by one
+    with django_assert_num_queries(3):
         response = client.get("/api/v1.0/documents/")
 
     assert response.status_code == 200
@@ -267,11 +274,12 @@ def test_api_documents_list_authenticated_link_reach_public_or_authenticated(
 
     expected_ids = {str(document1.id), str(document2.id), str(visible_child.id)}
 
-    with django_assert_num_queries(7):
+    with django_assert_num_queries(4):
         response = client.get("/api/v1.0/documents/")
 
-    # nb_accesses should now be cached
-    with django_assert_num_queries(4):
+    # Root documents are now cached and nb_accesses are counted in the query fetching
+    # the page, not one by one
+    with django_assert_num_queries(3):
         response = client.get("/api/v1.0/documents/")
 
     assert response.status_code == 200
@@ -328,6 +336,103 @@ def test_api_documents_list_pagination(
     assert document_ids == []
 
 
+def get_cursor_pages(client, url):
+    """Follow the next links of a cursor paginated list and return its pages."""
+    pages = []
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        content = response.json()
+        pages.append(content)
+        url = content["next"]
+    return pages
+
+
+@mock.patch.object(PageNumberPagination, "get_page_size", return_value=2)
+def test_api_documents_list_cursor_pagination(_mock_page_size):
+    """
+    Cursor pagination should go through documents in the active ordering, whatever
+    duplicate or null values it contains, back and forth and without counting them.
+    """
+    user = factories.UserFactory()
+
+    client = APIClient()
+    client.force_login(user)
+
+    documents = [
+        factories.DocumentFactory(title=title, users=[user])
+        for title in ["b", None, "a", "b", "c"]
+    ]
+    expected_ids = [
+        str(document.id)
+        for document in sorted(
+            documents, key=lambda d: (d.title is None, d.title or "", d.id)
+        )
+    ]
+
+    with CaptureQueriesContext(connection) as queries:
+        pages = get_cursor_pages(client, "/api/v1.0/documents/?ordering=title&cursor=")
+
+    assert not any("COUNT(" in query["sql"] for query in queries.captured_queries)
+    assert [len(page["results"]) for page in pages] == [2, 2, 1]
+    assert all("count" not in page for page in pages)
+    assert pages[0]["previous"] is None
+    assert [result["id"] for page in pages for result in page["results"]] == (
+        expected_ids
+    )
+
+    # Going back from the last page should give the same pages
+    response = client.get(pages[-1]["previous"])
+    assert response.json()["results"] == pages[1]["results"]
+    response = client.get(response.json()["previous"])
+    assert response.json()["results"] == pages[0]["results"]
+    assert response.json()["previous"] is None
+
+    # Descending order keeps null titles first
+    pages = get_cursor_pages(client, "/api/v1.0/documents/?ordering=-title&cursor=")
+    assert [result["id"] for page in pages for result in page["results"]] == (
+        expected_ids[::-1]
+    )
+
+
+def test_api_documents_list_cursor_pagination_estimated_count():
+    """The number of documents should be estimated only if the client asks for it."""
+    user = factories.UserFactory()
+
+    client = APIClient()
+    client.force_login(user)
+
+    factories.DocumentFactory.create_batch(2, users=[user])
+
+    response = client.get("/api/v1.0/documents/?cursor=&count=estimate")
+
+    assert response.status_code == 200
+    content = response.json()
+    assert isinstance(content["count"], int)
+    assert len(content["results"]) == 2
+
+
+@mock.patch.object(PageNumberPagination, "get_page_size", return_value=1)
+def test_api_documents_list_cursor_pagination_invalid_cursor(_mock_page_size):
+    """
+    Tampered cursors, or cursors issued for another ordering, should be rejected.
+    """
+    user = factories.UserFactory()
+
+    client = APIClient()
+    client.force_login(user)
+
+    factories.DocumentFactory.create_batch(2, users=[user])
+
+    response = client.get("/api/v1.0/documents/?cursor=invalid")
+    assert response.status_code == 404
+    assert response.json() == {"detail": "Invalid cursor"}
+
+    next_url = client.get("/api/v1.0/documents/?cursor=").json()["next"]
+    response = client.get(f"{next_url:s}&ordering=title")
+    assert response.status_code == 404
+
+
 def test_api_documents_list_authenticated_distinct():
     """A document with several related users should only be listed once."""
     user = factories.UserFactory()
@@ -362,11 +467,12 @@ def test_api_documents_list_favorites_no_extra_queries(django_assert_num_queries
     factories.DocumentFactory.create_batch(2, users=[user])
 
     url = "/api/v1.0/documents/"
-    with django_assert_num_queries(9):
+    with django_assert_num_queries(4):
         response = client.get(url)
 
-    # nb_accesses should now be cached
-    with django_assert_num_queries(4):
+    # Root documents are now cached and nb_accesses are counted in the query fetching
+    # the page, not one by one
+    with django_assert_num_queries(3):
         response = client.get(url)
 
     assert response.status_code == 200
@@ -379,7 +485,7 @@ def test_api_documents_list_favorites_no_extra_queries(django_assert_num_queries
     for document in special_documents:
         models.DocumentFavorite.objects.create(document=document, user=user)
 
-    with django_assert_num_queries(4):
+    with django_assert_num_queries(3):
         response = client.get(url)
 
     assert response.status_code == 200
@@ -393,3 +499,274 @@ def test_api_documents_list_favorites_no_extra_queries(django_assert_num_queries
             assert result["is_favorite"] is True
         else:
             assert result["is_favorite"] is False
+
+
+def test_api_documents_list_sparse_fieldset():
+    """
+    The "fields" and "omit" query parameters should select the fields returned for each
+    document, and fields left out should not be computed.
+    """
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+
+    document = factories.DocumentFactory(users=[user])
+
+    with mock.patch.object(
+        models.Document, "nb_accesses", new_callable=mock.PropertyMock
+    ) as mock_nb_accesses:
+        response = client.get(
+            "/api/v1.0/documents/?fields=id,title,nb_accesses&omit=nb_accesses"
+        )
+
+    assert response.status_code == 200
+    assert response.json()["results"] == [
+        {"id": str(document.id), "title": document.title}
+    ]
+    mock_nb_accesses.assert_not_called()
+
+
+def test_api_documents_list_nb_accesses_annotated():
+    """
+    The number of accesses of listed documents, including accesses on their ancestors,
+    should be counted in the query fetching the page without looking up the cache.
+    """
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+
+    parent = factories.DocumentFactory(users=[factories.UserFactory()])
+    document = factories.DocumentFactory(parent=parent, users=[user])
+    factories.UserDocumentAccessFactory.create_batch(2, document=document)
+    other_document = factories.DocumentFactory(users=[user])
+
+    with mock.patch.object(
+        models.Document, "get_nb_accesses_cache_key"
+    ) as mock_cache_key:
+        response = client.get("/api/v1.0/documents/?fields=id,nb_accesses")
+
+    assert response.status_code == 200
+    assert sorted(
+        response.json()["results"], key=lambda result: result["nb_accesses"]
+    ) == [
+        {"id": str(other_document.id), "nb_accesses": 1},
+        {"id": str(document.id), "nb_accesses": 4},
+    ]
+    mock_cache_key.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    "strategy, num_queries",
+    [
+        ("python", 4),
+        ("sql", 3),
+    ],
+)
+def test_api_documents_list_root_documents_strategies(
+    strategy, num_queries, settings, django_assert_num_queries
+):
+    """
+    Only the highest ancestors among accessible documents should be listed whatever
+    the strategy, the "sql" strategy not fetching all paths beforehand.
+    """
+    settings.DOCUMENT_LIST_ROOT_DOCUMENTS_STRATEGY = strategy
+    settings.DOCUMENT_LIST_ROOTS_CACHE_TIMEOUT = 0
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+
+    root = factories.DocumentFactory(users=[user])
+    factories.DocumentFactory(parent=root, users=[user])
+    parent = factories.DocumentFactory()
+    child = factories.DocumentFactory(parent=parent, users=[user])
+    factories.DocumentFactory(parent=child, users=[user])
+
+    with django_assert_num_queries(num_queries):
+        response = client.get("/api/v1.0/documents/?fields=id")
+
+    assert response.status_code == 200
+    assert {result["id"] for result in response.json()["results"]} == {
+        str(root.id),
+        str(child.id),
+    }
+
+
+def test_api_documents_list_root_documents_cached():
+    """
+    The root documents listed to a user should be computed once and cached until an
+    event invalidates them. Filtered lists should not use the cache.
+    """
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+
+    document = factories.DocumentFactory(users=[user], title="my document")
+
+    with mock.patch.object(
+        utils, "filter_root_documents", wraps=utils.filter_root_documents
+    ) as mock_filter:
+        response = client.get("/api/v1.0/documents/?fields=id")
+        assert response.status_code == 200
+        assert mock_filter.call_count == 1
+
+        response = client.get("/api/v1.0/documents/?fields=id")
+        assert response.status_code == 200
+        assert mock_filter.call_count == 1
+
+        response = client.get("/api/v1.0/documents/?fields=id&title=my")
+        assert response.status_code == 200
+        assert mock_filter.call_count == 2
+
+    assert response.json()["results"] == [{"id": str(document.id)}]
+
+
+def test_api_documents_list_root_documents_cache_disabled(settings):
+    """The root documents should be computed on each request if the cache is disabled."""
+    settings.DOCUMENT_LIST_ROOTS_CACHE_TIMEOUT = 0
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+
+    factories.DocumentFactory(users=[user])
+
+    with mock.patch.object(
+        utils, "filter_root_documents", wraps=utils.filter_root_documents
+    ) as mock_filter:
+        client.get("/api/v1.0/documents/?fields=id")
+        client.get("/api/v1.0/documents/?fields=id")
+
+    assert mock_filter.call_count == 2
+
+
+def get_listed_ids(client):
+    """Return the ids of the documents listed to the logged-in user."""
+    response = client.get("/api/v1.0/documents/?fields=id")
+    assert response.status_code == 200
+    return {result["id"] for result in response.json()["results"]}
+
+
+def test_api_documents_list_root_documents_cache_invalidated_accesses():
+    """Creating or deleting an access should invalidate the root documents cached."""
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+
+    parent = factories.DocumentFactory()
+    child = factories.DocumentFactory(parent=parent, users=[user])
+    assert get_listed_ids(client) == {str(child.id)}
+
+    access = factories.UserDocumentAccessFactory(document=parent, user=user)
+    assert get_listed_ids(client) == {str(parent.id)}
+
+    access.delete()
+    assert get_listed_ids(client) == {str(child.id)}
+
+
+def test_api_documents_list_root_documents_cache_invalidated_on_commit(
+    django_capture_on_commit_callbacks,
+):
+    """
+    Roots computed while an access is created, before its transaction is committed,
+    should not be served once it is committed.
+    """
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+
+    parent = factories.DocumentFactory()
+    child = factories.DocumentFactory(parent=parent, users=[user])
+    assert get_listed_ids(client) == {str(child.id)}
+
+    generation_key = models.get_document_roots_generation_key(user_id=user.id)
+    with django_capture_on_commit_callbacks(execute=True):
+        factories.UserDocumentAccessFactory(document=parent, user=user)
+        # A list computed from the previous state during the transaction
+        generation = cache.get(generation_key)
+        with mock.patch.object(
+            utils,
+            "filter_root_documents",
+            return_value=models.Document.objects.filter(pk=child.pk),
+        ):
+            assert get_listed_ids(client) == {str(child.id)}
+
+    assert cache.get(generation_key) != generation
+    assert get_listed_ids(client) == {str(parent.id)}
+
+
+def test_api_documents_list_root_documents_cache_invalidated_team_accesses(
+    mock_user_teams,
+):
+    """Creating an access for a team should invalidate the roots cached for members."""
+    mock_user_teams.return_value = ["team1"]
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+
+    assert get_listed_ids(client) == set()
+
+    access = factories.TeamDocumentAccessFactory(team="team1")
+    assert get_listed_ids(client) == {str(access.document_id)}
+
+
+def test_api_documents_list_root_documents_cache_invalidated_link_traces(
+    django_capture_on_commit_callbacks,
+):
+    """
+    Tracing a link, or restricting the link reach of a traced document, should
+    invalidate the root documents cached.
+    """
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+
+    document = factories.DocumentFactory(link_reach="public")
+    assert get_listed_ids(client) == set()
+
+    models.LinkTrace.objects.create(document=document, user=user)
+    assert get_listed_ids(client) == {str(document.id)}
+
+    document.link_reach = "restricted"
+    with django_capture_on_commit_callbacks(execute=True):
+        document.save()
+    assert get_listed_ids(client) == set()
+
+
+def test_api_documents_list_root_documents_cache_invalidated_soft_delete_restore():
+    """Soft deleting or restoring a document should invalidate the roots cached."""
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+
+    parent = factories.DocumentFactory(users=[user])
+    child = factories.DocumentFactory(parent=parent, users=[user])
+    assert get_listed_ids(client) == {str(parent.id)}
+
+    parent.soft_delete()
+    assert get_listed_ids(client) == set()
+
+    parent.refresh_from_db()
+    parent.restore()
+    assert get_listed_ids(client) == {str(parent.id)}
+
+    child.refresh_from_db()
+    child.soft_delete()
+    assert get_listed_ids(client) == {str(parent.id)}
+
+
+def test_api_documents_list_root_documents_cache_invalidated_move():
+    """Moving a document should invalidate the roots cached for users of its subtree."""
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+
+    target = factories.DocumentFactory(users=[user])
+    document = factories.DocumentFactory(users=[user])
+    child = factories.DocumentFactory(parent=document, users=[user])
+    assert get_listed_ids(client) == {str(target.id), str(document.id)}
+
+    document.move(target, pos="first-child")
+    assert get_listed_ids(client) == {str(target.id)}
+
+    child.refresh_from_db()
+    child.move(target, pos="last-sibling")
+    assert get_listed_ids(client) == {str(target.id), str(child.id)}
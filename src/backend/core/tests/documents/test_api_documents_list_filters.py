@@ -354,3 +354,125 @@ def test_api_documents_list_filter_title(query, nb_results):
     # Ensure all results contain the query in their title
     for result in results:
         assert query.lower().strip() in result["title"].lower()
+
+
+# Filters: q
+
+
+def test_api_documents_list_filter_q_ranked():
+    """
+    Authenticated users should be able to search documents with a title similar to
+    their query, typos included, the most similar first.
+    """
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+
+    long_title = factories.DocumentFactory(title="Roadmap 2025 draft", users=[user])
+    exact_title = factories.DocumentFactory(title="Roadmap", users=[user])
+    factories.DocumentFactory(title="Road trip", users=[user])
+    factories.DocumentFactory(title="Budget", users=[user])
+    factories.DocumentFactory(title=None, users=[user])
+
+    # Similar documents without access should not be listed
+    factories.DocumentFactory(title="Roadmap", link_reach="public")
+
+    response = client.get("/api/v1.0/documents/?q=roadmap")
+
+    assert response.status_code == 200
+    assert [result["id"] for result in response.json()["results"]] == [
+        str(exact_title.id),
+        str(long_title.id),
+    ]
+
+    response = client.get("/api/v1.0/documents/?q=roadmpa")
+
+    assert response.status_code == 200
+    assert {result["id"] for result in response.json()["results"]} == {
+        str(exact_title.id),
+        str(long_title.id),
+    }
+
+
+def test_api_documents_list_filter_q_ranked_by_word():
+    """
+    Search results should be ranked by the similarity of the closest word of their
+    title: long titles containing the exact word come before short fuzzy matches.
+    """
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+
+    fuzzy_title = factories.DocumentFactory(title="Roadmaps", users=[user])
+    exact_word = factories.DocumentFactory(
+        title="The product roadmap for the next quarters", users=[user]
+    )
+
+    response = client.get("/api/v1.0/documents/?q=roadmap")
+
+    assert response.status_code == 200
+    assert [result["id"] for result in response.json()["results"]] == [
+        str(exact_word.id),
+        str(fuzzy_title.id),
+    ]
+
+
+def test_api_documents_list_filter_q_ordering():
+    """An explicit ordering should take precedence over the ranking of the search."""
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+
+    long_title = factories.DocumentFactory(title="Roadmap 2025 draft", users=[user])
+    exact_title = factories.DocumentFactory(title="Roadmap", users=[user])
+
+    response = client.get("/api/v1.0/documents/?q=roadmap&ordering=-title")
+
+    assert response.status_code == 200
+    assert [result["id"] for result in response.json()["results"]] == [
+        str(long_title.id),
+        str(exact_title.id),
+    ]
+
+
+def test_api_documents_list_filter_q_root_documents():
+    """Searching should list the highest ancestors among the matching documents."""
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+
+    parent = factories.DocumentFactory(title="Meeting notes", users=[user])
+    factories.DocumentFactory(
+        title="Meeting notes of june", parent=parent, users=[user]
+    )
+    other_parent = factories.DocumentFactory(title="Budget", users=[user])
+    child = factories.DocumentFactory(
+        title="Meeting minutes", parent=other_parent, users=[user]
+    )
+
+    response = client.get("/api/v1.0/documents/?q=meeting")
+
+    assert response.status_code == 200
+    assert {result["id"] for result in response.json()["results"]} == {
+        str(parent.id),
+        str(child.id),
+    }
+
+
+def test_api_documents_list_filter_q_cursor():
+    """
+    Cursor pagination can't follow the ranking of searches: combining them should be
+    refused rather than returning unranked results.
+    """
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+
+    factories.DocumentFactory(title="Roadmap", users=[user])
+
+    response = client.get("/api/v1.0/documents/?q=roadmap&cursor=")
+
+    assert response.status_code == 400
+    assert response.json() == {
+        "cursor": ["Cursor pagination is not available for searches."]
+    }
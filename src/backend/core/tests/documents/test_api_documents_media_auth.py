@@ -3,7 +3,9 @@ Test file uploads API endpoint for users in impress's core app.
 """
 
 import uuid
+from datetime import timedelta
 from io import BytesIO
+from unittest import mock
 from urllib.parse import urlparse
 
 from django.conf import settings
@@ -12,9 +14,11 @@ from django.utils import timezone
 
 import pytest
 import requests
+from freezegun import freeze_time
 from rest_framework.test import APIClient
 
-from core import factories
+from core import factories, models
+from core.api import utils
 from core.tests.conftest import TEAM, USER, VIA
 
 pytestmark = pytest.mark.django_db
@@ -236,3 +240,328 @@ def test_api_documents_media_auth_related(via, mock_user_teams):
         timeout=1,
     )
     assert response.content.decode("utf-8") == "my prose"
+
+
+def test_api_documents_media_auth_decision_cached():
+    """
+    The decision should be cached so that the next subrequests of a user for attachments
+    of the same document do not fetch the document nor compute its abilities.
+    """
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+
+    document = factories.DocumentFactory(link_reach="restricted")
+    factories.UserDocumentAccessFactory(document=document, user=user)
+
+    with mock.patch.object(
+        models.Document, "get_abilities", wraps=document.get_abilities
+    ) as mock_get_abilities:
+        for _i in range(3):
+            response = client.get(
+                "/api/v1.0/documents/media-auth/",
+                HTTP_X_ORIGINAL_URL=(
+                    f"http://localhost/media/{document.pk!s}/attachments/"
+                    f"{uuid.uuid4()!s}.jpg"
+                ),
+            )
+            assert response.status_code == 200
+
+    assert mock_get_abilities.call_count == 1
+
+
+def test_api_documents_media_auth_decision_cache_disabled(settings):
+    """Decisions should be computed for each subrequest if the cache is disabled."""
+    settings.DOCUMENT_AUTH_CACHE_TIMEOUT = 0
+    document = factories.DocumentFactory(link_reach="public")
+    media_url = (
+        f"http://localhost/media/{document.pk!s}/attachments/{uuid.uuid4()!s}.jpg"
+    )
+
+    with mock.patch.object(
+        models.Document, "get_abilities", wraps=document.get_abilities
+    ) as mock_get_abilities:
+        for _i in range(2):
+            response = APIClient().get(
+                "/api/v1.0/documents/media-auth/", HTTP_X_ORIGINAL_URL=media_url
+            )
+            assert response.status_code == 200
+
+    assert mock_get_abilities.call_count == 2
+
+
+def test_api_documents_media_auth_decision_cache_access_changes():
+    """Cached decisions should be invalidated when accesses on ancestors change."""
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+
+    parent = factories.DocumentFactory(link_reach="restricted")
+    document = factories.DocumentFactory(parent=parent, link_reach="restricted")
+    media_url = (
+        f"http://localhost/media/{document.pk!s}/attachments/{uuid.uuid4()!s}.jpg"
+    )
+
+    response = client.get(
+        "/api/v1.0/documents/media-auth/", HTTP_X_ORIGINAL_URL=media_url
+    )
+    assert response.status_code == 403
+
+    access = factories.UserDocumentAccessFactory(document=parent, user=user)
+    response = client.get(
+        "/api/v1.0/documents/media-auth/", HTTP_X_ORIGINAL_URL=media_url
+    )
+    assert response.status_code == 200
+
+    access.delete()
+    response = client.get(
+        "/api/v1.0/documents/media-auth/", HTTP_X_ORIGINAL_URL=media_url
+    )
+    assert response.status_code == 403
+
+
+def test_api_documents_media_auth_decision_cache_link_changes(
+    django_capture_on_commit_callbacks,
+):
+    """Cached decisions should be invalidated when the link configuration changes."""
+    document = factories.DocumentFactory(link_reach="public")
+    media_url = (
+        f"http://localhost/media/{document.pk!s}/attachments/{uuid.uuid4()!s}.jpg"
+    )
+
+    response = APIClient().get(
+        "/api/v1.0/documents/media-auth/", HTTP_X_ORIGINAL_URL=media_url
+    )
+    assert response.status_code == 200
+
+    document.link_reach = "restricted"
+    with django_capture_on_commit_callbacks(execute=True):
+        document.save()
+
+    response = APIClient().get(
+        "/api/v1.0/documents/media-auth/", HTTP_X_ORIGINAL_URL=media_url
+    )
+    assert response.status_code == 403
+
+
+def test_api_documents_media_auth_decision_cache_soft_delete():
+    """Cached decisions should be invalidated when an ancestor is soft deleted."""
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+
+    parent = factories.DocumentFactory(link_reach="public")
+    document = factories.DocumentFactory(parent=parent, link_reach="public")
+    media_url = (
+        f"http://localhost/media/{document.pk!s}/attachments/{uuid.uuid4()!s}.jpg"
+    )
+
+    response = client.get(
+        "/api/v1.0/documents/media-auth/", HTTP_X_ORIGINAL_URL=media_url
+    )
+    assert response.status_code == 200
+
+    parent.soft_delete()
+    response = client.get(
+        "/api/v1.0/documents/media-auth/", HTTP_X_ORIGINAL_URL=media_url
+    )
+    assert response.status_code == 403
+
+
+def test_api_documents_media_auth_decision_cache_hard_delete():
+    """Cached decisions should be invalidated when an ancestor is hard deleted."""
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+
+    parent = factories.DocumentFactory(link_reach="public")
+    document = factories.DocumentFactory(parent=parent, link_reach="public")
+    media_url = (
+        f"http://localhost/media/{document.pk!s}/attachments/{uuid.uuid4()!s}.jpg"
+    )
+
+    response = client.get(
+        "/api/v1.0/documents/media-auth/", HTTP_X_ORIGINAL_URL=media_url
+    )
+    assert response.status_code == 200
+
+    parent.delete()
+    response = client.get(
+        "/api/v1.0/documents/media-auth/", HTTP_X_ORIGINAL_URL=media_url
+    )
+    assert response.status_code == 403
+
+
+def test_api_documents_media_auth_mints_capability():
+    """
+    Authorized subrequests should mint a capability for the attachments of the document
+    in a cookie scoped to their path.
+    """
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+
+    document = factories.DocumentFactory(users=[user])
+    media_url = (
+        f"http://localhost/media/{document.pk!s}/attachments/{uuid.uuid4()!s}.jpg"
+    )
+
+    response = client.get(
+        "/api/v1.0/documents/media-auth/", HTTP_X_ORIGINAL_URL=media_url
+    )
+
+    assert response.status_code == 200
+    cookie = response.cookies[utils.MEDIA_CAPABILITY_COOKIE_NAME]
+    assert cookie["path"] == f"/media/{document.pk!s}/attachments/"
+    assert cookie["httponly"] is True
+    assert cookie["max-age"] == 60
+    assert utils.verify_media_capability(cookie.value, document.pk, user.pk) is True
+    assert utils.verify_media_capability(cookie.value, document.pk) is False
+
+
+def test_api_documents_media_auth_capability_disabled(settings):
+    """No capability should be minted if capabilities are disabled."""
+    settings.MEDIA_CAPABILITY_TIMEOUT = 0
+    document = factories.DocumentFactory(link_reach="public")
+    media_url = (
+        f"http://localhost/media/{document.pk!s}/attachments/{uuid.uuid4()!s}.jpg"
+    )
+
+    response = APIClient().get(
+        "/api/v1.0/documents/media-auth/", HTTP_X_ORIGINAL_URL=media_url
+    )
+
+    assert response.status_code == 200
+    assert utils.MEDIA_CAPABILITY_COOKIE_NAME not in response.cookies
+
+
+def test_api_documents_media_check_capability(django_assert_num_queries):
+    """
+    A request carrying a capability for the document should be authorized without
+    any database query.
+    """
+    document = factories.DocumentFactory(link_reach="restricted")
+    media_url = (
+        f"http://localhost/media/{document.pk!s}/attachments/{uuid.uuid4()!s}.jpg"
+    )
+
+    client = APIClient()
+    client.cookies[utils.MEDIA_CAPABILITY_COOKIE_NAME] = utils.sign_media_capability(
+        document.pk
+    )
+
+    with django_assert_num_queries(0):
+        response = client.get(
+            "/api/v1.0/documents/media-check/", HTTP_X_ORIGINAL_URL=media_url
+        )
+
+    assert response.status_code == 200
+    assert "AWS4-HMAC-SHA256 Credential=" in response["Authorization"]
+    assert response["X-Amz-Date"] == timezone.now().strftime("%Y%m%dT%H%M%SZ")
+
+
+@pytest.mark.parametrize(
+    "capability",
+    [
+        None,
+        "invalid",
+        utils.sign_media_capability(uuid.uuid4()),
+    ],
+)
+def test_api_documents_media_check_invalid_capability(capability):
+    """
+    Requests without a valid capability for the document should be delegated to
+    media-auth, which checks the abilities of the user.
+    """
+    document = factories.DocumentFactory(link_reach="restricted")
+    media_url = (
+        f"http://localhost/media/{document.pk!s}/attachments/{uuid.uuid4()!s}.jpg"
+    )
+
+    client = APIClient()
+    if capability:
+        client.cookies[utils.MEDIA_CAPABILITY_COOKIE_NAME] = capability
+
+    response = client.get(
+        "/api/v1.0/documents/media-check/", HTTP_X_ORIGINAL_URL=media_url
+    )
+
+    assert response.status_code == 403
+    assert "Authorization" not in response
+
+
+def test_api_documents_media_check_capability_user(django_assert_num_queries):
+    """
+    Capabilities should only be accepted for the user they were minted for, without
+    any database query.
+    """
+    user = factories.UserFactory()
+    document = factories.DocumentFactory(link_reach="restricted", users=[user])
+    media_url = (
+        f"http://localhost/media/{document.pk!s}/attachments/{uuid.uuid4()!s}.jpg"
+    )
+
+    client = APIClient()
+    client.force_login(user)
+    client.cookies[utils.MEDIA_CAPABILITY_COOKIE_NAME] = utils.sign_media_capability(
+        document.pk, user.pk
+    )
+
+    with django_assert_num_queries(0):
+        response = client.get(
+            "/api/v1.0/documents/media-check/", HTTP_X_ORIGINAL_URL=media_url
+        )
+
+    assert response.status_code == 200
+
+    # A capability minted for another user is delegated to media-auth
+    other_user = factories.UserFactory()
+    client.force_login(other_user)
+    client.cookies[utils.MEDIA_CAPABILITY_COOKIE_NAME] = utils.sign_media_capability(
+        document.pk, user.pk
+    )
+
+    response = client.get(
+        "/api/v1.0/documents/media-check/", HTTP_X_ORIGINAL_URL=media_url
+    )
+
+    assert response.status_code == 403
+
+
+def test_api_documents_media_check_expired_capability():
+    """Expired capabilities should not be accepted."""
+    document = factories.DocumentFactory(link_reach="restricted")
+    media_url = (
+        f"http://localhost/media/{document.pk!s}/attachments/{uuid.uuid4()!s}.jpg"
+    )
+
+    with freeze_time(timezone.now() - timedelta(seconds=61)):
+        capability = utils.sign_media_capability(document.pk)
+
+    client = APIClient()
+    client.cookies[utils.MEDIA_CAPABILITY_COOKIE_NAME] = capability
+
+    response = client.get(
+        "/api/v1.0/documents/media-check/", HTTP_X_ORIGINAL_URL=media_url
+    )
+
+    assert response.status_code == 403
+
+
+def test_api_documents_media_check_delegates_to_media_auth():
+    """
+    Without a capability, authorized requests should go through media-auth and receive
+    a capability for the next attachments.
+    """
+    document = factories.DocumentFactory(link_reach="public")
+    media_url = (
+        f"http://localhost/media/{document.pk!s}/attachments/{uuid.uuid4()!s}.jpg"
+    )
+
+    response = APIClient().get(
+        "/api/v1.0/documents/media-check/", HTTP_X_ORIGINAL_URL=media_url
+    )
+
+    assert response.status_code == 200
+    assert "AWS4-HMAC-SHA256 Credential=" in response["Authorization"]
+    assert utils.MEDIA_CAPABILITY_COOKIE_NAME in response.cookies
@@ -6,6 +6,7 @@ import random
 from datetime import timedelta
 from unittest import mock
 
+from django.core.files.storage import default_storage
 from django.utils import timezone
 
 import pytest
@@ -35,6 +36,7 @@ def test_api_documents_retrieve_anonymous_public_standalone():
             "children_list": True,
             "collaboration_auth": True,
             "destroy": False,
+            "duplicate": False,
             # Anonymous user can't favorite a document even with read access
             "favorite": False,
             "invite_owner": False,
@@ -47,6 +49,7 @@ def test_api_documents_retrieve_anonymous_public_standalone():
             "update": document.link_role == "editor",
             "versions_destroy": False,
             "versions_list": False,
+            "versions_restore": False,
             "versions_retrieve": False,
         },
         "content": document.content,
@@ -91,6 +94,7 @@ def test_api_documents_retrieve_anonymous_public_parent():
             "children_list": True,
             "collaboration_auth": True,
             "destroy": False,
+            "duplicate": False,
             # Anonymous user can't favorite a document even with read access
             "favorite": False,
             "invite_owner": False,
@@ -103,6 +107,7 @@ def test_api_documents_retrieve_anonymous_public_parent():
             "update": grand_parent.link_role == "editor",
             "versions_destroy": False,
             "versions_list": False,
+            "versions_restore": False,
             "versions_retrieve": False,
         },
         "content": document.content,
@@ -181,6 +186,7 @@ def test_api_documents_retrieve_authenticated_unrelated_public_or_authenticated(
             "children_list": True,
             "collaboration_auth": True,
             "destroy": False,
+            "duplicate": True,
             "favorite": True,
             "invite_owner": False,
             "link_configuration": False,
@@ -192,6 +198,7 @@ def test_api_documents_retrieve_authenticated_unrelated_public_or_authenticated(
             "update": document.link_role == "editor",
             "versions_destroy": False,
             "versions_list": False,
+            "versions_restore": False,
             "versions_retrieve": False,
         },
         "content": document.content,
@@ -244,6 +251,7 @@ def test_api_documents_retrieve_authenticated_public_or_authenticated_parent(rea
             "children_list": True,
             "collaboration_auth": True,
             "destroy": False,
+            "duplicate": True,
             "favorite": True,
             "invite_owner": False,
             "link_configuration": False,
@@ -255,6 +263,7 @@ def test_api_documents_retrieve_authenticated_public_or_authenticated_parent(rea
             "update": grand_parent.link_role == "editor",
             "versions_destroy": False,
             "versions_list": False,
+            "versions_restore": False,
             "versions_retrieve": False,
         },
         "content": document.content,
@@ -416,6 +425,7 @@ def test_api_documents_retrieve_authenticated_related_parent():
             "children_list": True,
             "collaboration_auth": True,
             "destroy": access.role == "owner",
+            "duplicate": True,
             "favorite": True,
             "invite_owner": access.role == "owner",
             "link_configuration": access.role in ["administrator", "owner"],
@@ -427,6 +437,7 @@ def test_api_documents_retrieve_authenticated_related_parent():
             "update": access.role != "reader",
             "versions_destroy": access.role in ["administrator", "owner"],
             "versions_list": True,
+            "versions_restore": access.role != "reader",
             "versions_retrieve": True,
         },
         "content": document.content,
@@ -744,7 +755,7 @@ def test_api_documents_retrieve_user_roles(django_assert_num_queries):
     )
     expected_roles = {access.role for access in accesses}
 
-    with django_assert_num_queries(10):
+    with django_assert_num_queries(9):
         response = client.get(f"/api/v1.0/documents/{document.id!s}/")
 
     assert response.status_code == 200
@@ -772,6 +783,41 @@ def test_api_documents_retrieve_numqueries_with_link_trace(django_assert_num_que
     assert response.json()["id"] == str(document.id)
 
 
+def test_api_documents_retrieve_abilities_computed_once():
+    """
+    The abilities of the user should be computed once per request, the permission check
+    and the serialization of the document sharing them.
+    """
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+
+    parent = factories.DocumentFactory(users=[(user, "editor")])
+    document = factories.DocumentFactory(parent=parent)
+
+    with mock.patch.object(
+        models.Document,
+        "compute_abilities",
+        autospec=True,
+        side_effect=models.Document.compute_abilities,
+    ) as mock_compute:
+        response = client.get(f"/api/v1.0/documents/{document.id!s}/")
+
+    assert response.status_code == 200
+    mock_compute.assert_called_once()
+    assert response.json()["abilities"]["update"] is True
+    assert response.json()["user_roles"] == ["editor"]
+
+    # Nothing is memoized across requests
+    models.DocumentAccess.objects.filter(document=parent).update(role="reader")
+    models.EffectiveDocumentRole.objects.filter(path=parent.path).update(role="reader")
+
+    response = client.get(f"/api/v1.0/documents/{document.id!s}/")
+
+    assert response.status_code == 200
+    assert response.json()["abilities"]["update"] is False
+
+
 # Soft/permanent delete
 
 
@@ -933,3 +979,115 @@ def test_api_documents_retrieve_permanently_deleted_related(role, depth):
 
     assert response.status_code == 404
     assert response.json() == {"detail": "Not found."}
+
+
+def test_api_documents_retrieve_sparse_fieldset_fields():
+    """Only the fields listed in the "fields" query parameter should be returned."""
+    document = factories.DocumentFactory(link_reach="public")
+
+    response = APIClient().get(
+        f"/api/v1.0/documents/{document.id!s}/?fields=id,title,unknown"
+    )
+
+    assert response.status_code == 200
+    assert response.json() == {"id": str(document.id), "title": document.title}
+
+
+def test_api_documents_retrieve_sparse_fieldset_omit():
+    """
+    Fields listed in the "omit" query parameter should not be returned nor computed:
+    omitting the content should not read from object storage.
+    """
+    document = factories.DocumentFactory(link_reach="public")
+
+    with (
+        mock.patch.object(
+            default_storage.connection.meta.client, "get_object"
+        ) as mock_get_object,
+        mock.patch.object(
+            models.Document, "nb_accesses", new_callable=mock.PropertyMock
+        ) as mock_nb_accesses,
+    ):
+        response = APIClient().get(
+            f"/api/v1.0/documents/{document.id!s}/?omit=content,nb_accesses"
+        )
+
+    assert response.status_code == 200
+    content = response.json()
+    assert "content" not in content
+    assert "nb_accesses" not in content
+    assert content["title"] == document.title
+    mock_get_object.assert_not_called()
+    mock_nb_accesses.assert_not_called()
+
+
+def test_api_documents_retrieve_etag_not_modified():
+    """
+    A request with a matching "If-None-Match" header should be answered with a 304
+    without reading the content from object storage.
+    """
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+    document = factories.DocumentFactory(users=[user], content="initial")
+
+    response = client.get(f"/api/v1.0/documents/{document.id!s}/")
+
+    assert response.status_code == 200
+    assert response["Cache-Control"] == "private, no-cache"
+    etag = response["ETag"]
+
+    with mock.patch.object(
+        default_storage.connection.meta.client, "get_object"
+    ) as mock_get_object:
+        response = client.get(
+            f"/api/v1.0/documents/{document.id!s}/", HTTP_IF_NONE_MATCH=etag
+        )
+
+    assert response.status_code == 304
+    assert response["ETag"] == etag
+    mock_get_object.assert_not_called()
+
+
+def test_api_documents_retrieve_etag_changes():
+    """The ETag should change with the content, the document and the user."""
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+    document = factories.DocumentFactory(
+        users=[(user, "reader")], link_reach="public", content="initial"
+    )
+    url = f"/api/v1.0/documents/{document.id!s}/"
+
+    etag = client.get(url)["ETag"]
+
+    document.content = "updated"
+    document.save()
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response.json()["content"] == "updated"
+    etag = response["ETag"]
+
+    # Other users have other abilities on the document
+    response = APIClient().get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+
+    # Selecting other fields gives another representation
+    response = client.get(f"{url:s}?omit=content", HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert "content" not in response.json()
+
+
+def test_api_documents_retrieve_etag_no_content_digest():
+    """Documents without content digest can only be validated if content is omitted."""
+    document = factories.DocumentFactory(link_reach="public", content="legacy")
+    models.Document.objects.filter(pk=document.pk).update(content_digest=None)
+    url = f"/api/v1.0/documents/{document.id!s}/"
+
+    response = APIClient().get(url)
+    assert response.status_code == 200
+    assert response.json()["content"] == "legacy"
+    assert "ETag" not in response
+
+    response = APIClient().get(f"{url:s}?omit=content")
+    assert "ETag" in response
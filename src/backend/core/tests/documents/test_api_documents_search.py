@@ -0,0 +1,116 @@
+"""
+Tests for Documents API endpoint in impress's core app: search
+"""
+
+from django.utils import timezone
+
+import pytest
+from rest_framework.test import APIClient
+
+from core import factories
+
+pytestmark = pytest.mark.django_db
+
+
+def create_indexed_document(**kwargs):
+    """Create a document and index its content as the indexing task would."""
+    document = factories.DocumentFactory(**kwargs)
+    document.index_content()
+    return document
+
+
+def test_api_documents_search_anonymous():
+    """Anonymous users should not be allowed to search documents."""
+    create_indexed_document(content="Budget review", link_reach="public")
+
+    response = APIClient().get("/api/v1.0/documents/search/?q=budget")
+
+    assert response.status_code == 401
+    assert response.json() == {
+        "detail": "Authentication credentials were not provided."
+    }
+
+
+def test_api_documents_search_query_required():
+    """A search query should be required."""
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+
+    response = client.get("/api/v1.0/documents/search/?q=%20")
+
+    assert response.status_code == 400
+    assert response.json() == {"q": ["This parameter is required."]}
+
+
+def test_api_documents_search_cursor():
+    """
+    Cursor pagination can't follow the ranking of search results: combining them
+    should be refused rather than returning unranked results.
+    """
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+
+    create_indexed_document(content="Budget review", users=[user])
+
+    response = client.get("/api/v1.0/documents/search/?q=budget&cursor=")
+
+    assert response.status_code == 400
+    assert response.json() == {
+        "cursor": ["Cursor pagination is not available for searches."]
+    }
+
+
+def test_api_documents_search_access_rights():
+    """
+    Authenticated users should only find the documents they can read in the results of
+    a search, the most relevant first.
+    """
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+
+    many_hits = create_indexed_document(
+        content="Budget review: the budget of the budget", users=[user]
+    )
+    one_hit = create_indexed_document(content="Budget review", users=[user])
+    create_indexed_document(content="Roadmap review", users=[user])
+
+    # Roles are inherited from ancestors
+    parent = factories.DocumentFactory(users=[user])
+    child = create_indexed_document(content="Budget notes", parent=parent)
+
+    # Documents accessed through a link are found unless it was restricted since
+    traced = create_indexed_document(
+        content="Budget draft", link_traces=[user], link_reach="authenticated"
+    )
+    create_indexed_document(
+        content="Budget draft", link_traces=[user], link_reach="restricted"
+    )
+
+    # Documents without access or deleted should not be found
+    create_indexed_document(content="Budget review", link_reach="public")
+    create_indexed_document(
+        content="Budget review", users=[user], deleted_at=timezone.now()
+    )
+
+    response = client.get("/api/v1.0/documents/search/?q=budget")
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert results[0]["id"] == str(many_hits.id)
+    assert {result["id"] for result in results} == {
+        str(many_hits.id),
+        str(one_hit.id),
+        str(child.id),
+        str(traced.id),
+    }
+
+    response = client.get('/api/v1.0/documents/search/?q="budget review"')
+
+    assert response.status_code == 200
+    assert {result["id"] for result in response.json()["results"]} == {
+        str(many_hits.id),
+        str(one_hit.id),
+    }
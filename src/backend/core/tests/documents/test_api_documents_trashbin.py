@@ -79,6 +79,7 @@ def test_api_documents_trashbin_format():
             "children_list": True,
             "collaboration_auth": True,
             "destroy": True,
+            "duplicate": True,
             "favorite": True,
             "invite_owner": True,
             "link_configuration": True,
@@ -90,6 +91,7 @@ def test_api_documents_trashbin_format():
             "update": True,
             "versions_destroy": True,
             "versions_list": True,
+            "versions_restore": True,
             "versions_retrieve": True,
         },
         "created_at": document.created_at.isoformat().replace("+00:00", "Z"),
@@ -147,7 +149,7 @@ def test_api_documents_trashbin_authenticated_direct(django_assert_num_queries):
 
     expected_ids = {str(document1.id), str(document2.id), str(document3.id)}
 
-    with django_assert_num_queries(7):
+    with django_assert_num_queries(4):
         response = client.get("/api/v1.0/documents/trashbin/")
 
     with django_assert_num_queries(4):
@@ -189,7 +191,7 @@ def test_api_documents_trashbin_authenticated_via_team(
 
     expected_ids = {str(deleted_document_team1.id), str(deleted_document_team2.id)}
 
-    with django_assert_num_queries(5):
+    with django_assert_num_queries(3):
         response = client.get("/api/v1.0/documents/trashbin/")
 
     with django_assert_num_queries(3):
@@ -254,6 +256,36 @@ def test_api_documents_trashbin_pagination(
     assert document_ids == []
 
 
+@mock.patch.object(PageNumberPagination, "get_page_size", return_value=2)
+def test_api_documents_trashbin_cursor_pagination(_mock_page_size):
+    """Cursor pagination should go through deleted documents in the order of paths."""
+    user = factories.UserFactory()
+
+    client = APIClient()
+    client.force_login(user)
+
+    documents = factories.DocumentFactory.create_batch(
+        3, deleted_at=timezone.now(), users=[(user, "owner")]
+    )
+
+    response = client.get("/api/v1.0/documents/trashbin/?cursor=")
+
+    assert response.status_code == 200
+    content = response.json()
+    assert "count" not in content
+    assert content["previous"] is None
+    assert len(content["results"]) == 2
+
+    response = client.get(content["next"])
+
+    assert response.status_code == 200
+    next_content = response.json()
+    assert next_content["next"] is None
+    assert [
+        result["id"] for result in content["results"] + next_content["results"]
+    ] == [str(document.id) for document in sorted(documents, key=lambda d: d.path)]
+
+
 def test_api_documents_trashbin_distinct():
     """A document with several related users should only be listed once."""
     user = factories.UserFactory()
@@ -1,7 +1,5 @@
 import pytest
 
-from core import factories
-
 
 @pytest.mark.django_db
 def test_update_blank_title_migration(migrator):
@@ -9,12 +7,22 @@ def test_update_blank_title_migration(migrator):
     Test that the migration fixes the titles of documents that are
     "Untitled document", "Unbenanntes Dokument" or "Document sans titre"
     """
-    migrator.apply_initial_migration(("core", "0017_add_fields_for_soft_delete"))
-
-    english_doc = factories.DocumentFactory(title="Untitled document")
-    german_doc = factories.DocumentFactory(title="Unbenanntes Dokument")
-    french_doc = factories.DocumentFactory(title="Document sans titre")
-    other_doc = factories.DocumentFactory(title="My document")
+    old_state = migrator.apply_initial_migration(
+        ("core", "0017_add_fields_for_soft_delete")
+    )
+    # Use the historical model: the current one may have fields that do not exist yet
+    Document = old_state.apps.get_model("core", "Document")
+
+    english_doc = Document.objects.create(
+        title="Untitled document", path="0000001", depth=1
+    )
+    german_doc = Document.objects.create(
+        title="Unbenanntes Dokument", path="0000002", depth=1
+    )
+    french_doc = Document.objects.create(
+        title="Document sans titre", path="0000003", depth=1
+    )
+    other_doc = Document.objects.create(title="My document", path="0000004", depth=1)
 
     assert english_doc.title == "Untitled document"
     assert german_doc.title == "Unbenanntes Dokument"
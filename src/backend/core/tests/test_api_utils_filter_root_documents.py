@@ -0,0 +1,42 @@
+"""
+Unit tests for the filter_root_documents utility function.
+"""
+
+import pytest
+
+from core import factories, models
+from core.api.utils import filter_root_documents
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.mark.parametrize("strategy", ["python", "sql"])
+def test_api_utils_filter_root_documents(strategy, django_assert_num_queries):
+    """
+    Only documents that have no ancestor in the queryset should be kept, whatever the
+    strategy, and the "sql" strategy should not fetch paths beforehand.
+    """
+    root = factories.DocumentFactory(title="root")
+    child = factories.DocumentFactory(parent=root, title="child")
+    factories.DocumentFactory(parent=child, title="grand child")
+    other_child = factories.DocumentFactory(parent=root, title="other child")
+    other_grand_child = factories.DocumentFactory(
+        parent=other_child, title="other grand child"
+    )
+    other_root = factories.DocumentFactory(title="other root")
+
+    # The root is not a candidate: its descendants are roots of the candidate set
+    queryset = models.Document.objects.exclude(pk__in=[root.pk, other_child.pk])
+
+    with django_assert_num_queries(1 if strategy == "python" else 0):
+        filtered = filter_root_documents(queryset, strategy)
+
+    assert set(filtered) == {child, other_grand_child, other_root}
+
+
+def test_api_utils_filter_root_documents_default_strategy(settings):
+    """The strategy should default to the setting."""
+    settings.DOCUMENT_LIST_ROOT_DOCUMENTS_STRATEGY = "unknown"
+
+    with pytest.raises(ValueError, match="Unknown root documents strategy: unknown"):
+        filter_root_documents(models.Document.objects.all())
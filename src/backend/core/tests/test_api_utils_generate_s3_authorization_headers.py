@@ -0,0 +1,123 @@
+"""
+Unit tests for the generate_s3_authorization_headers utility function.
+"""
+
+import uuid
+from unittest import mock
+
+from django.core.files.storage import default_storage
+
+import botocore
+import pytest
+from freezegun import freeze_time
+
+from core.api import utils
+
+
+@pytest.fixture(autouse=True)
+def clear_headers_cache():
+    """Start each test with an empty cache of signed headers."""
+    utils.s3_authorization_headers_cache.clear()
+
+
+def get_key():
+    """Return a random attachment key."""
+    return f"{uuid.uuid4()!s}/attachments/{uuid.uuid4()!s}.png"
+
+
+def test_api_utils_generate_s3_authorization_headers_cached():
+    """Headers signed for a key should be reused without signing again."""
+    key = get_key()
+
+    with mock.patch.object(
+        botocore.auth.S3SigV4Auth,
+        "add_auth",
+        autospec=True,
+        side_effect=botocore.auth.S3SigV4Auth.add_auth,
+    ) as mock_add_auth:
+        headers = utils.generate_s3_authorization_headers(key)
+        assert utils.generate_s3_authorization_headers(key) == headers
+        other_headers = utils.generate_s3_authorization_headers(get_key())
+
+    assert mock_add_auth.call_count == 2
+    assert "AWS4-HMAC-SHA256 Credential=" in headers["Authorization"]
+    assert other_headers["Authorization"] != headers["Authorization"]
+
+
+def test_api_utils_generate_s3_authorization_headers_renewed(settings):
+    """Headers should be signed again once they reach the cache timeout."""
+    settings.S3_AUTHORIZATION_HEADERS_CACHE_TIMEOUT = 60
+    key = get_key()
+
+    with freeze_time("2026-10-17 10:00:00"):
+        headers = utils.generate_s3_authorization_headers(key)
+    with freeze_time("2026-10-17 10:00:59"):
+        assert utils.generate_s3_authorization_headers(key) == headers
+    with freeze_time("2026-10-17 10:01:00"):
+        renewed_headers = utils.generate_s3_authorization_headers(key)
+
+    assert renewed_headers["X-Amz-Date"] == "20261017T100100Z"
+    assert renewed_headers["Authorization"] != headers["Authorization"]
+
+
+def test_api_utils_generate_s3_authorization_headers_timeout_capped(settings):
+    """Headers should be renewed before S3 rejects them whatever the setting."""
+    settings.S3_AUTHORIZATION_HEADERS_CACHE_TIMEOUT = 3600
+    key = get_key()
+
+    with freeze_time("2026-10-17 10:00:00"):
+        headers = utils.generate_s3_authorization_headers(key)
+    with freeze_time("2026-10-17 10:14:00"):
+        assert utils.generate_s3_authorization_headers(key) != headers
+
+
+def test_api_utils_generate_s3_authorization_headers_disabled(settings):
+    """Headers should be signed for each call if the cache is disabled."""
+    settings.S3_AUTHORIZATION_HEADERS_CACHE_TIMEOUT = 0
+    key = get_key()
+
+    with mock.patch.object(
+        botocore.auth.S3SigV4Auth,
+        "add_auth",
+        autospec=True,
+        side_effect=botocore.auth.S3SigV4Auth.add_auth,
+    ) as mock_add_auth:
+        utils.generate_s3_authorization_headers(key)
+        utils.generate_s3_authorization_headers(key)
+
+    assert mock_add_auth.call_count == 2
+
+
+def test_api_utils_generate_s3_authorization_headers_bounded(settings):
+    """The least recently used keys should be evicted beyond the cache size."""
+    settings.S3_AUTHORIZATION_HEADERS_CACHE_SIZE = 2
+    first_key, second_key, third_key = get_key(), get_key(), get_key()
+
+    with freeze_time("2026-10-17 10:00:00"):
+        first_headers = utils.generate_s3_authorization_headers(first_key)
+        utils.generate_s3_authorization_headers(second_key)
+        utils.generate_s3_authorization_headers(first_key)
+        utils.generate_s3_authorization_headers(third_key)
+
+    with freeze_time("2026-10-17 10:00:01"):
+        # The first key was used recently and kept, the second one was evicted
+        assert utils.generate_s3_authorization_headers(first_key) == first_headers
+        assert (
+            utils.generate_s3_authorization_headers(second_key)["X-Amz-Date"]
+            == "20261017T100001Z"
+        )
+
+
+def test_api_utils_generate_s3_authorization_headers_credentials_rotation():
+    """Headers signed with previous credentials should be dropped on rotation."""
+    key = get_key()
+    headers = utils.generate_s3_authorization_headers(key)
+
+    # pylint: disable=protected-access
+    credentials = default_storage.connection.meta.client._request_signer._credentials
+    rotated = botocore.credentials.ReadOnlyCredentials("rotated", "secret", None)
+    with mock.patch.object(credentials, "get_frozen_credentials", return_value=rotated):
+        rotated_headers = utils.generate_s3_authorization_headers(key)
+
+    assert "Credential=rotated/" in rotated_headers["Authorization"]
+    assert rotated_headers != headers
@@ -7,7 +7,7 @@ from django.core.exceptions import ValidationError
 
 import pytest
 
-from core import factories
+from core import factories, models
 
 pytestmark = pytest.mark.django_db
 
@@ -417,3 +417,36 @@ def test_models_document_access_get_abilities_preset_role(django_assert_num_quer
         "partial_update": False,
         "set_role_to": [],
     }
+
+
+# Effective roles
+
+
+def test_models_document_access_effective_role_sync():
+    """The effective role of an access should follow the access."""
+    document = factories.DocumentFactory()
+    access = factories.UserDocumentAccessFactory(document=document, role="reader")
+
+    effective_role = access.effective_role
+    assert effective_role.user == access.user
+    assert effective_role.team == ""
+    assert effective_role.path == document.path
+    assert effective_role.role == "reader"
+
+    access.role = "editor"
+    access.save()
+    effective_role.refresh_from_db()
+    assert effective_role.role == "editor"
+
+    access.delete()
+    assert not models.EffectiveDocumentRole.objects.exists()
+
+
+def test_models_document_access_effective_role_sync_team():
+    """Team accesses should also be projected."""
+    access = factories.TeamDocumentAccessFactory(role="administrator")
+
+    effective_role = models.EffectiveDocumentRole.objects.get(access=access)
+    assert effective_role.user is None
+    assert effective_role.team == access.team
+    assert effective_role.role == "administrator"
@@ -2,22 +2,30 @@
 Unit tests for the Document model
 """
 
+import hashlib
 import random
 import smtplib
+from datetime import timedelta
 from logging import Logger
 from unittest import mock
 
 from django.contrib.auth.models import AnonymousUser
 from django.core import mail
-from django.core.cache import cache
+from django.core.cache import cache, caches
 from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
 from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Func, OuterRef, Subquery
 from django.test.utils import override_settings
 from django.utils import timezone
 
 import pytest
+from botocore.exceptions import ClientError
 
 from core import factories, models
+from core.services.content_cache_services import document_content_cache
+from core.tasks.documents import flush_document_content
 
 pytestmark = pytest.mark.django_db
 
@@ -158,6 +166,7 @@ def test_models_documents_get_abilities_forbidden(
         "children_list": False,
         "collaboration_auth": False,
         "destroy": False,
+        "duplicate": False,
         "favorite": False,
         "invite_owner": False,
         "media_auth": False,
@@ -169,6 +178,7 @@ def test_models_documents_get_abilities_forbidden(
         "update": False,
         "versions_destroy": False,
         "versions_list": False,
+        "versions_restore": False,
         "versions_retrieve": False,
     }
     nb_queries = 1 if is_authenticated else 0
@@ -209,6 +219,7 @@ def test_models_documents_get_abilities_reader(
         "children_list": True,
         "collaboration_auth": True,
         "destroy": False,
+        "duplicate": is_authenticated,
         "favorite": is_authenticated,
         "invite_owner": False,
         "link_configuration": False,
@@ -220,6 +231,7 @@ def test_models_documents_get_abilities_reader(
         "update": False,
         "versions_destroy": False,
         "versions_list": False,
+        "versions_restore": False,
         "versions_retrieve": False,
     }
     nb_queries = 1 if is_authenticated else 0
@@ -257,6 +269,7 @@ def test_models_documents_get_abilities_editor(
         "children_list": True,
         "collaboration_auth": True,
         "destroy": False,
+        "duplicate": is_authenticated,
         "favorite": is_authenticated,
         "invite_owner": False,
         "link_configuration": False,
@@ -268,6 +281,7 @@ def test_models_documents_get_abilities_editor(
         "update": True,
         "versions_destroy": False,
         "versions_list": False,
+        "versions_restore": False,
         "versions_retrieve": False,
     }
     nb_queries = 1 if is_authenticated else 0
@@ -295,6 +309,7 @@ def test_models_documents_get_abilities_owner(django_assert_num_queries):
         "children_list": True,
         "collaboration_auth": True,
         "destroy": True,
+        "duplicate": True,
         "favorite": True,
         "invite_owner": True,
         "link_configuration": True,
@@ -306,6 +321,7 @@ def test_models_documents_get_abilities_owner(django_assert_num_queries):
         "update": True,
         "versions_destroy": True,
         "versions_list": True,
+        "versions_restore": True,
         "versions_retrieve": True,
     }
     with django_assert_num_queries(1):
@@ -334,6 +350,7 @@ def test_models_documents_get_abilities_administrator(django_assert_num_queries)
         "children_list": True,
         "collaboration_auth": True,
         "destroy": False,
+        "duplicate": True,
         "favorite": True,
         "invite_owner": False,
         "link_configuration": True,
@@ -345,6 +362,7 @@ def test_models_documents_get_abilities_administrator(django_assert_num_queries)
         "update": True,
         "versions_destroy": True,
         "versions_list": True,
+        "versions_restore": True,
         "versions_retrieve": True,
     }
     with django_assert_num_queries(1):
@@ -372,6 +390,7 @@ def test_models_documents_get_abilities_editor_user(django_assert_num_queries):
         "children_list": True,
         "collaboration_auth": True,
         "destroy": False,
+        "duplicate": True,
         "favorite": True,
         "invite_owner": False,
         "link_configuration": False,
@@ -383,6 +402,7 @@ def test_models_documents_get_abilities_editor_user(django_assert_num_queries):
         "update": True,
         "versions_destroy": False,
         "versions_list": True,
+        "versions_restore": True,
         "versions_retrieve": True,
     }
     with django_assert_num_queries(1):
@@ -417,6 +437,7 @@ def test_models_documents_get_abilities_reader_user(
         "children_list": True,
         "collaboration_auth": True,
         "destroy": False,
+        "duplicate": True,
         "favorite": True,
         "invite_owner": False,
         "link_configuration": False,
@@ -428,6 +449,7 @@ def test_models_documents_get_abilities_reader_user(
         "update": access_from_link,
         "versions_destroy": False,
         "versions_list": True,
+        "versions_restore": access_from_link,
         "versions_retrieve": True,
     }
 
@@ -460,6 +482,7 @@ def test_models_documents_get_abilities_preset_role(django_assert_num_queries):
         "children_list": True,
         "collaboration_auth": True,
         "destroy": False,
+        "duplicate": True,
         "favorite": True,
         "invite_owner": False,
         "link_configuration": False,
@@ -471,10 +494,109 @@ def test_models_documents_get_abilities_preset_role(django_assert_num_queries):
         "update": False,
         "versions_destroy": False,
         "versions_list": True,
+        "versions_restore": False,
         "versions_retrieve": True,
     }
 
 
+def test_models_documents_get_abilities_abilities_context(django_assert_num_queries):
+    """
+    In an abilities context, roles and abilities should be computed once per user and
+    document, whatever the number of instances of the document.
+    """
+    user = factories.UserFactory()
+    parent = factories.DocumentFactory()
+    document = factories.DocumentFactory(parent=parent, users=[(user, "editor")])
+
+    with models.abilities_context():
+        instances = list(models.Document.objects.filter(pk=document.pk)) + list(
+            models.Document.objects.filter(pk=document.pk)
+        )
+
+        # Roles and links definitions of ancestors
+        with django_assert_num_queries(2):
+            abilities = instances[0].get_abilities(user)
+
+        with django_assert_num_queries(0):
+            assert instances[1].get_abilities(user) == abilities
+            assert instances[1].get_roles(user) == ["editor"]
+
+        assert abilities["update"] is True
+        assert abilities["destroy"] is False
+
+        # Changing accesses forgets the memoized roles and abilities
+        models.DocumentAccess.objects.filter(document=document).delete()
+        factories.UserDocumentAccessFactory(document=document, user=user, role="owner")
+        with django_assert_num_queries(2):
+            assert instances[1].get_abilities(user)["destroy"] is True
+
+    # Out of the context, nothing is memoized
+    with django_assert_num_queries(1):
+        assert instances[0].get_roles(user) == ["owner"]
+    with django_assert_num_queries(1):
+        assert instances[0].get_roles(user) == ["owner"]
+
+
+def test_models_documents_abilities_context_cleared_by_changes():
+    """
+    Changing the links of ancestors or deleting accesses in bulk should forget the roles
+    and abilities memoized in the abilities context.
+    """
+    user = factories.UserFactory()
+    parent = factories.DocumentFactory(link_reach="restricted")
+    document = factories.DocumentFactory(
+        parent=parent, link_reach="restricted", users=[(user, "reader")]
+    )
+
+    with models.abilities_context():
+        assert document.get_abilities(user)["update"] is False
+
+        # The links inherited from the parent change
+        parent.link_role = "editor"
+        parent.link_reach = "authenticated"
+        parent.save()
+        document = models.Document.objects.get(pk=document.pk)
+        assert document.get_abilities(user)["update"] is True
+
+        # Accesses are deleted in bulk
+        assert document.get_roles(user) == ["reader"]
+        models.DocumentAccess.objects.filter(document=document).delete()
+        assert document.get_roles(user) == []
+
+
+def test_models_documents_abilities_engine(django_assert_num_queries):
+    """
+    The abilities engine should return the same abilities as the documents, computing
+    them once per signature without querying the links of ancestors.
+    """
+    user = factories.UserFactory()
+    parent = factories.DocumentFactory(link_reach="authenticated", link_role="editor")
+    children = factories.DocumentFactory.create_batch(
+        3, parent=parent, link_reach="restricted"
+    )
+    other_child = factories.DocumentFactory(parent=parent, link_reach="public")
+    for child in [*children, other_child]:
+        child.user_roles = ["reader"]
+
+    engine = models.DocumentAbilitiesEngine(user)
+    with (
+        mock.patch.object(
+            models.Document,
+            "get_abilities_for_signature",
+            wraps=models.Document.get_abilities_for_signature,
+        ) as mock_compute,
+        django_assert_num_queries(0),
+    ):
+        abilities = [engine.get_abilities(child) for child in [*children, other_child]]
+
+    # Children of the same parent with the same roles share their signature
+    assert mock_compute.call_count == 2
+    for child, child_abilities in zip([*children, other_child], abilities, strict=True):
+        assert child_abilities == child.get_abilities(user)
+    assert abilities[0]["update"] is True
+    assert abilities[0]["destroy"] is False
+
+
 @override_settings(AI_ALLOW_REACH_FROM="public")
 @pytest.mark.parametrize(
     "is_authenticated,reach",
@@ -606,6 +728,104 @@ def test_models_documents_version_duplicate():
     assert len(response["Versions"]) == 2
 
 
+def test_models_documents_versions_index():
+    """
+    Versions written to object storage should be indexed in the database so that
+    slicing them does not need to list object versions. Indexing them should not need
+    another round trip to object storage.
+    """
+    document = factories.DocumentFactory(content="initial")
+
+    s3_client = default_storage.connection.meta.client
+    with (
+        mock.patch.object(
+            s3_client, "list_object_versions", wraps=s3_client.list_object_versions
+        ) as mock_list,
+        mock.patch.object(
+            s3_client, "head_object", wraps=s3_client.head_object
+        ) as mock_head,
+    ):
+        document.content = "new content"
+        document.save()
+    mock_list.assert_not_called()
+    mock_head.assert_not_called()
+
+    response = s3_client.list_object_versions(
+        Bucket=default_storage.bucket_name, Prefix=document.file_key
+    )
+    listed_dates = {
+        version["VersionId"]: version["LastModified"]
+        for version in response["Versions"]
+    }
+    indexed_dates = dict(document.versions.values_list("version_id", "last_modified"))
+    assert indexed_dates.keys() == listed_dates.keys()
+    for version_id, last_modified in indexed_dates.items():
+        assert abs(last_modified - listed_dates[version_id]) < timedelta(seconds=2)
+
+    with mock.patch.object(s3_client, "list_object_versions") as mock_list:
+        response = document.get_versions_slice()
+    mock_list.assert_not_called()
+    assert response["count"] == 1
+
+    # Deleting a version should remove it from the index
+    document.delete_version(response["versions"][0]["version_id"])
+    assert document.versions.count() == 1
+    assert document.get_versions_slice()["count"] == 0
+
+
+def test_models_documents_content_digest():
+    """The digest and size of the content should be persisted on the document."""
+    document = factories.DocumentFactory(content="my content")
+    document.refresh_from_db()
+
+    assert document.content_digest == hashlib.sha256(b"my content").hexdigest()
+    assert document.content_size == 10
+
+
+def test_models_documents_save_no_head_object():
+    """Change detection should not need a round trip to object storage."""
+    document = factories.DocumentFactory()
+    s3_client = default_storage.connection.meta.client
+
+    with (
+        mock.patch.object(s3_client, "head_object") as mock_head,
+        mock.patch.object(s3_client, "put_object", return_value={}) as mock_save,
+    ):
+        document.save()
+        document.content = document.content
+        document.save()
+
+        mock_save.assert_not_called()
+
+        document.content = "new content"
+        document.save()
+
+    mock_head.assert_not_called()
+    mock_save.assert_called_once()
+    assert document.content_digest == hashlib.sha256(b"new content").hexdigest()
+
+
+def test_models_documents_save_upload_failure():
+    """A failed upload should roll back the digest stored on the document."""
+    document = factories.DocumentFactory(content="initial")
+    initial_digest = document.content_digest
+
+    document.title = "new title"
+    document.content = "new content"
+    with (
+        mock.patch.object(
+            default_storage.connection.meta.client, "put_object", side_effect=OSError
+        ),
+        pytest.raises(OSError),
+    ):
+        document.save()
+
+    assert document.content_digest == initial_digest
+    document.refresh_from_db()
+    assert document.content_digest == initial_digest
+    assert document.title != "new title"
+
+
 def test_models_documents__email_invitation__success():
     """
     The email invitation is sent successfully.
@@ -739,6 +959,141 @@ def test_models_documents__email_invitation__failed(mock_logger, _mock_send_mail
     assert isinstance(exception, smtplib.SMTPException)
 
 
+# Ancestors lookup
+
+
+def test_models_documents_get_path_and_ancestors_paths():
+    """Paths of ancestors should be enumerated by cutting the path every steplen."""
+    assert models.Document.get_path_and_ancestors_paths("0000001000000A0000002") == [
+        "0000001",
+        "0000001000000A",
+        "0000001000000A0000002",
+    ]
+
+
+def test_models_documents_get_ancestors_lookup():
+    """
+    The ancestors lookup should match a document and its ancestors whether the path is
+    known or given as an expression, enumerating ancestors paths instead of prefixes.
+    """
+    grand_parent = factories.DocumentFactory()
+    parent = factories.DocumentFactory(parent=grand_parent)
+    document = factories.DocumentFactory(parent=parent)
+    factories.DocumentFactory(parent=parent)  # sibling
+    factories.DocumentFactory(parent=document)  # child
+    factories.DocumentFactory()  # other root
+
+    assert set(
+        models.Document.objects.filter(
+            models.Document.get_ancestors_lookup(document.path, "path")
+        )
+    ) == {grand_parent, parent, document}
+
+    queryset = models.Document.objects.annotate(
+        nb_ancestors=Subquery(
+            models.Document.objects.filter(
+                models.Document.get_ancestors_lookup(OuterRef("path"), "path")
+            )
+            .order_by()
+            .values(count=Func("pk", function="COUNT"))
+        )
+    )
+    assert "= ANY(ARRAY(" in str(queryset.query)
+    assert queryset.get(pk=document.pk).nb_ancestors == 3
+    assert queryset.get(pk=grand_parent.pk).nb_ancestors == 1
+
+
+def test_models_documents_move_syncs_effective_roles():
+    """
+    Moving a document should update the path of the effective roles defined on the
+    document and its descendants, so roles are inherited from the new ancestors.
+    """
+    user = factories.UserFactory()
+    source = factories.DocumentFactory(users=[(user, "reader")])
+    target = factories.DocumentFactory(users=[(user, "owner")])
+    document = factories.DocumentFactory(parent=source, users=[(user, "editor")])
+    child = factories.DocumentFactory(parent=document)
+    factories.UserDocumentAccessFactory(document=child, role="reader")
+
+    assert sorted(child.get_roles(user)) == ["editor", "reader"]
+
+    document.move(target, pos="first-child")
+
+    child = models.Document.objects.get(pk=child.pk)
+    assert child.path.startswith(target.path)
+    assert sorted(child.get_roles(user)) == ["editor", "owner"]
+    assert set(
+        models.EffectiveDocumentRole.objects.values_list("path", flat=True)
+    ) == set(models.DocumentAccess.objects.values_list("document__path", flat=True))
+
+
+def test_models_documents_ancestors_links_on_creation():
+    """Children should inherit the distinct links of their parent and its ancestors."""
+    grand_parent = factories.DocumentFactory(link_reach="public", link_role="reader")
+    parent = factories.DocumentFactory(
+        parent=grand_parent, link_reach="public", link_role="reader"
+    )
+    document = factories.DocumentFactory(parent=parent, link_reach="restricted")
+
+    assert grand_parent.ancestors_links == []
+    assert parent.ancestors_links == [["public", "reader"]]
+    assert document.ancestors_links == [["public", "reader"]]
+    assert models.Document.objects.get(pk=document.pk).ancestors_links == [
+        ["public", "reader"]
+    ]
+
+
+def test_models_documents_ancestors_links_sync_on_save():
+    """
+    Changing the links of a document should update the links inherited by its
+    descendants, and only them.
+    """
+    parent = factories.DocumentFactory(link_reach="restricted", link_role="reader")
+    document = factories.DocumentFactory(parent=parent, link_reach="restricted")
+    child = factories.DocumentFactory(parent=document)
+    other = factories.DocumentFactory(parent=parent)
+
+    document.link_reach = "authenticated"
+    document.link_role = "editor"
+    document.save()
+
+    child = models.Document.objects.get(pk=child.pk)
+    assert sorted(child.ancestors_links) == [
+        ["authenticated", "editor"],
+        ["restricted", "reader"],
+    ]
+    assert child.get_abilities(factories.UserFactory())["update"] is True
+    assert models.Document.objects.get(pk=other.pk).ancestors_links == [
+        ["restricted", "reader"]
+    ]
+
+    # Saving the document with unchanged links does not touch descendants
+    document.title = "new title"
+    with mock.patch.object(models.Document, "sync_ancestors_links") as mock_sync:
+        document.save()
+        models.Document.objects.get(pk=document.pk).save()
+    mock_sync.assert_not_called()
+
+
+def test_models_documents_ancestors_links_sync_on_move():
+    """Moving a document should update the links inherited by the moved subtree."""
+    source = factories.DocumentFactory(link_reach="public", link_role="editor")
+    target = factories.DocumentFactory(link_reach="authenticated", link_role="reader")
+    document = factories.DocumentFactory(
+        parent=source, link_reach="restricted", link_role="reader"
+    )
+    child = factories.DocumentFactory(parent=document, link_reach="restricted")
+
+    document.move(target, pos="first-child")
+
+    child = models.Document.objects.get(pk=child.pk)
+    assert sorted(child.ancestors_links) == [
+        ["authenticated", "reader"],
+        ["restricted", "reader"],
+    ]
+    assert child.get_abilities(AnonymousUser())["retrieve"] is False
+
+
 # Document number of accesses
 
 
@@ -747,11 +1102,15 @@ def test_models_documents_nb_accesses_cache_is_set_and_retrieved(
 ):
     """Test that nb_accesses is cached after the first computation."""
     document = factories.DocumentFactory()
-    key = f"document_{document.id!s}_nb_accesses"
+    key = document.get_nb_accesses_cache_key()
     nb_accesses = random.randint(1, 4)
     factories.UserDocumentAccessFactory.create_batch(nb_accesses, document=document)
     factories.UserDocumentAccessFactory()  # An unrelated access should not be counted
 
+    # Creating accesses bumped the generation of the document
+    assert document.get_nb_accesses_cache_key() != key
+    key = document.get_nb_accesses_cache_key()
+
     # Initially, the nb_accesses should not be cached
     assert cache.get(key) is None
 
@@ -768,11 +1127,13 @@ def test_models_documents_nb_accesses_cache_is_set_and_retrieved(
     models.DocumentAccess.objects.create(
         document=document, user=factories.UserFactory(), role="reader"
     )
-    assert cache.get(key) is None  # Cache should be invalidated
+    new_key = document.get_nb_accesses_cache_key()
+    assert new_key != key
+    assert cache.get(new_key) is None  # Cache should be invalidated
     with django_assert_num_queries(1):
         new_nb_accesses = document.nb_accesses
     assert new_nb_accesses == nb_accesses + 1
-    assert cache.get(key) == new_nb_accesses  # Cache should now contain the new value
+    assert cache.get(new_key) == new_nb_accesses  # Cache should now contain it
 
 
 def test_models_documents_nb_accesses_cache_is_invalidated_on_access_removal(
@@ -780,8 +1141,8 @@ def test_models_documents_nb_accesses_cache_is_invalidated_on_access_removal(
 ):
     """Test that the cache is invalidated when a document access is deleted."""
     document = factories.DocumentFactory()
-    key = f"document_{document.id!s}_nb_accesses"
     access = factories.UserDocumentAccessFactory(document=document)
+    key = document.get_nb_accesses_cache_key()
 
     # Initially, the nb_accesses should be cached
     assert document.nb_accesses == 1
@@ -789,10 +1150,423 @@ def test_models_documents_nb_accesses_cache_is_invalidated_on_access_removal(
 
     # Remove the access and check if cache is invalidated
     access.delete()
-    assert cache.get(key) is None  # Cache should be invalidated
+    new_key = document.get_nb_accesses_cache_key()
+    assert new_key != key
+    assert cache.get(new_key) is None  # Cache should be invalidated
 
     # Recompute the nb_accesses (this should trigger a cache set)
     with django_assert_num_queries(1):
         new_nb_accesses = document.nb_accesses
     assert new_nb_accesses == 0
-    assert cache.get(key) == 0  # Cache should now contain the new value
+    assert cache.get(new_key) == 0  # Cache should now contain the new value
+
+
+def test_models_documents_nb_accesses_cache_is_invalidated_on_descendants(
+    django_assert_num_queries,
+):
+    """
+    Changing the accesses of a document should invalidate the cache of its descendants
+    without querying them, while the cache of its ancestors and siblings is kept.
+    """
+    parent = factories.DocumentFactory()
+    document = factories.DocumentFactory(parent=parent)
+    sibling = factories.DocumentFactory(parent=parent)
+    child = factories.DocumentFactory(parent=document)
+    grand_child = factories.DocumentFactory(parent=child)
+    factories.UserDocumentAccessFactory(document=parent)
+
+    for item in [parent, document, sibling, child, grand_child]:
+        assert item.nb_accesses == 1
+
+    factories.UserDocumentAccessFactory(document=document)
+    # Invalidating the subtree does not query the descendants
+    with django_assert_num_queries(0):
+        document.invalidate_nb_accesses_cache()
+
+    with django_assert_num_queries(0):
+        assert parent.nb_accesses == 1
+        assert sibling.nb_accesses == 1
+    with django_assert_num_queries(3):
+        assert document.nb_accesses == 2
+        assert child.nb_accesses == 2
+        assert grand_child.nb_accesses == 2
+
+
+# Write-behind mode
+
+
+def test_models_documents_write_behind_save_buffers_content(
+    settings, django_capture_on_commit_callbacks
+):
+    """
+    In write-behind mode, saving content should buffer it in the cache once committed
+    and schedule only one flush per window whatever the number of saves.
+    """
+    settings.DOCUMENT_CONTENT_WRITE_BEHIND = True
+    document = factories.DocumentFactory(content="initial")
+
+    with (
+        mock.patch(
+            "core.tasks.documents.flush_document_content.apply_async"
+        ) as mock_flush,
+        mock.patch.object(models.Document, "put_content_object") as mock_save,
+        django_capture_on_commit_callbacks(execute=True),
+    ):
+        for i in range(3):
+            document.content = f"content {i:d}"
+            document.save()
+
+    mock_save.assert_not_called()
+    mock_flush.assert_called_once_with(
+        (str(document.pk),), countdown=settings.DOCUMENT_CONTENT_FLUSH_WINDOW
+    )
+
+    # Reads should return the freshest buffered content
+    fresh_document = models.Document.objects.get(pk=document.pk)
+    assert fresh_document.content == "content 2"
+    assert fresh_document.content_digest == hashlib.sha256(b"content 2").hexdigest()
+    assert fresh_document.is_content_flush_pending() is True
+
+    # Object storage still holds the initial content
+    response = fresh_document.get_content_response()
+    assert response["Body"].read() == b"initial"
+
+
+def test_models_documents_write_behind_flush_content(
+    settings, django_capture_on_commit_callbacks
+):
+    """Flushing should write the latest buffered content to object storage once."""
+    settings.DOCUMENT_CONTENT_WRITE_BEHIND = True
+    document = factories.DocumentFactory(content="initial")
+
+    with (
+        mock.patch("core.tasks.documents.flush_document_content.apply_async"),
+        django_capture_on_commit_callbacks(execute=True),
+    ):
+        document.content = "buffered"
+        document.save()
+
+    assert document.flush_content() is True
+    assert document.is_content_flush_pending() is False
+    response = document.get_content_response()
+    assert response["Body"].read() == b"buffered"
+
+    # Nothing left to flush
+    with mock.patch.object(models.Document, "put_content_object") as mock_save:
+        assert document.flush_content() is False
+    mock_save.assert_not_called()
+
+
+def test_models_documents_write_behind_flush_content_locked(
+    settings, django_capture_on_commit_callbacks
+):
+    """
+    A flush should not run while another one holds the lock of the document, so that
+    a slow flush can't overwrite the newer content written by a concurrent one.
+    """
+    settings.DOCUMENT_CONTENT_WRITE_BEHIND = True
+    document = factories.DocumentFactory(content="initial")
+
+    with (
+        mock.patch("core.tasks.documents.flush_document_content.apply_async"),
+        django_capture_on_commit_callbacks(execute=True),
+    ):
+        document.content = "buffered"
+        document.save()
+
+    buffer_cache = caches[settings.DOCUMENT_CONTENT_BUFFER_CACHE]
+    buffer_cache.add(document.get_content_flush_lock_cache_key(), True)
+
+    with (
+        mock.patch.object(models.Document, "put_content_object") as mock_save,
+        pytest.raises(models.ContentFlushInProgressError),
+    ):
+        document.flush_content()
+    mock_save.assert_not_called()
+    assert document.is_content_flush_pending() is True
+
+    # The lock is released by the flush holding it
+    buffer_cache.delete(document.get_content_flush_lock_cache_key())
+    assert document.flush_content() is True
+    assert buffer_cache.get(document.get_content_flush_lock_cache_key()) is None
+    response = document.get_content_response()
+    assert response["Body"].read() == b"buffered"
+
+
+def test_models_documents_write_behind_flush_task(
+    settings, django_capture_on_commit_callbacks
+):
+    """The scheduled flush task should write the buffered content to object storage."""
+    settings.DOCUMENT_CONTENT_WRITE_BEHIND = True
+    document = factories.DocumentFactory(content="initial")
+
+    # Tasks run eagerly in tests
+    with django_capture_on_commit_callbacks(execute=True):
+        document.content = "flushed by the worker"
+        document.save()
+
+    response = document.get_content_response()
+    assert response["Body"].read() == b"flushed by the worker"
+    assert document.is_content_flush_pending() is False
+
+
+def test_models_documents_write_behind_flush_task_retried(
+    settings, django_capture_on_commit_callbacks
+):
+    """A flush failing to write to object storage should be retried."""
+    settings.DOCUMENT_CONTENT_WRITE_BEHIND = True
+    document = factories.DocumentFactory(content="initial")
+
+    with (
+        mock.patch("core.tasks.documents.flush_document_content.apply_async"),
+        django_capture_on_commit_callbacks(execute=True),
+    ):
+        document.content = "buffered"
+        document.save()
+
+    put_content_object = models.Document.put_content_object
+    errors = [ClientError({"Error": {"Code": "SlowDown"}}, "PutObject")]
+
+    def fail_once(*args):
+        if errors:
+            raise errors.pop()
+        return put_content_object(*args)
+
+    with mock.patch.object(
+        models.Document, "put_content_object", autospec=True, side_effect=fail_once
+    ) as mock_save:
+        flush_document_content.apply((str(document.pk),))
+
+    assert mock_save.call_count == 2
+    response = document.get_content_response()
+    assert response["Body"].read() == b"buffered"
+    assert document.is_content_flush_pending() is False
+
+
+def test_models_documents_write_behind_restore_version(
+    settings, django_capture_on_commit_callbacks
+):
+    """
+    Restoring a version should flush the pending content first, so that it is kept if
+    the restoration fails, and discard the buffer once the restoration is committed.
+    """
+    settings.DOCUMENT_CONTENT_WRITE_BEHIND = True
+    document = factories.DocumentFactory(content="initial")
+    version = document.versions.get()
+
+    with (
+        mock.patch("core.tasks.documents.flush_document_content.apply_async"),
+        django_capture_on_commit_callbacks(execute=True),
+    ):
+        document.content = "buffered"
+        document.save()
+
+    s3_client = default_storage.connection.meta.client
+    with (
+        mock.patch.object(
+            s3_client,
+            "copy_object",
+            side_effect=ClientError({"Error": {"Code": "InternalError"}}, "CopyObject"),
+        ),
+        pytest.raises(ClientError),
+    ):
+        document.restore_version(version)
+
+    assert models.Document.objects.get(pk=document.pk).content == "buffered"
+    response = document.get_content_response()
+    assert response["Body"].read() == b"buffered"
+
+    with django_capture_on_commit_callbacks(execute=True):
+        document.restore_version(version)
+
+    assert document.get_buffered_content() is None
+    assert models.Document.objects.get(pk=document.pk).content == "initial"
+
+
+def test_models_documents_write_behind_save_rolled_back(settings):
+    """
+    Content saved in a transaction that is rolled back should neither be buffered nor
+    flushed to object storage.
+    """
+    settings.DOCUMENT_CONTENT_WRITE_BEHIND = True
+    document = factories.DocumentFactory(content="initial")
+
+    with (
+        mock.patch(
+            "core.tasks.documents.flush_document_content.apply_async"
+        ) as mock_flush,
+        pytest.raises(RuntimeError),
+        transaction.atomic(),
+    ):
+        document.content = "rolled back"
+        document.save()
+        raise RuntimeError("rollback")
+
+    mock_flush.assert_not_called()
+    assert document.get_buffered_content() is None
+    assert models.Document.objects.get(pk=document.pk).content == "initial"
+
+
+# Read-through content cache
+
+
+def test_models_documents_content_cache_read_through():
+    """Reading the content of a document should only hit object storage once."""
+    document = factories.DocumentFactory(content="my content")
+    document_content_cache.delete(document.pk, document.content_digest)
+
+    s3_client = default_storage.connection.meta.client
+    with mock.patch.object(
+        s3_client, "get_object", wraps=s3_client.get_object
+    ) as mock_get_object:
+        assert models.Document.objects.get(pk=document.pk).content == "my content"
+        assert models.Document.objects.get(pk=document.pk).content == "my content"
+
+    mock_get_object.assert_called_once()
+
+
+def test_models_documents_content_cache_save_invalidates():
+    """
+    Saving new content should drop the cache entry of the replaced content and make
+    the new content readable without hitting object storage.
+    """
+    document = factories.DocumentFactory(content="initial")
+    previous_digest = document.content_digest
+    assert document_content_cache.get(document.pk, previous_digest) == "initial"
+
+    document.content = "updated"
+    document.save()
+
+    assert document_content_cache.get(document.pk, previous_digest) is None
+    with mock.patch.object(
+        default_storage.connection.meta.client, "get_object"
+    ) as mock_get_object:
+        assert models.Document.objects.get(pk=document.pk).content == "updated"
+    mock_get_object.assert_not_called()
+
+
+def test_models_documents_content_cache_drifted_object():
+    """An object that does not match the digest of the document should not be cached."""
+    document = factories.DocumentFactory(content="initial")
+    document_content_cache.delete(document.pk, document.content_digest)
+    default_storage.save(document.file_key, ContentFile(b"drifted"))
+
+    assert models.Document.objects.get(pk=document.pk).content == "drifted"
+    assert document_content_cache.get(document.pk, document.content_digest) is None
+
+
+# Content compression at rest
+
+
+def test_models_documents_content_compressed_at_rest(settings):
+    """
+    Contents should be compressed in object storage and tagged with their codec,
+    while the digest and size describe the decoded content.
+    """
+    settings.DOCUMENT_CONTENT_CODEC = "gzip"
+    content = "AAAA" * 1000
+    document = factories.DocumentFactory(content=content)
+
+    response = default_storage.connection.meta.client.get_object(
+        Bucket=default_storage.bucket_name, Key=document.file_key
+    )
+    assert response["Metadata"] == {"codec": "gzip"}
+    assert response["ContentLength"] < len(content)
+
+    assert document.content_digest == hashlib.sha256(content.encode()).hexdigest()
+    assert document.content_size == len(content)
+
+    document_content_cache.delete(document.pk, document.content_digest)
+    assert models.Document.objects.get(pk=document.pk).content == content
+    assert document.get_content_response()["Body"].read() == content.encode()
+
+
+def test_models_documents_content_legacy_uncompressed(settings):
+    """Objects written raw should stay readable once compression is activated."""
+    settings.DOCUMENT_CONTENT_CODEC = None
+    document = factories.DocumentFactory(content="legacy")
+    document_content_cache.delete(document.pk, document.content_digest)
+
+    settings.DOCUMENT_CONTENT_CODEC = "gzip"
+    assert models.Document.objects.get(pk=document.pk).content == "legacy"
+
+
+# Full-text search of the content
+
+
+def test_models_documents_index_content():
+    """
+    Indexing the content should create a search vector for the current digest and
+    skip contents that did not change since they were last indexed.
+    """
+    document = factories.DocumentFactory(content="Quarterly budget review")
+
+    assert document.index_content() is True
+    search_vector = models.DocumentSearchVector.objects.get(document=document)
+    assert search_vector.content_digest == document.content_digest
+    assert models.Document.objects.filter(search_vector__vector="budget").exists()
+
+    assert document.index_content() is False
+
+    document.content = "Roadmap"
+    document.save()
+    assert document.index_content() is True
+    assert not models.Document.objects.filter(search_vector__vector="budget").exists()
+    assert models.Document.objects.filter(search_vector__vector="roadmap").exists()
+
+
+def test_models_documents_save_schedules_indexing(
+    settings, django_capture_on_commit_callbacks
+):
+    """
+    Saving content should schedule the indexing of the content once per indexing
+    delay, after the transaction is committed.
+    """
+    document = factories.DocumentFactory()
+
+    with (
+        mock.patch(
+            "core.tasks.documents.index_document_content.apply_async"
+        ) as mock_index,
+        django_capture_on_commit_callbacks(execute=True),
+    ):
+        for i in range(3):
+            document.content = f"content {i:d}"
+            document.save()
+
+    mock_index.assert_called_once_with(
+        (str(document.pk),), countdown=settings.DOCUMENT_SEARCH_INDEXING_DELAY
+    )
+
+
+def test_models_documents_save_indexing_task(django_capture_on_commit_callbacks):
+    """The scheduled indexing task should index the latest content of the document."""
+    document = factories.DocumentFactory()
+    cache.delete(document.get_content_indexing_scheduled_cache_key())
+
+    # Tasks run eagerly in tests
+    with django_capture_on_commit_callbacks(execute=True):
+        document.content = "indexed by the worker"
+        document.save()
+
+    assert document.search_vector.content_digest == document.content_digest
+    assert models.Document.objects.filter(search_vector__vector="worker").exists()
+
+
+def test_models_documents_restore_version_indexing(django_capture_on_commit_callbacks):
+    """Restoring a version should index the restored content after the commit."""
+    document = factories.DocumentFactory(content="Quarterly budget review")
+    version = document.versions.get()
+    document.content = "Roadmap"
+    document.save()
+    document.index_content()
+    cache.delete(document.get_content_indexing_scheduled_cache_key())
+
+    # Tasks run eagerly in tests
+    with django_capture_on_commit_callbacks(execute=True):
+        document.restore_version(version)
+
+    search_vector = models.DocumentSearchVector.objects.get(document=document)
+    assert search_vector.content_digest == version.content_digest
+    assert models.Document.objects.filter(search_vector__vector="budget").exists()
+    assert not models.Document.objects.filter(search_vector__vector="roadmap").exists()
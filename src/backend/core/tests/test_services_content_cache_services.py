@@ -0,0 +1,110 @@
+"""Test the document content cache services."""
+
+from django.core.cache import cache
+
+import pytest
+
+from core.services.content_cache_services import (
+    DocumentContentCache,
+    LocalLRUCache,
+)
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Fixture to clear the cache before each test."""
+    cache.clear()
+
+
+def test_services_content_cache_local_lru_eviction():
+    """The local cache should evict least recently used entries beyond its size."""
+    local = LocalLRUCache()
+    local.set("a", b"1234", max_size=10)
+    local.set("b", b"1234", max_size=10)
+
+    # Reading "a" makes "b" the least recently used entry
+    assert local.get("a") == b"1234"
+    local.set("c", b"1234", max_size=10)
+
+    assert local.get("b") is None
+    assert local.get("a") == b"1234"
+    assert local.get("c") == b"1234"
+    assert local.size == 8
+
+
+def test_services_content_cache_local_lru_too_big():
+    """Values bigger than the whole local cache should not be stored."""
+    local = LocalLRUCache()
+    local.set("a", b"1234", max_size=10)
+    local.set("b", b"12345678901", max_size=10)
+
+    assert local.get("a") == b"1234"
+    assert local.get("b") is None
+    assert local.size == 4
+
+
+@pytest.mark.parametrize("compress_min_size", [0, 1, 10**6])
+def test_services_content_cache_get_set(compress_min_size, settings):
+    """Contents should be found in the cache whether they are compressed or not."""
+    settings.DOCUMENT_CONTENT_CACHE_COMPRESS_MIN_SIZE = compress_min_size
+    content_cache = DocumentContentCache()
+
+    assert content_cache.get("123", "abc") is None
+    content_cache.set("123", "abc", "my content")
+
+    assert content_cache.get("123", "abc") == "my content"
+    assert content_cache.get("123", "def") is None
+
+
+def test_services_content_cache_compression(settings):
+    """Contents bigger than the threshold should be stored compressed."""
+    settings.DOCUMENT_CONTENT_CACHE_COMPRESS_MIN_SIZE = 100
+    content_cache = DocumentContentCache()
+
+    content_cache.set("123", "abc", "a" * 1000)
+
+    value = cache.get(content_cache.get_cache_key("123", "abc"))
+    assert value.startswith(b"z")
+    assert len(value) < 100
+    assert content_cache.get("123", "abc") == "a" * 1000
+
+
+def test_services_content_cache_shared_fills_local(settings):
+    """A content found in the shared cache should be promoted to the local cache."""
+    content_cache = DocumentContentCache()
+    other_process_cache = DocumentContentCache()
+
+    other_process_cache.set("123", "abc", "my content")
+    key = content_cache.get_cache_key("123", "abc")
+    assert content_cache.local.get(key) is None
+
+    assert content_cache.get("123", "abc") == "my content"
+    assert content_cache.local.get(key) is not None
+
+    # The shared cache can be disabled
+    settings.DOCUMENT_CONTENT_CACHE = ""
+    assert DocumentContentCache().get("123", "abc") is None
+
+
+def test_services_content_cache_max_entry_size(settings):
+    """Contents exceeding the per entry budget should not be cached."""
+    settings.DOCUMENT_CONTENT_CACHE_COMPRESS_MIN_SIZE = 0
+    settings.DOCUMENT_CONTENT_CACHE_MAX_ENTRY_SIZE = 10
+    content_cache = DocumentContentCache()
+
+    content_cache.set("123", "abc", "a" * 10)
+    assert content_cache.get("123", "abc") is None
+
+    content_cache.set("123", "abc", "a" * 9)
+    assert content_cache.get("123", "abc") == "a" * 9
+
+
+def test_services_content_cache_delete():
+    """Deleting a content should remove it from both cache levels."""
+    content_cache = DocumentContentCache()
+    content_cache.set("123", "abc", "my content")
+
+    content_cache.delete("123", "abc")
+
+    assert content_cache.get("123", "abc") is None
+    assert cache.get(content_cache.get_cache_key("123", "abc")) is None
@@ -0,0 +1,53 @@
+"""Test the document content codec services."""
+
+import pytest
+
+from core.services.content_codec_services import (
+    UnknownCodecError,
+    decode_content,
+    encode_content,
+)
+
+
+def test_services_content_codec_encode_gzip(settings):
+    """Contents should be compressed and tagged with the configured codec."""
+    settings.DOCUMENT_CONTENT_CODEC = "gzip"
+    content = b"AAAA" * 1000
+
+    body, metadata = encode_content(content)
+
+    assert metadata == {"codec": "gzip"}
+    assert len(body) < len(content)
+    assert decode_content(body, metadata) == content
+
+
+def test_services_content_codec_encode_deterministic(settings):
+    """Encoding the same content twice should give the same body."""
+    settings.DOCUMENT_CONTENT_CODEC = "gzip"
+
+    assert encode_content(b"my content") == encode_content(b"my content")
+
+
+def test_services_content_codec_encode_disabled(settings):
+    """Contents should be stored raw and untagged if no codec is configured."""
+    settings.DOCUMENT_CONTENT_CODEC = None
+
+    assert encode_content(b"my content") == (b"my content", {})
+
+
+def test_services_content_codec_decode_legacy():
+    """Objects without codec in their metadata should be returned as is."""
+    assert decode_content(b"my content", {}) == b"my content"
+    assert decode_content(b"my content", None) == b"my content"
+    assert decode_content(b"my content", {"owner": "someone"}) == b"my content"
+
+
+def test_services_content_codec_unknown(settings):
+    """Unknown codecs should raise both on write and on read."""
+    settings.DOCUMENT_CONTENT_CODEC = "unknown"
+
+    with pytest.raises(UnknownCodecError, match="Unknown content codec: unknown"):
+        encode_content(b"my content")
+
+    with pytest.raises(UnknownCodecError):
+        decode_content(b"my content", {"codec": "unknown"})
@@ -0,0 +1,76 @@
+"""
+Test the extraction of the plain text of document contents.
+"""
+
+import base64
+
+from core.services.content_text_services import extract_text
+
+# Yjs update of a BlockNote document with a paragraph partly in bold and a heading
+# in which "draft " was typed then deleted, and "review" inserted before an emoji
+YJS_CONTENT = (
+    "AQ4BAAcBDmRvY3VtZW50LXN0b3JlAwlwYXJhZ3JhcGgoAAEADXRleHRBbGlnbm1lbnQBdwRsZWZ0BwAB"
+    "AAYEAAECB01lZXRpbmeEAQkYIG5vdGVzIGFib3V0IHRoZSByb2FkbWFwRgEDBGJvbGQEdHJ1ZcYBCQEK"
+    "BGJvbGQEbnVsbIcBAAMHaGVhZGluZygAASQFbGV2ZWwBfEAAAAAHAAEkBgQAASYHQnVkZ2V0IIEBLQaE"
+    "ATME8J+YgMQBMwE0BnJldmlldwEBAS4G"
+)
+
+# Yjs update of a paragraph in which "helo world" was typed then fixed to "hello world"
+YJS_CONTENT_MID_WORD = (
+    "AQUBAAcBDmRvY3VtZW50LXN0b3JlAwlwYXJhZ3JhcGgHAAEABgQAAQEDaGVshAEEB28gd29ybGTEAQQB"
+    "BQFsAA=="
+)
+
+# Yjs update merging the concurrent edits of two clients on a paragraph "Plan": the
+# first one appended " the budget", the second one appended " the roadmap" and
+# prepended "Draft: ". The edits of the second client come first in the update.
+YJS_CONTENT_CONCURRENT = (
+    "AgICAIQBBQwgdGhlIHJvYWRtYXBEAQIHRHJhZnQ6IAQBAAcBDmRvY3VtZW50LXN0b3JlAwlwYXJhZ3Jh"
+    "cGgHAAEABgQAAQEEUGxhboQBBQsgdGhlIGJ1ZGdldAA="
+)
+
+
+def test_services_content_text_extract_yjs_update():
+    """
+    The text of a Yjs update should be extracted without deleted characters,
+    formatting, attributes or the names of the types.
+    """
+    text = extract_text(YJS_CONTENT)
+
+    assert text == "Meeting notes about the roadmap Budget review😀"
+    for word in ["draft", "bold", "left", "paragraph", "heading", "document-store"]:
+        assert word not in text
+
+
+def test_services_content_text_extract_yjs_update_mid_word_insertion():
+    """
+    Characters inserted in the middle of a word should be extracted at their position
+    in the document, not in the order of the update.
+    """
+    assert extract_text(YJS_CONTENT_MID_WORD) == "hello world"
+
+
+def test_services_content_text_extract_yjs_update_concurrent_edits():
+    """
+    Concurrent edits of several clients should be extracted in the order a client
+    integrating the update would display them.
+    """
+    assert extract_text(YJS_CONTENT_CONCURRENT) == (
+        "Draft: Plan the budget the roadmap"
+    )
+
+
+def test_services_content_text_extract_plain_text():
+    """Contents that are not base64 encoded should be returned as is."""
+    assert extract_text("Some plain text content.") == "Some plain text content."
+
+
+def test_services_content_text_extract_invalid_update():
+    """Base64 contents that are not valid Yjs updates should have no text."""
+    assert extract_text(base64.b64encode(b"\xff\xff\xff").decode()) == ""
+
+
+def test_services_content_text_extract_empty():
+    """Empty contents should have no text."""
+    assert extract_text("") == ""
+    assert extract_text(None) == ""
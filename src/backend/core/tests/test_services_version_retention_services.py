@@ -0,0 +1,73 @@
+"""Test the document version retention services."""
+
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+from types import SimpleNamespace
+
+from django.core.exceptions import ImproperlyConfigured
+
+import pytest
+
+from core.services.version_retention_services import RetentionPolicy
+
+NOW = datetime(2025, 3, 10, 12, 0, tzinfo=dt_timezone.utc)
+
+
+def make_versions(*ages):
+    """Build versions sorted from the most recent to the oldest from their ages."""
+    return [SimpleNamespace(last_modified=NOW - age) for age in sorted(ages)]
+
+
+def test_services_version_retention_tiers():
+    """
+    All recent versions should be kept, then one version per interval, and versions
+    older than all tiers should be deleted.
+    """
+    policy = RetentionPolicy(
+        [
+            (timedelta(days=7), timedelta(days=1)),
+            (timedelta(days=1), timedelta(0)),
+        ]
+    )
+    versions = make_versions(
+        timedelta(minutes=1),  # latest
+        timedelta(minutes=10),
+        timedelta(minutes=20),
+        timedelta(days=2, hours=1),
+        timedelta(days=2, hours=2),
+        timedelta(days=3, hours=1),
+        timedelta(days=8),
+    )
+
+    expired = policy.get_expired_versions(versions, NOW)
+
+    assert expired == [versions[4], versions[6]]
+
+
+def test_services_version_retention_latest_kept():
+    """The latest version should be kept whatever its age."""
+    policy = RetentionPolicy([(timedelta(days=1), timedelta(0))])
+    versions = make_versions(timedelta(days=10), timedelta(days=20))
+
+    assert policy.get_expired_versions(versions, NOW) == [versions[1]]
+
+
+def test_services_version_retention_no_tiers():
+    """Without tiers, all versions should be kept."""
+    versions = make_versions(timedelta(days=10), timedelta(days=20))
+
+    assert RetentionPolicy([]).get_expired_versions(versions, NOW) == []
+
+
+def test_services_version_retention_from_settings(settings):
+    """The policy should be read from "max_age:interval" tiers in seconds."""
+    settings.DOCUMENT_VERSIONS_RETENTION = ["604800:3600", "86400:0"]
+
+    assert RetentionPolicy.from_settings().tiers == [
+        (timedelta(days=1), timedelta(0)),
+        (timedelta(days=7), timedelta(hours=1)),
+    ]
+
+    settings.DOCUMENT_VERSIONS_RETENTION = ["1 day"]
+    with pytest.raises(ImproperlyConfigured, match="Invalid version retention tier"):
+        RetentionPolicy.from_settings()
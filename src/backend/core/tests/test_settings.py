@@ -28,3 +28,44 @@ def test_invalid_settings_oidc_email_configuration():
         "Both OIDC_FALLBACK_TO_EMAIL_FOR_IDENTIFICATION and "
         "OIDC_ALLOW_DUPLICATE_EMAILS cannot be set to True simultaneously. "
     )
+
+
+@pytest.mark.parametrize("buffer_cache", ["default", "undeclared"])
+def test_invalid_settings_write_behind_buffer_cache(buffer_cache):
+    """
+    Write-behind should not be activated without a dedicated cache alias to buffer
+    contents, as evicting the buffer would lose contents.
+    """
+
+    class TestSettings(Base):
+        """Fake test settings."""
+
+        DOCUMENT_CONTENT_WRITE_BEHIND = True
+        DOCUMENT_CONTENT_BUFFER_CACHE = buffer_cache
+
+    with pytest.raises(ValueError) as excinfo:
+        TestSettings().post_setup()
+
+    assert str(excinfo.value) == (
+        "DOCUMENT_CONTENT_WRITE_BEHIND requires DOCUMENT_CONTENT_BUFFER_CACHE to "
+        "be a dedicated cache alias, declared in CACHES and configured not to "
+        "evict keys."
+    )
+
+
+def test_valid_settings_write_behind_buffer_cache():
+    """Write-behind should be accepted with a dedicated cache alias to buffer contents."""
+
+    class TestSettings(Base):
+        """Fake test settings."""
+
+        DOCUMENT_CONTENT_WRITE_BEHIND = True
+        DOCUMENT_CONTENT_BUFFER_CACHE = "content_buffer"
+        CACHES = {
+            "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+            "content_buffer": {
+                "BACKEND": "django.core.cache.backends.locmem.LocMemCache"
+            },
+        }
+
+    TestSettings().post_setup()
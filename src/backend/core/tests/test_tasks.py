@@ -0,0 +1,18 @@
+"""
+Test the registration of the Celery tasks of the core application.
+"""
+
+from impress.celery_app import app
+
+
+def test_tasks_registered():
+    """
+    Tasks should be registered when the worker autodiscovers the "tasks" package of
+    the core application, otherwise scheduled tasks are rejected as unregistered.
+    """
+    app.loader.import_default_modules()
+
+    assert {
+        "core.tasks.documents.flush_document_content",
+        "core.tasks.documents.index_document_content",
+    } <= set(app.tasks)
@@ -42,6 +42,7 @@ urlpatterns = [
         f"api/{settings.API_VERSION}/",
         include(
             [
+                path("documents/media-check/", viewsets.MediaCheckView.as_view()),
                 *router.urls,
                 *oidc_urls,
                 re_path(
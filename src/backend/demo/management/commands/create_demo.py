@@ -9,6 +9,7 @@ from collections import defaultdict
 
 from django import db
 from django.conf import settings
+from django.core.management import call_command
 from django.core.management.base import BaseCommand, CommandError
 
 from faker import Faker
@@ -200,6 +201,10 @@ def create_demo(stdout):
 
         queue.flush()
 
+    with Timeit(stdout, "Creating effective roles of docs accesses"):
+        # Accesses created in bulk skip "DocumentAccess.save", which maintains them
+        call_command("rebuild_effective_document_roles", stdout=stdout)
+
     with Timeit(stdout, "Creating Template"):
         with open(
             file="demo/data/template/code.txt", mode="r", encoding="utf-8"
@@ -39,3 +39,10 @@ def test_commands_create_demo():
     assert models.DocumentAccess.objects.filter(user=user).exists()
     user = models.User.objects.get(email="user@chromium.e2e")
     assert models.DocumentAccess.objects.filter(user=user).exists()
+
+    # Roles of accesses created in bulk are resolved
+    assert models.EffectiveDocumentRole.objects.count() == (
+        models.DocumentAccess.objects.count()
+    )
+    access = models.DocumentAccess.objects.filter(user=user).first()
+    assert access.document.get_roles(user) == [access.role]
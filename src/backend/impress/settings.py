@@ -136,6 +136,20 @@ class Base(Configuration):
         environ_prefix=None,
     )
 
+    # S3 authorization headers signed for media are reused during this number of seconds
+    # (capped below the 15 minutes after which S3 rejects a signature), for at most
+    # this number of object keys per process. Set the timeout to 0 to disable.
+    S3_AUTHORIZATION_HEADERS_CACHE_TIMEOUT = values.PositiveIntegerValue(
+        5 * 60,  # seconds
+        environ_name="S3_AUTHORIZATION_HEADERS_CACHE_TIMEOUT",
+        environ_prefix=None,
+    )
+    S3_AUTHORIZATION_HEADERS_CACHE_SIZE = values.PositiveIntegerValue(
+        10000,
+        environ_name="S3_AUTHORIZATION_HEADERS_CACHE_SIZE",
+        environ_prefix=None,
+    )
+
     # Document images
     DOCUMENT_IMAGE_MAX_SIZE = values.Value(
         10 * (2**20),  # 10MB
@@ -214,6 +228,133 @@ class Base(Configuration):
 
     # Document versions
     DOCUMENT_VERSIONS_PAGE_SIZE = 50
+    # Retention policy applied by the "thin_documents_versions" command: a list of
+    # "max_age:interval" tiers in seconds. Versions younger than max_age keep one version
+    # per interval (all versions if 0), versions older than all tiers are deleted.
+    # Empty to keep all versions.
+    DOCUMENT_VERSIONS_RETENTION = values.ListValue(
+        [],
+        environ_name="DOCUMENT_VERSIONS_RETENTION",
+        environ_prefix=None,
+    )
+
+    # Document content write-behind: when activated, the latest content of each document
+    # is buffered in a cache and written to object storage at most once per flush window.
+    # The buffer holds the only copy of unflushed contents: it requires a dedicated cache
+    # alias configured not to evict keys (e.g. Redis with "maxmemory-policy noeviction")
+    DOCUMENT_CONTENT_WRITE_BEHIND = values.BooleanValue(
+        False, environ_name="DOCUMENT_CONTENT_WRITE_BEHIND", environ_prefix=None
+    )
+    DOCUMENT_CONTENT_FLUSH_WINDOW = values.PositiveIntegerValue(
+        10,  # seconds
+        environ_name="DOCUMENT_CONTENT_FLUSH_WINDOW",
+        environ_prefix=None,
+    )
+    DOCUMENT_CONTENT_BUFFER_TIMEOUT = values.PositiveIntegerValue(
+        60 * 60 * 24,  # seconds, should be much longer than the flush window
+        environ_name="DOCUMENT_CONTENT_BUFFER_TIMEOUT",
+        environ_prefix=None,
+    )
+    DOCUMENT_CONTENT_FLUSH_LOCK_TIMEOUT = values.PositiveIntegerValue(
+        60,  # seconds, should be longer than the upload of a content
+        environ_name="DOCUMENT_CONTENT_FLUSH_LOCK_TIMEOUT",
+        environ_prefix=None,
+    )
+    DOCUMENT_CONTENT_BUFFER_CACHE = values.Value(
+        "default", environ_name="DOCUMENT_CONTENT_BUFFER_CACHE", environ_prefix=None
+    )
+
+    # Document content compression at rest: name of the codec used to encode contents
+    # written to object storage ("gzip"), empty to store them raw. Objects are tagged with
+    # their codec in their metadata so contents written with another setting stay readable.
+    DOCUMENT_CONTENT_CODEC = values.Value(
+        None, environ_name="DOCUMENT_CONTENT_CODEC", environ_prefix=None
+    )
+
+    # Document content read-through cache: a process-local LRU bounded in bytes (L1)
+    # in front of a shared cache (L2). Set a size or an alias to 0/empty to disable a level.
+    DOCUMENT_CONTENT_CACHE = values.Value(
+        "default", environ_name="DOCUMENT_CONTENT_CACHE", environ_prefix=None
+    )
+    DOCUMENT_CONTENT_CACHE_TIMEOUT = values.PositiveIntegerValue(
+        60 * 60,  # seconds
+        environ_name="DOCUMENT_CONTENT_CACHE_TIMEOUT",
+        environ_prefix=None,
+    )
+    DOCUMENT_CONTENT_CACHE_LOCAL_MAX_SIZE = values.PositiveIntegerValue(
+        64 * 2**20,  # bytes
+        environ_name="DOCUMENT_CONTENT_CACHE_LOCAL_MAX_SIZE",
+        environ_prefix=None,
+    )
+    DOCUMENT_CONTENT_CACHE_MAX_ENTRY_SIZE = values.PositiveIntegerValue(
+        2**20,  # bytes, contents bigger than this once encoded are not cached
+        environ_name="DOCUMENT_CONTENT_CACHE_MAX_ENTRY_SIZE",
+        environ_prefix=None,
+    )
+    DOCUMENT_CONTENT_CACHE_COMPRESS_MIN_SIZE = values.PositiveIntegerValue(
+        4 * 2**10,  # bytes, 0 to disable compression
+        environ_name="DOCUMENT_CONTENT_CACHE_COMPRESS_MIN_SIZE",
+        environ_prefix=None,
+    )
+
+    # Strategy used to keep only the highest ancestors in the list of documents: "sql"
+    # filters them in the database, "python" fetches all paths to filter them.
+    DOCUMENT_LIST_ROOT_DOCUMENTS_STRATEGY = values.Value(
+        "sql",
+        environ_name="DOCUMENT_LIST_ROOT_DOCUMENTS_STRATEGY",
+        environ_prefix=None,
+    )
+
+    # Full-text search: text search configuration of the vectors indexing the contents
+    # of documents, and delay after a save before the content is indexed
+    DOCUMENT_SEARCH_CONFIG = values.Value(
+        "simple",
+        environ_name="DOCUMENT_SEARCH_CONFIG",
+        environ_prefix=None,
+    )
+    DOCUMENT_SEARCH_INDEXING_DELAY = values.PositiveIntegerValue(
+        30,  # seconds
+        environ_name="DOCUMENT_SEARCH_INDEXING_DELAY",
+        environ_prefix=None,
+    )
+
+    # Time during which the root documents listed to a user are cached, as long as no
+    # access, link trace or move/deletion invalidates them. 0 to disable the cache.
+    DOCUMENT_LIST_ROOTS_CACHE_TIMEOUT = values.PositiveIntegerValue(
+        60 * 60,  # 1 hour
+        environ_name="DOCUMENT_LIST_ROOTS_CACHE_TIMEOUT",
+        environ_prefix=None,
+    )
+
+    # Document duplication: number of objects copied in parallel in object storage when
+    # a document is duplicated, and maximum number of documents copied at once
+    DOCUMENT_DUPLICATION_WORKERS = values.PositiveIntegerValue(
+        8, environ_name="DOCUMENT_DUPLICATION_WORKERS", environ_prefix=None
+    )
+    DOCUMENT_DUPLICATION_MAX_DOCUMENTS = values.PositiveIntegerValue(
+        1000,
+        environ_name="DOCUMENT_DUPLICATION_MAX_DOCUMENTS",
+        environ_prefix=None,
+    )
+
+    # Authorization decisions of media-auth and collaboration-auth subrequests are cached
+    # for a short time. They are invalidated when accesses, link configurations or the
+    # deletion status of documents change. Set to 0 to disable the cache.
+    DOCUMENT_AUTH_CACHE_TIMEOUT = values.PositiveIntegerValue(
+        30,  # seconds
+        environ_name="DOCUMENT_AUTH_CACHE_TIMEOUT",
+        environ_prefix=None,
+    )
+
+    # Lifetime of the capabilities minted by media-auth subrequests to let the media-check
+    # endpoint authorize the next attachments of a document without querying the
+    # database. Access revocations are only enforced on media once capabilities expire.
+    # Set to 0 to disable capabilities.
+    MEDIA_CAPABILITY_TIMEOUT = values.PositiveIntegerValue(
+        60,  # seconds
+        environ_name="MEDIA_CAPABILITY_TIMEOUT",
+        environ_prefix=None,
+    )
 
     # Internationalization
     # https://docs.djangoproject.com/en/3.1/topics/i18n/
@@ -278,6 +419,7 @@ class Base(Configuration):
         "django.middleware.common.CommonMiddleware",
         "django.middleware.csrf.CsrfViewMiddleware",
         "django.contrib.auth.middleware.AuthenticationMiddleware",
+        "core.middleware.AbilitiesContextMiddleware",
         "django.contrib.messages.middleware.MessageMiddleware",
         "dockerflow.django.middleware.DockerflowMiddleware",
     ]
@@ -658,6 +800,16 @@ class Base(Configuration):
                 "OIDC_ALLOW_DUPLICATE_EMAILS cannot be set to True simultaneously. "
             )
 
+        if cls.DOCUMENT_CONTENT_WRITE_BEHIND and (
+            cls.DOCUMENT_CONTENT_BUFFER_CACHE == "default"
+            or cls.DOCUMENT_CONTENT_BUFFER_CACHE not in cls.CACHES
+        ):
+            raise ValueError(
+                "DOCUMENT_CONTENT_WRITE_BEHIND requires DOCUMENT_CONTENT_BUFFER_CACHE to "
+                "be a dedicated cache alias, declared in CACHES and configured not to "
+                "evict keys."
+            )
+
 
 class Build(Base):
     """Settings used when the application is built.
@@ -55,6 +55,7 @@ export interface Doc {
     children_list: boolean;
     collaboration_auth: boolean;
     destroy: boolean;
+    duplicate: boolean;
     favorite: boolean;
     invite_owner: boolean;
     link_configuration: boolean;
@@ -66,6 +67,7 @@ export interface Doc {
     update: boolean;
     versions_destroy: boolean;
     versions_list: boolean;
+    versions_restore: boolean;
     versions_retrieve: boolean;
   };
 }
@@ -185,6 +185,7 @@ export class ApiPlugin implements WorkboxPlugin {
         children_list: true,
         collaboration_auth: true,
         destroy: true,
+        duplicate: true,
         favorite: true,
         invite_owner: true,
         link_configuration: true,
@@ -196,6 +197,7 @@ export class ApiPlugin implements WorkboxPlugin {
         update: true,
         versions_destroy: true,
         versions_list: true,
+        versions_restore: true,
         versions_retrieve: true,
       },
       link_reach: LinkReach.RESTRICTED,